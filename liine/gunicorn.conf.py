@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for serving liine in production.
+
+Runs the ASGI application (`liine.asgi:application`) in Uvicorn workers:
+
+    gunicorn liine.asgi:application -c liine/gunicorn.conf.py
+
+The WSGI application can be served with the same settings by overriding the worker class:
+
+    gunicorn liine.wsgi:application -c liine/gunicorn.conf.py --worker-class sync
+
+For more information on this file, see
+https://docs.gunicorn.org/en/stable/settings.html
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # '-' logs requests to stdout
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -74,14 +76,151 @@ WSGI_APPLICATION = 'liine.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+#
+# SQLite by default. Set DATABASE_ENGINE=postgresql and DATABASE_NAME, DATABASE_USER,
+# DATABASE_PASSWORD, DATABASE_HOST and DATABASE_PORT to use PostgreSQL instead.
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+# Seconds that a connection is kept open for the requests that follow (0 closes it after each request)
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+
+if DATABASE_ENGINE == 'sqlite':
+    SQLITE_PATH = os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3')
+    # WAL lets readers keep reading the last committed data while an import writes. NORMAL sync is
+    # durable across application crashes; only the last transactions can be lost on power failure.
+    SQLITE_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL; PRAGMA cache_size=-20000; PRAGMA mmap_size=268435456; PRAGMA temp_store=MEMORY'
+    )
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'OPTIONS': {
+                'init_command': f'PRAGMA journal_mode=WAL; {SQLITE_PRAGMAS}',
+                # Take the write lock when a transaction starts, so that concurrent writers wait for it
+                # (up to `timeout` seconds) instead of failing when they try to upgrade a read lock
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        },
+        # Reads of restaurant data outside transactions (see restaurants.routers.ReadOnlyRouter)
+        'readonly': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f'file:{SQLITE_PATH}?mode=ro',
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'OPTIONS': {'uri': True, 'init_command': f'PRAGMA query_only=ON; {SQLITE_PRAGMAS}', 'timeout': 20},
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+elif DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'liine'),
+            'USER': os.environ.get('DATABASE_USER', 'liine'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DATABASE_POOL_MAX_SIZE'):
+        # A psycopg connection pool per worker process, which replaces persistent connections
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ['DATABASE_POOL_MAX_SIZE']),
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+else:
+    raise ImproperlyConfigured(f"DATABASE_ENGINE must be 'sqlite' or 'postgresql', not {DATABASE_ENGINE!r}")
+
+DATABASE_ROUTERS = ['restaurants.routers.ReadOnlyRouter']
+
+
+# Open-hours lookups: 'database' queries the interval index per request,
+# 'memory' answers from an in-process slot index built on first use, and 'snapshot' maps the
+# file written by build_snapshot, so that every worker shares one copy
+
+RESTAURANTS_OPEN_ENGINE = 'database'
+
+# Snapshot file of the 'snapshot' engine, and how often in seconds workers check whether it was replaced
+
+RESTAURANTS_SNAPSHOT_PATH = BASE_DIR / 'restaurants.snapshot'
+
+RESTAURANTS_SNAPSHOT_CHECK_SECONDS = 1
 
-DATABASES = {
+# Maximum number of distinct hours strings whose parsed schedules are kept in memory
+
+RESTAURANTS_SCHEDULE_CACHE_SIZE = 4096
+
+# IANA time zone of restaurants imported or created without one. Hours are wall-clock times in
+# each restaurant's zone; naive query datetimes are read as wall-clock times in every zone
+
+RESTAURANTS_DEFAULT_TZ = 'UTC'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Point this at a shared backend (e.g. Redis) so that workers share rendered responses
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
     }
 }
 
+# Seconds that a process reuses the dataset version it read from the database, and so the longest
+# it takes to notice data changed by another process, such as import_restaurants
+
+RESTAURANTS_DATASET_VERSION_CHECK_SECONDS = 1
+
+# Seconds that a rendered /restaurants/api/open response is cached for a minute of the week
+
+RESTAURANTS_RESPONSE_CACHE_TIMEOUT = 600
+
+# Longest Cache-Control max-age, in seconds, sent with /restaurants/api/open answers
+
+RESTAURANTS_OPEN_MAX_AGE = 3600
+
+
+# Maximum number of datetimes accepted by one /restaurants/api/open/batch request
+
+RESTAURANTS_BATCH_MAX_DATETIMES = 2016
+
+
+# Size in degrees of the latitude/longitude grid cells used for lat/lng/radius lookups, and the
+# largest radius accepted in km
+
+RESTAURANTS_GEO_CELL_DEGREES = 0.05
+
+RESTAURANTS_GEO_MAX_RADIUS_KM = 100
+
+
+# Largest page size accepted by the `limit` parameter of /restaurants/api/open
+
+RESTAURANTS_PAGE_MAX_LIMIT = 1000
+
+
+# Answer plain /restaurants/api/open lookups in liine/wsgi.py and liine/asgi.py before Django's
+# middleware and DRF run. Skips host validation, sessions, CSRF and the browsable API for that URL.
+
+RESTAURANTS_OPEN_FAST_PATH = False
+
+
+# Time the stages of /restaurants/api/open and the phases of import_restaurants, count response
+# cache hits and restaurants scanned, and expose them at /restaurants/metrics for Prometheus.
+# Metrics are kept per process.
+
+RESTAURANTS_METRICS = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
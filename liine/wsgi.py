@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'liine.settings')
 
 application = get_wsgi_application()
+
+# Imported after setup, so that the app registry is ready
+from restaurants.fastpath import wrap_application  # noqa: E402
+
+application = wrap_application(application, 'wsgi')
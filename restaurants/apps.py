@@ -1,6 +1,66 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
 
 
 class RestaurantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurants'
+
+    def ready(self):
+        from .boundaries import BoundaryIndex
+        from .engines import load_engine
+        from .geo import GeoGridIndex
+        from .hours import schedule_cache
+        from .models import Restaurant
+        from .occupancy import OccupancyIndex
+        from .windows import WindowIndex
+        from .zones import ZoneIndex
+
+        schedule_cache.resize(getattr(settings, 'RESTAURANTS_SCHEDULE_CACHE_SIZE', schedule_cache.maxsize))
+
+        # Engines that hold data in memory load it lazily, so no queries run during startup
+        self.open_hours_engine = load_engine()
+        self.window_index = WindowIndex()
+        self.boundary_index = BoundaryIndex()
+        self.zone_index = ZoneIndex()
+        self.geo_index = GeoGridIndex()
+        self.occupancy_index = OccupancyIndex()
+        # The dataset version that the indexes were last invalidated for
+        self.refreshed_version = None
+        post_save.connect(self.restaurants_changed, sender=Restaurant)
+        post_delete.connect(self.restaurants_changed, sender=Restaurant)
+
+    def restaurants_changed(self, using=DEFAULT_DB_ALIAS, **kwargs):
+        """
+        Record a change to the restaurants made through `using`.
+
+        The stored dataset version moves forward in the transaction making the change, and this
+        process drops its in-memory indexes once the transaction commits.
+        """
+        from .cache import bump_dataset_version
+
+        bump_dataset_version(using)
+        transaction.on_commit(self.dataset_changed, using=using)
+
+    def dataset_changed(self):
+        """
+        Invalidate the in-memory indexes and the cached dataset version after the restaurant data changes.
+
+        Runs once per changed row when a transaction commits, but only the first call for each
+        stored version does anything, so a snapshot engine writes one snapshot per transaction.
+        """
+        from .cache import forget_dataset_version, get_dataset_version
+
+        forget_dataset_version()
+        version = get_dataset_version()
+        if version == self.refreshed_version:
+            return
+        self.refreshed_version = version
+        self.open_hours_engine.invalidate()
+        self.window_index.invalidate()
+        self.boundary_index.invalidate()
+        self.zone_index.invalidate()
+        self.geo_index.invalidate()
+        self.occupancy_index.invalidate()
@@ -0,0 +1,607 @@
+import csv
+import gc
+import itertools
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from io import BytesIO, StringIO
+from unittest import mock
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from .engines import DatabaseEngine, NumpyEngine, SlotIndexEngine
+from .fastpath import fast_path_wsgi
+from .geo import GeoGridIndex, haversine_km
+from .hours import (
+    MINUTES_PER_WEEK, check_open_hours, minute_of_week, parse_hours, parse_schedule, regex_parse_hours,
+    schedule_cache, schedule_hours,
+)
+from .models import OpeningInterval, Restaurant
+from .occupancy import OccupancyIndex
+from .snapshot import SnapshotEngine, write_snapshot
+from .store import RestaurantStore
+from .utils import peak_memory_mb
+from .views import RestaurantListAPIView
+
+DAY_GROUPS = ['Mon-Sun', 'Mon-Fri', 'Mon-Thu, Sun', 'Mon-Sat', 'Tues-Sun', 'Mon, Wed-Sun']
+WEEKEND_GROUPS = ['Sat-Sun', 'Fri-Sat', 'Sat', 'Sun']
+OPENING_TIMES = ['7 am', '9 am', '10 am', '10:30 am', '11 am', '11:30 am', '12 pm', '3 pm', '5 pm']
+CLOSING_TIMES = ['3 pm', '9 pm', '9:30 pm', '10 pm', '10:30 pm', '11 pm', '12 am', '12:30 am', '1:30 am', '4 am']
+# Lunch and dinner services of restaurants that close in the afternoon
+SPLIT_SHIFTS = ['11 am - 2:30 pm, 5 pm - 10 pm', '11:30 am - 3 pm, 5:30 pm - 11 pm', '12 pm - 2 pm, 6 pm - 10:30 pm']
+
+# Metro areas that generated restaurant locations cluster around, as (latitude, longitude)
+METRO_CENTERS = [
+    (40.71, -74.01), (34.05, -118.24), (41.88, -87.63), (29.76, -95.37), (51.51, -0.13),
+    (48.86, 2.35), (35.68, 139.69), (-33.87, 151.21), (19.43, -99.13), (-23.55, -46.63),
+]
+
+# A Monday, so that offsets from it line up with minutes of the week
+BENCHMARK_WEEK_START = datetime(2024, 8, 26)
+
+
+def generate_hours(rng):
+    """Generate an hours string in the same shape as the partner feeds."""
+    if rng.random() < 0.15:
+        parts = [f"{rng.choice(DAY_GROUPS)} {rng.choice(SPLIT_SHIFTS)}"]
+    else:
+        parts = [f"{rng.choice(DAY_GROUPS)} {rng.choice(OPENING_TIMES)} - {rng.choice(CLOSING_TIMES)}"]
+    if rng.random() < 0.4:
+        parts.append(f"{rng.choice(WEEKEND_GROUPS)} {rng.choice(OPENING_TIMES)} - {rng.choice(CLOSING_TIMES)}")
+    return '  / '.join(parts)
+
+
+def generate_restaurants(count, seed=0):
+    """Yield `count` synthetic (name, hours) rows, reproducibly for a given seed."""
+    rng = random.Random(seed)
+    # Chains share hours strings, so draw from a limited pool like the real feeds do
+    pool = [generate_hours(rng) for _ in range(max(1, min(count // 20, 5000)))]
+    for i in range(count):
+        yield f"Restaurant {i}", rng.choice(pool)
+
+
+def generate_locations(count, seed=0):
+    """Yield `count` (latitude, longitude) pairs scattered around the metro centers, reproducibly for a given seed."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        latitude, longitude = rng.choice(METRO_CENTERS)
+        yield latitude + rng.gauss(0, 0.15), longitude + rng.gauss(0, 0.2)
+
+
+def bench_numpy_engine(size, repeat):
+    """Compare the numpy engine with checking every restaurant's parsed hours in Python."""
+    populate(size)
+    restaurants = [
+        (name, schedule_cache.get(hours).hours) for name, hours in Restaurant.objects.values_list('name', 'hours')
+    ]
+    datetimes = sample_datetimes(repeat)
+
+    def check_each(datetime_obj):
+        return [name for name, parsed_hours in restaurants if check_open_hours(parsed_hours, datetime_obj)]
+
+    engine = NumpyEngine()
+    engine.open_restaurant_names(0)
+    python = measure(check_each, [(datetime_obj,) for datetime_obj in datetimes])
+    vectorized = measure(engine.open_restaurant_names, [(minute_of_week(datetime_obj),) for datetime_obj in datetimes])
+    return {
+        'intervals': OpeningInterval.objects.count(),
+        'python_median_ms': python['median_ms'],
+        'numpy_median_ms': vectorized['median_ms'],
+        'speedup': python['median_ms'] / vectorized['median_ms'],
+    }
+
+
+def write_csv(path, count, seed=0):
+    """Write `count` synthetic restaurants to a CSV file in the import format."""
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+        writer.writerow(['Restaurant Name', 'Hours'])
+        writer.writerows(generate_restaurants(count, seed))
+
+
+def populate(count, seed=0, batch_size=10000, located=False):
+    """Replace the restaurant table with `count` synthetic restaurants and their intervals, optionally with locations."""
+    Restaurant.objects.all().delete()
+    rows = generate_restaurants(count, seed)
+    locations = generate_locations(count, seed) if located else itertools.repeat((None, None))
+    while True:
+        batch = [
+            Restaurant(name=name, hours=hours, latitude=latitude, longitude=longitude)
+            for (name, hours), (latitude, longitude) in itertools.islice(zip(rows, locations), batch_size)
+        ]
+        if not batch:
+            break
+        # bulk_create skips Restaurant.save(), so the intervals are written here
+        Restaurant.objects.bulk_create(batch)
+        OpeningInterval.objects.insert_for(batch)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+def sample_datetimes(count, seed=0):
+    """Return `count` random datetimes spread across a single week."""
+    rng = random.Random(seed)
+    return [BENCHMARK_WEEK_START + timedelta(minutes=rng.randrange(MINUTES_PER_WEEK)) for _ in range(count)]
+
+
+def measure(fn, args_list):
+    """Call `fn` once per argument and summarize the wall-clock timings in milliseconds."""
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'calls': len(timings),
+        'mean_ms': statistics.fmean(timings),
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max_ms': timings[-1],
+    }
+
+
+class Benchmark:
+    """
+    A pytest-benchmark style timer: `benchmark(fn, *args)` calls `fn` and returns its result, timing it in rounds.
+
+    The number of calls per round is calibrated so that a round lasts at least `min_round_time`
+    seconds, which keeps timer resolution out of the results for fast functions. After a warm-up
+    round, `rounds` rounds are timed and `stats` summarizes the time per call in milliseconds.
+    """
+
+    def __init__(self, rounds=20, min_round_time=0.001):
+        self.rounds = max(1, rounds)
+        self.min_round_time = min_round_time
+        self.stats = None
+
+    def __call__(self, fn, *args, **kwargs):
+        iterations = 1
+        while True:
+            elapsed = self._time_round(fn, args, kwargs, iterations)
+            if elapsed >= self.min_round_time:
+                break
+            iterations *= max(2, min(10, int(self.min_round_time / max(elapsed, 1e-9)) + 1))
+
+        timings = sorted(
+            self._time_round(fn, args, kwargs, iterations) * 1000 / iterations for _ in range(self.rounds)
+        )
+        quartiles = statistics.quantiles(timings, n=4) if len(timings) > 1 else timings * 3
+        self.stats = {
+            'min_ms': timings[0],
+            'max_ms': timings[-1],
+            'mean_ms': statistics.fmean(timings),
+            'stddev_ms': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'median_ms': statistics.median(timings),
+            'iqr_ms': quartiles[2] - quartiles[0],
+            'ops': 1000 / statistics.fmean(timings) if timings[0] > 0 else None,
+            'rounds': self.rounds,
+            'iterations': iterations,
+        }
+        return fn(*args, **kwargs)
+
+    @staticmethod
+    def _time_round(fn, args, kwargs, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(*args, **kwargs)
+        return time.perf_counter() - started
+
+
+def bench_engine(engine, size, repeat):
+    """Time `engine.open_restaurant_names` at random minutes of the week."""
+    populate(size)
+    started = time.perf_counter()
+    engine.open_restaurant_names(0)
+    warmup_ms = (time.perf_counter() - started) * 1000
+
+    minutes = [(minute_of_week(dt),) for dt in sample_datetimes(repeat)]
+    result = measure(engine.open_restaurant_names, minutes)
+    result['warmup_ms'] = warmup_ms
+    result['mean_results'] = statistics.fmean(len(engine.open_restaurant_names(*args)) for args in minutes)
+    return result
+
+
+def bench_open_query(size, repeat):
+    """Time the indexed open-at-minute query used by /api/open."""
+    return bench_engine(DatabaseEngine(), size, repeat)
+
+
+def bench_memory_engine(size, repeat):
+    """Time lookups against the in-process slot index."""
+    return bench_engine(SlotIndexEngine(), size, repeat)
+
+
+def bench_stream(size, repeat):
+    """Compare time and peak Python memory of a full and a streamed /api/open response at a busy minute."""
+    populate(size)
+    view = RestaurantListAPIView.as_view()
+    # Friday at 8 pm, when most generated restaurants are open
+    params = {'datetime': (BENCHMARK_WEEK_START + timedelta(days=4, hours=20)).isoformat()}
+
+    def fetch(stream):
+        request = RequestFactory().get('/restaurants/api/open', {**params, 'stream': stream})
+        response = view(request)
+        return sum(len(chunk) for chunk in response) if response.streaming else len(response.content)
+
+    result = {}
+    for mode, stream in (('full', 'false'), ('stream', 'true')):
+        # Skip the response cache so that every call builds its answer
+        with mock.patch('restaurants.cache.get_open_response', return_value=None):
+            fetch(stream)
+            tracemalloc.start()
+            result[f'{mode}_bytes'] = fetch(stream)
+            result[f'{mode}_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            result[f'{mode}_median_ms'] = measure(fetch, [(stream,)] * repeat)['median_ms']
+    return result
+
+
+def bench_fast_path(size, repeat):
+    """Compare per-request overhead of the full Django/DRF stack and the fast path, with the answer cached."""
+    populate(size)
+    django_app = get_wsgi_application()
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/restaurants/api/open',
+        'QUERY_STRING': 'datetime=2024-08-30T20:00:00',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'wsgi.url_scheme': 'http',
+    }
+
+    def call(app):
+        body = b''.join(app({**environ, 'wsgi.input': BytesIO()}, lambda status, headers: None))
+        assert body.startswith(b'{"open_restaurants"'), body[:200]
+
+    result = {}
+    for mode, app in (('full', django_app), ('fast_path', fast_path_wsgi(django_app))):
+        call(app)
+        result.update({f'{mode}_{key}': value for key, value in measure(call, [(app,)] * repeat).items()})
+    result['overhead_saved_ms'] = result['full_median_ms'] - result['fast_path_median_ms']
+    return result
+
+
+def bench_geo(size, repeat, radius_km=2):
+    """
+    Compare open-now lookups within `radius_km` of a point using the grid index with filtering every open restaurant.
+
+    The naive approach loads the coordinates of all the restaurants open at the minute and checks
+    their distances in Python; it is timed on at most 5 queries as it is slow at large sizes.
+    """
+    populate(size, located=True)
+    rng = random.Random(1)
+    queries = [
+        (latitude + rng.gauss(0, 0.1), longitude + rng.gauss(0, 0.1), minute_of_week(dt))
+        for (latitude, longitude), dt in zip(
+            (rng.choice(METRO_CENTERS) for _ in range(repeat)), sample_datetimes(repeat)
+        )
+    ]
+
+    def load_and_filter(latitude, longitude, minute):
+        located = OpeningInterval.objects.open_at(minute).values_list(
+            'restaurant_id', 'restaurant__name', 'restaurant__latitude', 'restaurant__longitude'
+        )
+        return [
+            name for _, name, lat, lng in sorted(located)
+            if haversine_km(latitude, longitude, lat, lng) <= radius_km
+        ]
+
+    geo_index = GeoGridIndex()
+    started = time.perf_counter()
+    geo_index.restaurant_ids_within(0, 0, radius_km)
+    result = {'grid_build_ms': (time.perf_counter() - started) * 1000}
+    naive = measure(load_and_filter, queries[:5])
+    result['naive_median_ms'] = naive['median_ms']
+    for label, engine in (('database', DatabaseEngine()), ('memory', SlotIndexEngine())):
+        engine.open_restaurant_names(0)
+
+        def grid_lookup(latitude, longitude, minute):
+            nearby_ids = geo_index.restaurant_ids_within(latitude, longitude, radius_km)
+            return engine.open_restaurant_names_among(minute, nearby_ids)
+
+        for args in queries[:5]:
+            assert grid_lookup(*args) == load_and_filter(*args)
+        timings = measure(grid_lookup, queries)
+        result[f'grid_{label}_median_ms'] = timings['median_ms']
+        result[f'grid_{label}_p95_ms'] = timings['p95_ms']
+    result['mean_nearby'] = statistics.fmean(len(geo_index.restaurant_ids_within(*args[:2], radius_km)) for args in queries)
+    return result
+
+
+def bench_parse_hours(size, repeat):
+    """
+    Time parsing `size` generated hours strings with the hours compiler, the original regex and strptime parser and
+    the cached `parse_hours`, in microseconds per string (median of `repeat` passes, at most 20).
+
+    `regex_misread_strings` counts the distinct strings that the regex parser reads differently,
+    such as split shifts, whose second time range it drops.
+    """
+    hours_strs = [hours for _, hours in generate_restaurants(size)]
+
+    def compile_spans(hours_str):
+        return schedule_hours(parse_schedule(hours_str))
+
+    def parse_all(parse):
+        for hours_str in hours_strs:
+            parse(hours_str)
+
+    def us_per_string(parse):
+        benchmark = Benchmark(rounds=min(repeat, 20))
+        benchmark(parse_all, parse)
+        return benchmark.stats['median_ms'] * 1000 / len(hours_strs)
+
+    regex_us = us_per_string(regex_parse_hours)
+    compiler_us = us_per_string(compile_spans)
+    return {
+        'strings': len(hours_strs),
+        'regex_us_per_string': regex_us,
+        'compiler_us_per_string': compiler_us,
+        'cached_us_per_string': us_per_string(parse_hours),
+        'speedup': regex_us / compiler_us,
+        'regex_misread_strings': sum(compile_spans(s) != regex_parse_hours(s) for s in set(hours_strs)),
+    }
+
+
+def bench_check_open_hours(size, repeat):
+    """Time checking every one of `size` restaurants' parsed hours with check_open_hours at a busy minute."""
+    parsed = [parse_hours(hours) for _, hours in generate_restaurants(size)]
+    # Friday at 8 pm, when most generated restaurants are open
+    datetime_obj = BENCHMARK_WEEK_START + timedelta(days=4, hours=20)
+
+    def check_all():
+        return sum(check_open_hours(parsed_hours, datetime_obj) for parsed_hours in parsed)
+
+    benchmark = Benchmark(rounds=min(repeat, 20))
+    open_count = benchmark(check_all)
+    return {
+        **benchmark.stats,
+        'open': open_count,
+        'us_per_check': benchmark.stats['median_ms'] * 1000 / size,
+    }
+
+
+def bench_open_request(size, repeat):
+    """
+    Time full /api/open requests through Django, its middleware and DRF at random datetimes.
+
+    `cold` requests bypass the response cache, so they include the lookup by the configured
+    engine; `warm` ones repeat a cached answer.
+    """
+    populate(size)
+    application = get_wsgi_application()
+    datetimes = sample_datetimes(repeat)
+
+    def request(datetime_obj):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': '/restaurants/api/open',
+            'QUERY_STRING': f'datetime={datetime_obj.isoformat()}',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+        }
+        statuses = []
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        assert statuses == ['200 OK'], (statuses, body[:200])
+        return body
+
+    request(datetimes[0])
+    with mock.patch('restaurants.cache.get_open_response', return_value=None):
+        cold = measure(request, [(datetime_obj,) for datetime_obj in datetimes])
+    warm = measure(request, [(datetimes[0],)] * repeat)
+    return {
+        **{f'cold_{key}': value for key, value in cold.items()},
+        **{f'warm_{key}': value for key, value in warm.items()},
+        'mean_response_bytes': statistics.fmean(len(request(datetime_obj)) for datetime_obj in datetimes[:20]),
+    }
+
+
+def bench_occupancy(size, repeat):
+    """Compare building the 15-minute occupancy counts in one sweep with one open-restaurants query per slot."""
+    populate(size)
+    minutes = range(0, MINUTES_PER_WEEK, 15)
+    engine = DatabaseEngine()
+
+    def query_each_slot():
+        return [len(engine.open_restaurant_names(minute)) for minute in minutes]
+
+    def sweep():
+        occupancy_index = OccupancyIndex()
+        return occupancy_index.slot_counts(15)
+
+    assert sweep() == query_each_slot()
+    per_slot = measure(query_each_slot, [()] * min(repeat, 3))
+    swept = measure(sweep, [()] * repeat)
+    return {
+        'slots': len(minutes),
+        'per_slot_queries_ms': per_slot['median_ms'],
+        'sweep_ms': swept['median_ms'],
+        'speedup': per_slot['median_ms'] / swept['median_ms'],
+    }
+
+
+def bench_snapshot(size, repeat):
+    """Compare a worker's first lookup when it indexes the database (numpy engine) and when it maps a snapshot."""
+    populate(size)
+    minutes = [minute_of_week(datetime_obj) for datetime_obj in sample_datetimes(repeat)]
+
+    def first_lookup(engine_class):
+        engine_class().open_restaurant_names(minutes[0])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'restaurants.snapshot')
+        with override_settings(RESTAURANTS_SNAPSHOT_PATH=path):
+            started = time.perf_counter()
+            _, _, snapshot_bytes = write_snapshot(path)
+            write_seconds = time.perf_counter() - started
+            from_database = measure(first_lookup, [(NumpyEngine,)] * min(repeat, 5))
+            mapped = measure(first_lookup, [(SnapshotEngine,)] * repeat)
+            engine = SnapshotEngine()
+            engine.open_restaurant_names(0)
+            lookups = measure(engine.open_restaurant_names, [(minute,) for minute in minutes])
+    return {
+        'snapshot_mb': snapshot_bytes / 1024 / 1024,
+        'write_seconds': write_seconds,
+        'database_first_lookup_ms': from_database['median_ms'],
+        'snapshot_first_lookup_ms': mapped['median_ms'],
+        'speedup': from_database['median_ms'] / mapped['median_ms'],
+        'snapshot_lookup_median_ms': lookups['median_ms'],
+    }
+
+
+def retained_bytes(build):
+    """Call `build()` and return (its result, the bytes it allocated that are still held), measured by tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_store(size, repeat, sample_size=10000):
+    """
+    Compare the memory held per restaurant by the compact RestaurantStore with model instances and parsed hours.
+
+    The store is measured at `size`; model instances and parse_hours() results, which cost far more, on up to
+    `sample_size` restaurants.
+    """
+    populate(size)
+    sample = min(size, sample_size)
+    _, model_bytes = retained_bytes(lambda: list(Restaurant.objects.order_by('pk')[:sample]))
+    hours_strings = list(Restaurant.objects.order_by('pk').values_list('hours', flat=True)[:sample])
+    for hours_str in hours_strings:
+        schedule_cache.get(hours_str)
+    _, parsed_bytes = retained_bytes(lambda: [parse_hours(hours_str) for hours_str in hours_strings])
+
+    started = time.perf_counter()
+    RestaurantStore.from_database()
+    build_seconds = time.perf_counter() - started
+    store, store_bytes = retained_bytes(RestaurantStore.from_database)
+    return {
+        'model_bytes_per_restaurant': model_bytes / sample,
+        'parsed_hours_bytes_per_restaurant': parsed_bytes / sample,
+        'store_bytes_per_restaurant': store_bytes / size,
+        'store_buffer_bytes_per_restaurant': store.nbytes() / size,
+        'store_mb': store_bytes / 2 ** 20,
+        'build_seconds': build_seconds,
+    }
+
+
+def bench_import(size, repeat, batch_size=5000, workers=1):
+    """Time import_restaurants on a generated CSV file of `size` rows."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'restaurants.csv')
+        write_csv(path, size)
+        started = time.perf_counter()
+        call_command('import_restaurants', path, batch_size=batch_size, workers=workers, stdout=StringIO())
+        elapsed = time.perf_counter() - started
+    return {
+        'seconds': elapsed,
+        'rows_per_second': size / elapsed,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+
+def bench_import_parallel(size, repeat):
+    """Time import_restaurants with one hours-parsing worker per CPU."""
+    return {'workers': os.cpu_count(), **bench_import(size, repeat, workers=os.cpu_count())}
+
+
+SCENARIOS = {
+    'parse_hours': bench_parse_hours,
+    'check_open_hours': bench_check_open_hours,
+    'open_request': bench_open_request,
+    'open_query': bench_open_query,
+    'memory_engine': bench_memory_engine,
+    'numpy_engine': bench_numpy_engine,
+    'stream': bench_stream,
+    'fast_path': bench_fast_path,
+    'geo': bench_geo,
+    'occupancy': bench_occupancy,
+    'snapshot': bench_snapshot,
+    'store': bench_store,
+    'import': bench_import,
+    'import_parallel': bench_import_parallel,
+}
+
+
+# The scenarios run by `benchmark suite`: the open-hours path from parsing hours to a full request, and import
+SUITE = ['parse_hours', 'check_open_hours', 'open_query', 'memory_engine', 'open_request', 'import']
+
+# Result keys compared with a baseline, by suffix, mapped to whether higher values are better
+REGRESSION_METRICS = {
+    'median_ms': False,
+    '_us_per_string': False,
+    'us_per_check': False,
+    'seconds': False,
+    'peak_memory_mb': False,
+    '_peak_mb': False,
+    'rows_per_second': True,
+}
+
+
+def environment():
+    """Describe where benchmarks ran, so that results from different machines and releases can be told apart."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'database': connection.vendor,
+        'open_engine': getattr(settings, 'RESTAURANTS_OPEN_ENGINE', 'database'),
+    }
+
+
+def compare_results(baseline, results, tolerance):
+    """
+    Compare results with those of a baseline run, matched by scenario and size.
+
+    Returns a description of every metric in REGRESSION_METRICS that got worse by more than
+    `tolerance` (a fraction, so 0.2 allows 20%). Results without a baseline are skipped.
+    """
+    baseline_by_key = {(result['scenario'], result['size']): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get((result['scenario'], result['size']))
+        if previous is None:
+            continue
+        for key, value in result.items():
+            higher_is_better = next(
+                (higher for suffix, higher in REGRESSION_METRICS.items() if key.endswith(suffix)), None
+            )
+            before = previous.get(key)
+            if higher_is_better is None or not before or value is None:
+                continue
+            change = (value - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{result['scenario']} at {result['size']}: {key} went from {before:.4g} to {value:.4g} "
+                    f"({change:+.0%})"
+                )
+    return regressions
@@ -0,0 +1,68 @@
+import bisect
+from array import array
+from .engines import CachedIndex
+from .hours import MINUTES_PER_WEEK
+from .store import RestaurantStore
+from .windows import week_spans
+
+
+class BoundaryIndex(CachedIndex):
+    """
+    Knows the minutes of the week at which restaurants open or close.
+
+    Each restaurant's intervals are merged into continuous spans, so hours running past midnight
+    or from Sunday into Monday have no boundary at midnight. The spans are unrolled over three
+    copies of the week (see `week_spans`), so the span around any minute of the week and the one
+    after it are found with a single bisect. Between two consecutive boundaries of the whole
+    index the set of open restaurants cannot change. Names come from a RestaurantStore and spans
+    are kept in flat arrays, so the index holds no Python objects per restaurant.
+    """
+
+    def next_boundary(self, minute, version=None):
+        """Return the first boundary after `minute`, which may be in the following week (>= MINUTES_PER_WEEK)."""
+        boundaries, _ = self._get_index(version)
+        if not boundaries:
+            return None
+        index = bisect.bisect_right(boundaries, minute)
+        if index == len(boundaries):
+            return boundaries[0] + MINUTES_PER_WEEK
+        return boundaries[index]
+
+    def next_changes(self, minute):
+        """
+        Return (name, is open, next change) for every restaurant with hours, in id order.
+
+        The next change is the minute at which an open restaurant closes or a closed one opens,
+        counted from the start of this week, so it may be past MINUTES_PER_WEEK. It is None for
+        restaurants that never close.
+        """
+        _, (names, span_offsets, starts, ends) = self._get_index()
+        changes = []
+        for position in range(len(names)):
+            low, high = span_offsets[position], span_offsets[position + 1]
+            span = bisect.bisect_right(starts, minute, low, high) - 1
+            if ends[span] > minute:
+                # Only a restaurant that never closes has a single span
+                changes.append((names[position], True, ends[span] if high - low > 1 else None))
+            else:
+                changes.append((names[position], False, starts[span + 1]))
+        return changes
+
+    def build(self):
+        """
+        Read the restaurants with hours and build (sorted boundaries, (names, span offsets, span starts, span ends)),
+        where the restaurants are listed in id order with their spans at their offsets.
+        """
+        store = RestaurantStore.from_intervals()
+        boundaries = set()
+        span_offsets = array('I', [0])
+        starts, ends = array('i'), array('i')
+        for position in range(len(store)):
+            spans = sorted(week_spans(store.intervals_at(position)))
+            # A restaurant that never closes has one span covering every copy of the week and no boundaries
+            if len(spans) > 1:
+                boundaries.update(minute % MINUTES_PER_WEEK for span in spans for minute in span)
+            starts.extend(start for start, _ in spans)
+            ends.extend(end for _, end in spans)
+            span_offsets.append(len(starts))
+        return array('H', sorted(boundaries)), (store.names, span_offsets, starts, ends)
@@ -0,0 +1,160 @@
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+DATASET_VERSION_KEY = 'restaurants:dataset-version'
+
+
+def get_cache():
+    """Return the cache used for restaurant responses and the dataset version."""
+    return caches[getattr(settings, 'RESTAURANTS_CACHE_ALIAS', 'default')]
+
+
+def is_in_process(cache):
+    """Return whether `cache` keeps its data in this process, so that its sync methods never wait on I/O."""
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+def version_check_seconds():
+    """Return how long a process reuses the dataset version it read, per RESTAURANTS_DATASET_VERSION_CHECK_SECONDS."""
+    return getattr(settings, 'RESTAURANTS_DATASET_VERSION_CHECK_SECONDS', 1)
+
+
+def read_dataset_version():
+    """Read the dataset version from the database, creating its row if there is none."""
+    from .models import DatasetVersion
+
+    version = DatasetVersion.objects.filter(pk=DatasetVersion.ROW_ID).values_list('version', flat=True).first()
+    if version is None:
+        # Flushed tables lose the row that migrations created
+        version = DatasetVersion.objects.get_or_create(
+            pk=DatasetVersion.ROW_ID, defaults={'version': int(time.time() * 1000)}
+        )[0].version
+    return version
+
+
+def get_dataset_version():
+    """
+    Return the current dataset version.
+
+    The version is kept in the database, so that every process, including management commands,
+    sees the same one. The cache holds it for RESTAURANTS_DATASET_VERSION_CHECK_SECONDS so that
+    requests don't each query it; a process learns of changes made elsewhere within that time.
+    """
+    cache = get_cache()
+    version = cache.get(DATASET_VERSION_KEY)
+    if version is None:
+        version = read_dataset_version()
+        cache.set(DATASET_VERSION_KEY, version, timeout=version_check_seconds())
+    return version
+
+
+async def aget_dataset_version():
+    """Async version of get_dataset_version()."""
+    cache = get_cache()
+    if is_in_process(cache):
+        # Django's default async cache methods hop to a thread, which costs more than the lookup itself
+        version = cache.get(DATASET_VERSION_KEY)
+    else:
+        version = await cache.aget(DATASET_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_dataset_version)()
+    return version
+
+
+def bump_dataset_version(using=None):
+    """
+    Move the stored dataset version forward, so that everything cached for the old one is ignored.
+
+    Call this inside the transaction that changes the data: other processes then see the new
+    version exactly when they can see the new data. Versions only increase, and each bump moves
+    the version up to at least the current time in milliseconds. Returns the new version.
+    """
+    from .models import DatasetVersion
+
+    now = int(time.time() * 1000)
+    versions = DatasetVersion.objects.db_manager(using).filter(pk=DatasetVersion.ROW_ID)
+    with transaction.atomic(using=using):
+        # One UPDATE, so concurrent bumps still produce distinct, increasing versions
+        if not versions.update(version=Greatest(F('version') + 1, now)):
+            versions.get_or_create(pk=DatasetVersion.ROW_ID, defaults={'version': now})
+        return versions.values_list('version', flat=True).get()
+
+
+def forget_dataset_version():
+    """Drop the cached dataset version, so that the next lookup reads the stored one."""
+    get_cache().delete(DATASET_VERSION_KEY)
+
+
+def dataset_modified_at(version):
+    """
+    Return when the dataset of `version` was last changed, in seconds since the epoch.
+
+    Stored versions are the time of the change in milliseconds (moved on by one when changes
+    share a millisecond), so every process derives the same time from the same version.
+    """
+    return min(version // 1000, int(time.time()))
+
+
+def get_restaurant_count(version):
+    """Return the number of restaurants in the dataset of `version`, counting them once per version."""
+    from .models import Restaurant
+
+    timeout = getattr(settings, 'RESTAURANTS_RESPONSE_CACHE_TIMEOUT', 600)
+    return get_cache().get_or_set(f'restaurants:count:{version}', Restaurant.objects.count, timeout=timeout)
+
+
+def open_response_key(version, minute):
+    """Build the cache key for the /api/open response at a minute of the week."""
+    return f'restaurants:open:{version}:{minute}'
+
+
+def get_open_response(version, minute):
+    """Return the cached JSON body for a minute of the week, or None."""
+    return get_cache().get(open_response_key(version, minute))
+
+
+def set_open_response(version, minute, body):
+    """Cache the JSON body for a minute of the week under the given dataset version."""
+    timeout = getattr(settings, 'RESTAURANTS_RESPONSE_CACHE_TIMEOUT', 600)
+    get_cache().set(open_response_key(version, minute), body, timeout=timeout)
+
+
+async def aget_open_response(version, minute):
+    """Async version of get_open_response()."""
+    cache = get_cache()
+    if is_in_process(cache):
+        return cache.get(open_response_key(version, minute))
+    return await cache.aget(open_response_key(version, minute))
+
+
+async def aset_open_response(version, minute, body):
+    """Async version of set_open_response()."""
+    cache = get_cache()
+    timeout = getattr(settings, 'RESTAURANTS_RESPONSE_CACHE_TIMEOUT', 600)
+    if is_in_process(cache):
+        cache.set(open_response_key(version, minute), body, timeout=timeout)
+    else:
+        await cache.aset(open_response_key(version, minute), body, timeout=timeout)
+
+
+def occupancy_response_key(version, slot_minutes, group_by, output_format):
+    """Build the cache key for a rendered /api/occupancy response."""
+    return f'restaurants:occupancy:{version}:{slot_minutes}:{group_by or ""}:{output_format}'
+
+
+def get_occupancy_response(version, slot_minutes, group_by, output_format):
+    """Return the cached /api/occupancy body for the given parameters, or None."""
+    return get_cache().get(occupancy_response_key(version, slot_minutes, group_by, output_format))
+
+
+def set_occupancy_response(version, slot_minutes, group_by, output_format, body):
+    """Cache the /api/occupancy body for the given parameters under the given dataset version."""
+    timeout = getattr(settings, 'RESTAURANTS_RESPONSE_CACHE_TIMEOUT', 600)
+    get_cache().set(occupancy_response_key(version, slot_minutes, group_by, output_format), body, timeout=timeout)
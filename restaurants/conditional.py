@@ -0,0 +1,58 @@
+from django.apps import apps
+from django.conf import settings
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from .cache import dataset_modified_at
+from .zones import lookup_key
+
+
+def open_etag(version, local):
+    """
+    Build the ETag of the /api/open answer for a local minute of the week under a dataset version.
+
+    The version is the one stored in the database, so every worker sends the same ETag for the
+    same data, and a change made by any process, such as an import, changes it.
+    """
+    return f'"{version}-{lookup_key(local)}"'
+
+
+def is_not_modified(version, local, if_none_match=None, if_modified_since=None):
+    """
+    Return whether a client's cached copy of the answer for a local minute of the week is still current.
+
+    Follows RFC 9110: If-None-Match is compared weakly and, when present, If-Modified-Since is
+    ignored.
+    """
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or open_etag(version, local) in [tag.removeprefix('W/') for tag in etags]
+    if if_modified_since is not None:
+        since = parse_http_date_safe(if_modified_since)
+        return since is not None and dataset_modified_at(version) <= since
+    return False
+
+
+def max_age(local, second, version=None):
+    """
+    Return how many seconds the answer for a time stays the same, capped by RESTAURANTS_OPEN_MAX_AGE.
+
+    Every time up to the next opening or closing boundary has the same open restaurants, so a
+    client asking about the current time can reuse the answer until then. `local` is a minute
+    of the week or the (minute, zones) groups of `zones.local_minutes()`, and the boundaries are
+    those of `version`, by default the current dataset version.
+    """
+    age = getattr(settings, 'RESTAURANTS_OPEN_MAX_AGE', 3600)
+    boundary_index = apps.get_app_config('restaurants').boundary_index
+    for minute in [local] if isinstance(local, int) else [minute for minute, _ in local]:
+        boundary = boundary_index.next_boundary(minute, version)
+        if boundary is not None:
+            age = min(age, (boundary - minute) * 60 - second)
+    return age
+
+
+def validator_headers(version, local, second):
+    """Return the ETag, Last-Modified and Cache-Control headers of the /api/open answer at a time."""
+    return {
+        'ETag': open_etag(version, local),
+        'Last-Modified': http_date(dataset_modified_at(version)),
+        'Cache-Control': f'public, max-age={max_age(local, second, version)}',
+    }
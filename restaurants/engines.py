@@ -0,0 +1,382 @@
+import abc
+import heapq
+import threading
+from collections import namedtuple
+from asgiref.sync import sync_to_async
+
+try:
+    import numpy as np
+except ImportError:  # The numpy engine is optional
+    np = None
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from .cache import aget_dataset_version, get_dataset_version
+from .hours import MINUTES_PER_DAY, MINUTES_PER_WEEK
+from .models import OpeningInterval, Restaurant
+
+ENGINE_ALIASES = {
+    'database': 'restaurants.engines.DatabaseEngine',
+    'memory': 'restaurants.engines.SlotIndexEngine',
+    'numpy': 'restaurants.engines.NumpyEngine',
+    'snapshot': 'restaurants.snapshot.SnapshotEngine',
+}
+
+# For every byte value, the positions of its set bits (used to decode bitsets a byte at a time)
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+# SlotIndexEngine's index: names and per-slot bitsets by restaurant position, and positions by restaurant id
+SlotIndex = namedtuple('SlotIndex', ['names', 'full', 'partial', 'zone_bits', 'positions'])
+# NumpyEngine's index: restaurant arrays by position, and interval arrays sorted by start
+NumpyIndex = namedtuple('NumpyIndex', ['names', 'pks', 'zone_names', 'zone_codes', 'starts', 'ends', 'owners'])
+
+
+def sweep_open_ids(intervals, minutes):
+    """
+    Find the restaurants open at each of several minutes in one pass over the intervals.
+
+    `intervals` are (start, end, restaurant id) tuples sorted by start and `minutes` is sorted
+    ascending. Returns a dict from each minute to the sorted ids of the restaurants open then.
+    """
+    intervals = iter(intervals)
+    pending = next(intervals, None)
+    ending = []  # Heap of (end, restaurant id) for the intervals that have started
+    open_ids = set()
+    results = {}
+    for minute in minutes:
+        # Drop intervals that have ended before adding new ones: a restaurant's own intervals never overlap
+        while ending and ending[0][0] <= minute:
+            open_ids.discard(heapq.heappop(ending)[1])
+        while pending is not None and pending[0] <= minute:
+            start, end, restaurant_id = pending
+            if end > minute:
+                heapq.heappush(ending, (end, restaurant_id))
+                open_ids.add(restaurant_id)
+            pending = next(intervals, None)
+        results[minute] = sorted(open_ids)
+    return results
+
+
+def load_engine():
+    """Instantiate the engine named by the RESTAURANTS_OPEN_ENGINE setting."""
+    name = getattr(settings, 'RESTAURANTS_OPEN_ENGINE', 'database')
+    return import_string(ENGINE_ALIASES.get(name, name))()
+
+
+class DatabaseEngine:
+    """Answers open-restaurant lookups with an indexed query against the opening intervals."""
+    # Restaurant ids bound per query, below the parameter limits of every supported database
+    ID_CHUNK_SIZE = 900
+
+    def open_restaurant_names(self, minute):
+        """Return the names of the restaurants open at the given minute of the week, in id order."""
+        queryset = OpeningInterval.objects.open_at(minute).order_by('restaurant_id')
+        return list(queryset.values_list('restaurant__name', flat=True))
+
+    async def aopen_restaurant_names(self, minute, version=None):
+        """Async version of open_restaurant_names(), using the async ORM. Every query reads the current data."""
+        queryset = OpeningInterval.objects.open_at(minute).order_by('restaurant_id')
+        return [name async for name in queryset.values_list('restaurant__name', flat=True)]
+
+    def open_restaurant_names_in_zones(self, groups):
+        """Return the names of the restaurants open at each (minute, zones) group's minute in its zones, in id order."""
+        queryset = OpeningInterval.objects.open_in_zones(groups).order_by('restaurant_id')
+        return list(queryset.values_list('restaurant__name', flat=True))
+
+    def open_restaurant_names_among(self, local, restaurant_ids):
+        """Return the names of the restaurants among `restaurant_ids` that are open at `local`, in id order."""
+        rows = []
+        for start in range(0, len(restaurant_ids), self.ID_CHUNK_SIZE):
+            queryset = OpeningInterval.objects.open_at_local(local).filter(
+                restaurant_id__in=restaurant_ids[start:start + self.ID_CHUNK_SIZE]
+            )
+            rows.extend(queryset.values_list('restaurant_id', 'restaurant__name'))
+        return [name for _, name in sorted(rows)]
+
+    def open_restaurant_names_many(self, minutes):
+        """Return a dict from each of several minutes of the week to the names of the restaurants open then."""
+        minutes = sorted(set(minutes))
+        if len(minutes) == 1:
+            return {minutes[0]: self.open_restaurant_names(minutes[0])}
+
+        # Load only the intervals that can contain one of the minutes, once for the whole batch
+        names = dict(Restaurant.objects.values_list('pk', 'name'))
+        intervals = OpeningInterval.objects.filter(start__lte=minutes[-1], end__gt=minutes[0]).order_by('start')
+        open_ids = sweep_open_ids(intervals.values_list('start', 'end', 'restaurant_id').iterator(), minutes)
+        return {minute: [names[pk] for pk in ids] for minute, ids in open_ids.items()}
+
+    def invalidate(self):
+        """Nothing is held in memory, so there is nothing to drop."""
+
+
+class CachedIndex(abc.ABC):
+    """
+    Base class for indexes of the restaurant data held in this process.
+
+    Subclasses implement `build()`. The index is built lazily on first use and rebuilt after
+    `invalidate()` or when the dataset version changes, which is how changes made by other
+    processes are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versioned_index = None
+        self._generation = 0
+
+    def invalidate(self):
+        """Drop the index so that it is rebuilt from the database on the next lookup."""
+        self._generation += 1
+        self._versioned_index = None
+
+    async def aready(self, version=None):
+        """
+        Make sure the index for `version` (by default the current dataset version) is built without blocking
+        the event loop.
+
+        Lookups given the same version then only use memory, so they can run on the event loop.
+        Building the index queries the database and is handed to a thread instead.
+        """
+        if version is None:
+            version = await aget_dataset_version()
+        versioned_index = self._versioned_index
+        if versioned_index is None or versioned_index[0] != version:
+            await sync_to_async(self._get_index)(version)
+
+    @abc.abstractmethod
+    def build(self):
+        """Read the restaurant data and return the index used by the lookups."""
+
+    def _get_index(self, version=None):
+        # Async callers pass the version they read, as reading it here may query the database
+        if version is None:
+            version = get_dataset_version()
+        versioned_index = self._versioned_index
+        if versioned_index is None or versioned_index[0] != version:
+            with self._lock:
+                versioned_index = self._versioned_index
+                if versioned_index is None or versioned_index[0] != version:
+                    generation = self._generation
+                    versioned_index = (version, self.build())
+                    # Only keep the index if nothing was invalidated while it was being built
+                    if generation == self._generation:
+                        self._versioned_index = versioned_index
+        return versioned_index[1]
+
+
+class InMemoryEngine(CachedIndex):
+    """Base class for open-hours engines that answer lookups from an index held in this process."""
+
+    def open_restaurant_names_many(self, minutes):
+        """Return a dict from each of several minutes of the week to the names of the restaurants open then."""
+        return {minute: self.open_restaurant_names(minute) for minute in set(minutes)}
+
+    async def aopen_restaurant_names(self, minute, version=None):
+        """Async version of open_restaurant_names(), answering from the index for `version` once it is built."""
+        if version is None:
+            version = await aget_dataset_version()
+        await self.aready(version)
+        return self.open_restaurant_names(minute, version)
+
+
+class SlotIndexEngine(InMemoryEngine):
+    """
+    Answers open-restaurant lookups from an in-process index of the week.
+
+    The week is divided into fixed slots and each slot keeps a bitset (a Python int) of the
+    restaurants open for the whole slot. Intervals that start or end inside a slot are kept
+    on a short per-slot list and checked exactly, so answers match the database to the minute.
+    Memory is roughly SLOT_COUNT / 8 bytes per restaurant, so very large catalogs should use
+    the database engine.
+    """
+    SLOT_MINUTES = 5
+    SLOT_COUNT = MINUTES_PER_WEEK // SLOT_MINUTES
+
+    def open_restaurant_names(self, minute, version=None):
+        """Return the names of the restaurants open at the given minute of the week, in id order."""
+        index = self._get_index(version)
+        return [index.names[position] for position in self.decode(self.open_bits(index, minute))]
+
+    def open_restaurant_names_in_zones(self, groups):
+        """Return the names of the restaurants open at each (minute, zones) group's minute in its zones, in id order."""
+        index = self._get_index()
+        return [index.names[position] for position in self.decode(self.zone_open_bits(index, groups))]
+
+    def open_restaurant_names_among(self, local, restaurant_ids):
+        """Return the names of the restaurants among `restaurant_ids` that are open at `local`, in id order."""
+        index = self._get_index()
+        bits = self.open_bits(index, local) if isinstance(local, int) else self.zone_open_bits(index, local)
+        # Test the few candidates against the bytes of the bitset rather than building a mask as large as it
+        state = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        found = []
+        for restaurant_id in restaurant_ids:
+            position = index.positions.get(restaurant_id)
+            if position is not None and position >> 3 < len(state) and state[position >> 3] >> (position & 7) & 1:
+                found.append(index.names[position])
+        return found
+
+    def open_bits(self, index, minute):
+        """Return the bitset of the restaurants open at a minute of the week."""
+        slot = minute // self.SLOT_MINUTES
+        bits = index.full[slot]
+        for position, start, end in index.partial[slot]:
+            if start <= minute < end:
+                bits |= 1 << position
+        return bits
+
+    def zone_open_bits(self, index, groups):
+        """Return the bitset of the restaurants open at each (minute, zones) group's minute in its zones."""
+        bits = 0
+        for minute, zones in groups:
+            in_zones = 0
+            for zone in zones:
+                in_zones |= index.zone_bits.get(zone, 0)
+            bits |= self.open_bits(index, minute) & in_zones
+        return bits
+
+    @staticmethod
+    def decode(bits):
+        """Yield the positions of the set bits in ascending order."""
+        for offset, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+            if byte:
+                base = offset * 8
+                for bit in BYTE_BITS[byte]:
+                    yield base + bit
+
+    def build(self):
+        """Read the opening intervals and build the SlotIndex."""
+        # Intervals are read first so that every restaurant they belong to is either read too or was deleted
+        intervals = list(OpeningInterval.objects.values_list('restaurant_id', 'start', 'end'))
+        restaurants = list(Restaurant.objects.order_by('pk').values_list('pk', 'name', 'tz'))
+        positions = {pk: position for position, (pk, _, _) in enumerate(restaurants)}
+        names = [name for _, name, _ in restaurants]
+        zone_bytes = {}
+        for position, (_, _, zone) in enumerate(restaurants):
+            if zone not in zone_bytes:
+                zone_bytes[zone] = bytearray((len(names) + 7) // 8)
+            zone_bytes[zone][position >> 3] |= 1 << (position & 7)
+        zone_bits = {zone: int.from_bytes(state, 'little') for zone, state in zone_bytes.items()}
+
+        # Sweep the week once: bits are set where an interval starts covering whole slots
+        # and cleared where it stops, so each slot's bitset is a snapshot of the running state
+        sets = [[] for _ in range(self.SLOT_COUNT + 1)]
+        clears = [[] for _ in range(self.SLOT_COUNT + 1)]
+        partial = [[] for _ in range(self.SLOT_COUNT)]
+        for restaurant_id, start, end in intervals:
+            position = positions.get(restaurant_id)
+            if position is None:
+                continue
+            first_full = -(-start // self.SLOT_MINUTES)
+            end_full = end // self.SLOT_MINUTES
+            if first_full < end_full:
+                sets[first_full].append(position)
+                clears[end_full].append(position)
+            if start % self.SLOT_MINUTES:
+                partial[start // self.SLOT_MINUTES].append((position, start, end))
+            if end % self.SLOT_MINUTES and end // self.SLOT_MINUTES >= first_full:
+                partial[end // self.SLOT_MINUTES].append((position, start, end))
+
+        state = bytearray((len(names) + 7) // 8)
+        full = []
+        for slot in range(self.SLOT_COUNT):
+            # Clear before setting: a restaurant can close and reopen on the same slot boundary
+            for position in clears[slot]:
+                state[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+            for position in sets[slot]:
+                state[position >> 3] |= 1 << (position & 7)
+            full.append(int.from_bytes(state, 'little'))
+        return SlotIndex(names, full, partial, zone_bits, positions)
+
+
+class NumpyEngine(InMemoryEngine):
+    """
+    Answers open-restaurant lookups with vectorized comparisons over contiguous NumPy arrays.
+
+    Every opening interval is stored in parallel arrays of starts, ends and owner positions,
+    sorted by start. Intervals never cross midnight, so the candidates for a minute are the
+    intervals starting between the beginning of its day and the minute itself: two
+    `np.searchsorted` calls find them and one comparison against their ends filters them.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImproperlyConfigured("The 'numpy' open-hours engine requires numpy to be installed.")
+        super().__init__()
+
+    def open_restaurant_names(self, minute, version=None):
+        """Return the names of the restaurants open at the given minute of the week, in id order."""
+        return self.open_restaurant_names_many([minute], version)[minute]
+
+    def open_restaurant_names_many(self, minutes, version=None):
+        """Return a dict from each of several minutes of the week to the names of the restaurants open then."""
+        index = self._get_index(version)
+        open_positions = self.open_positions(index, np.unique(np.asarray(minutes, dtype=np.int32)))
+        return {minute: self.names_at(index, np.sort(positions)) for minute, positions in open_positions}
+
+    def open_restaurant_names_in_zones(self, groups):
+        """Return the names of the restaurants open at each (minute, zones) group's minute in its zones, in id order."""
+        index = self._get_index()
+        return self.names_at(index, np.sort(self.zone_positions(index, groups)))
+
+    def open_restaurant_names_among(self, local, restaurant_ids):
+        """Return the names of the restaurants among `restaurant_ids` that are open at `local`, in id order."""
+        index = self._get_index()
+        pks = index.pks
+        is_open = np.zeros(len(pks), dtype=bool)
+        if isinstance(local, int):
+            is_open[next(self.open_positions(index, [local]))[1]] = True
+        else:
+            is_open[self.zone_positions(index, local)] = True
+        ids = np.asarray(restaurant_ids, dtype=np.int64)
+        candidates = np.searchsorted(pks, ids)
+        known = candidates < len(pks)
+        candidates = candidates[known][pks[candidates[known]] == ids[known]]
+        return self.names_at(index, np.sort(candidates[is_open[candidates]]))
+
+    def names_at(self, index, positions):
+        """Return the names of the restaurants at `positions`, in that order."""
+        return index.names[positions].tolist()
+
+    def zone_positions(self, index, groups):
+        """Return the unsorted positions of the restaurants open at each (minute, zones) group's minute in its zones."""
+        codes = {zone: code for code, zone in enumerate(index.zone_names)}
+        found = [np.empty(0, dtype=np.int32)]
+        for (_, zones), (_, positions) in zip(groups, self.open_positions(index, [minute for minute, _ in groups])):
+            group_codes = [codes[zone] for zone in zones if zone in codes]
+            found.append(positions[np.isin(index.zone_codes[positions], group_codes)])
+        return np.concatenate(found)
+
+    def open_positions(self, index, minutes):
+        """Yield (minute, unsorted positions of the restaurants open then) for each of the minutes, in order."""
+        starts, ends, owners = index.starts, index.ends, index.owners
+        minutes = np.asarray(minutes, dtype=np.int32)
+        # Locate the candidate interval range of every minute with one searchsorted call per bound
+        lows = np.searchsorted(starts, minutes - minutes % MINUTES_PER_DAY, side='left')
+        highs = np.searchsorted(starts, minutes, side='right')
+        for minute, low, high in zip(minutes.tolist(), lows.tolist(), highs.tolist()):
+            yield minute, owners[low:high][ends[low:high] > minute]
+
+    def build(self):
+        """Read the restaurants and their intervals into the NumpyIndex."""
+        # Intervals are read first so that every restaurant they belong to is either read too or was deleted
+        intervals = OpeningInterval.objects.order_by('start').values_list('start', 'end', 'restaurant_id')
+        rows = np.fromiter(
+            intervals.iterator(chunk_size=10000),
+            dtype=[('start', np.int32), ('end', np.int32), ('restaurant_id', np.int64)],
+        )
+        restaurants = list(Restaurant.objects.order_by('pk').values_list('pk', 'name', 'tz'))
+        pks = np.fromiter((pk for pk, _, _ in restaurants), dtype=np.int64, count=len(restaurants))
+        names = np.empty(len(restaurants), dtype=object)
+        names[:] = [name for _, name, _ in restaurants]
+        # Each restaurant's zone as a small integer code into the sorted zone names
+        zones = np.array([zone for _, _, zone in restaurants], dtype=object)
+        zone_names, zone_codes = np.unique(zones, return_inverse=True)
+
+        # Restaurant ids are sorted, so their positions can be found by binary search
+        owners = np.searchsorted(pks, rows['restaurant_id'])
+        found = owners < len(pks)
+        found[found] = pks[owners[found]] == rows['restaurant_id'][found]
+        rows, owners = rows[found], owners[found].astype(np.int32)
+        return NumpyIndex(
+            names, pks, zone_names.tolist(), zone_codes.astype(np.int32),
+            np.ascontiguousarray(rows['start']), np.ascontiguousarray(rows['end']), owners,
+        )
@@ -0,0 +1,139 @@
+import json
+from urllib.parse import parse_qs
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+from django.apps import apps
+from django.conf import settings
+from django.core import signals
+from . import cache, metrics, zones
+from .conditional import is_not_modified, validator_headers
+from .views import DatetimeParamMixin
+
+OPEN_PATH = '/restaurants/api/open'
+RESPONSE_HEADERS = [('Content-Type', 'application/json'), ('X-Content-Type-Options', 'nosniff')]
+STATUS_LINES = {200: '200 OK', 304: '304 Not Modified', 400: '400 Bad Request'}
+
+datetime_params = DatetimeParamMixin()
+
+
+def dumps(data):
+    """Serialize to compact UTF-8 JSON bytes, like DRF's JSONRenderer."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def open_response(query_string, if_none_match=None, if_modified_since=None):
+    """
+    Answer an /api/open query string with a (status code, headers, body) triple.
+
+    Does the same validation, conditional request handling, caching and lookup as
+    `RestaurantListAPIView`, without DRF or any middleware. Pagination, streaming and location
+    filtering are left to the full view.
+    """
+    watch = metrics.OPEN_STAGE_SECONDS.stopwatch()
+    values = parse_qs(query_string).get('datetime')
+    try:
+        datetime_obj = datetime_params.parse_datetime_str(values[-1] if values else None)
+        local = datetime_params.local_minutes(datetime_obj)
+    except ValueError as e:
+        return 400, RESPONSE_HEADERS, dumps({"error": str(e)})
+    watch.lap('parse')
+    version = cache.get_dataset_version()
+    headers = list(validator_headers(version, local, datetime_obj.second).items())
+    not_modified = is_not_modified(version, local, if_none_match, if_modified_since)
+    watch.lap('revalidate')
+    if not_modified:
+        return 304, headers, b''
+
+    body = cache.get_open_response(version, zones.lookup_key(local))
+    watch.lap('cache_get')
+    metrics.OPEN_RESPONSE_CACHE.inc('miss' if body is None else 'hit')
+    if body is None:
+        engine = apps.get_app_config('restaurants').open_hours_engine
+        open_restaurant_names = zones.open_restaurant_names(engine, local)
+        watch.lap('lookup')
+        body = dumps({"open_restaurants": open_restaurant_names})
+        watch.lap('serialize')
+        cache.set_open_response(version, zones.lookup_key(local), body)
+        watch.lap('cache_set')
+        if metrics.is_enabled():
+            metrics.record_lookup('all', cache.get_restaurant_count(version), len(open_restaurant_names))
+    return 200, RESPONSE_HEADERS + headers, body
+
+
+def is_fast_path(path, query_string):
+    """Return whether a request can be answered by the fast path rather than the Django application."""
+    if path != OPEN_PATH:
+        return False
+    params = parse_qs(query_string)
+    return not any(param in params for param in ('limit', 'cursor', 'stream', 'lat', 'lng', 'radius'))
+
+
+def fast_path_wsgi(application):
+    """
+    Wrap a WSGI application so that plain /api/open lookups skip Django's middleware and DRF.
+
+    Django's request_started and request_finished signals are still sent, so database
+    connections are managed as usual.
+    """
+    def app(environ, start_response):
+        query_string = environ.get('QUERY_STRING', '')
+        if environ['REQUEST_METHOD'] != 'GET' or not is_fast_path(environ.get('PATH_INFO'), query_string):
+            return application(environ, start_response)
+
+        signals.request_started.send(sender=fast_path_wsgi, environ=environ)
+        try:
+            with metrics.OPEN_STAGE_SECONDS.time('fast_path'):
+                status_code, headers, body = open_response(
+                    query_string, environ.get('HTTP_IF_NONE_MATCH'), environ.get('HTTP_IF_MODIFIED_SINCE')
+                )
+        finally:
+            signals.request_finished.send(sender=fast_path_wsgi)
+        start_response(STATUS_LINES[status_code], headers + [('Content-Length', str(len(body)))])
+        return [body]
+
+    return app
+
+
+def fast_path_asgi(application):
+    """Wrap an ASGI application so that plain /api/open lookups skip Django's middleware and DRF."""
+    from asgiref.sync import sync_to_async
+
+    def respond(query_string, request_headers):
+        signals.request_started.send(sender=fast_path_asgi, scope=None)
+        try:
+            with metrics.OPEN_STAGE_SECONDS.time('fast_path'):
+                return open_response(
+                    query_string, request_headers.get(b'if-none-match'), request_headers.get(b'if-modified-since')
+                )
+        finally:
+            signals.request_finished.send(sender=fast_path_asgi)
+
+    async def app(scope, receive, send):
+        query_string = scope.get('query_string', b'').decode('latin-1')
+        if scope['type'] != 'http' or scope['method'] != 'GET' or not is_fast_path(scope['path'], query_string):
+            return await application(scope, receive, send)
+
+        # Lookups may query the database, so they run in a thread like Django's synchronous views
+        request_headers = {name: value.decode('latin-1') for name, value in scope.get('headers', [])}
+        status_code, headers, body = await sync_to_async(respond)(query_string, request_headers)
+        headers = [(name.encode(), value.encode()) for name, value in headers]
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': headers + [(b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    return app
+
+
+def wrap_application(application, protocol):
+    """Apply the fast path to a WSGI or ASGI application when RESTAURANTS_OPEN_FAST_PATH is enabled."""
+    if not getattr(settings, 'RESTAURANTS_OPEN_FAST_PATH', False):
+        return application
+    return fast_path_asgi(application) if protocol == 'asgi' else fast_path_wsgi(application)
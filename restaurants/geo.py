@@ -0,0 +1,84 @@
+import math
+from array import array
+from django.conf import settings
+from .engines import CachedIndex
+from .models import Restaurant
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Return the great-circle distance between two points, in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoGridIndex(CachedIndex):
+    """
+    Finds the restaurants within a radius of a point, using a grid of latitude/longitude cells.
+
+    Restaurants are sorted by cell into flat arrays of ids and coordinates, and each occupied
+    cell maps to its slice. A query visits only the cells overlapping the circle's bounding box
+    (wrapping across the antimeridian) and checks exact distances for the restaurants in them.
+    Restaurants without coordinates are left out.
+    """
+
+    def __init__(self, cell_degrees=None):
+        super().__init__()
+        self.cell_degrees = cell_degrees or getattr(settings, 'RESTAURANTS_GEO_CELL_DEGREES', 0.05)
+        self.columns = math.ceil(360 / self.cell_degrees)
+
+    def restaurant_ids_within(self, lat, lng, radius_km):
+        """Return the sorted ids of the restaurants within `radius_km` of (lat, lng)."""
+        cells, ids, lats, lngs = self._get_index()
+        lat_reach = radius_km / KM_PER_DEGREE
+        min_row = self.row(max(-90.0, lat - lat_reach))
+        max_row = self.row(min(90.0, lat + lat_reach))
+        # Longitude degrees shrink towards the poles; near them every column may be in reach
+        cos_lat = math.cos(math.radians(min(90.0, abs(lat) + lat_reach)))
+        if cos_lat <= 0 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            columns = range(self.columns)
+        else:
+            lng_reach = radius_km / (KM_PER_DEGREE * cos_lat)
+            first, last = self.column(lng - lng_reach), self.column(lng + lng_reach)
+            columns = range(first, last + 1) if first <= last else [*range(first, self.columns), *range(last + 1)]
+
+        found = []
+        for row in range(min_row, max_row + 1):
+            for column in columns:
+                span = cells.get(row * self.columns + column)
+                if span is None:
+                    continue
+                for position in range(*span):
+                    if haversine_km(lat, lng, lats[position], lngs[position]) <= radius_km:
+                        found.append(ids[position])
+        found.sort()
+        return found
+
+    def row(self, lat):
+        """Return the grid row of a latitude."""
+        return min(int((lat + 90) // self.cell_degrees), math.ceil(180 / self.cell_degrees) - 1)
+
+    def column(self, lng):
+        """Return the grid column of a longitude, wrapping around the antimeridian."""
+        return int(((lng + 180) % 360) // self.cell_degrees) % self.columns
+
+    def build(self):
+        """Read the coordinates and build the (cell slices, ids, latitudes, longitudes) index."""
+        located = Restaurant.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        rows = sorted(
+            (self.row(lat) * self.columns + self.column(lng), pk, lat, lng)
+            for pk, lat, lng in located.values_list('pk', 'latitude', 'longitude').iterator(chunk_size=10000)
+        )
+        cells = {}
+        for position, (cell, _, _, _) in enumerate(rows):
+            start, _ = cells.get(cell, (position, position))
+            cells[cell] = (start, position + 1)
+        return (
+            cells,
+            array('q', (pk for _, pk, _, _ in rows)),
+            array('d', (lat for _, _, lat, _ in rows)),
+            array('d', (lng for _, _, _, lng in rows)),
+        )
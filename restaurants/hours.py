@@ -0,0 +1,422 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, time
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DAY_MAP = {
+    'Mon': 'Monday', 'Tues': 'Tuesday', 'Wed': 'Wednesday', 'Thu': 'Thursday',
+    'Fri': 'Friday', 'Sat': 'Saturday', 'Sun': 'Sunday'
+}
+DAY_KEYS = list(DAY_MAP.keys())
+WEEKDAYS = list(DAY_MAP.values())
+NEXT_DAY = dict(zip(WEEKDAYS, WEEKDAYS[1:] + WEEKDAYS[:1]))
+
+# Day words accepted by the hours compiler, lowercased, mapped to weekday numbers
+DAY_ALIASES = {
+    **{key.lower(): weekday for weekday, key in enumerate(DAY_KEYS)},
+    **{name.lower(): weekday for weekday, name in enumerate(WEEKDAYS)},
+    'tue': 1, 'thur': 3, 'thurs': 3,
+}
+
+# Regex to find day ranges and times
+# 1. ([A-Za-z,\s-]+): Captures the days of the week or ranges (e.g., "Mon-Fri")
+# 2. \s+: Matches the space between the days and times
+# 3. ([\d:\sampm-]+): Captures the time range (e.g., "11:00 am - 10:00 pm")
+DAY_TIME_PATTERN = re.compile(r'([A-Za-z,\s-]+)\s+([\d:\sampm-]+)')
+
+MIDNIGHT = time(0, 0)
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def parse_time(time_str):
+    """Convert time string like '11:00 am' or '12:30 pm' or '10 pm' into a datetime.time object."""
+    try:
+        return datetime.strptime(time_str.strip(), '%I:%M %p').time()
+    except ValueError:
+        return datetime.strptime(time_str.strip(), '%I %p').time()
+
+
+def parse_hours(hours_str):
+    """Parse the hours string into a structured format, reusing cached schedules for repeated strings."""
+    return {day: list(spans) for day, spans in schedule_cache.get(hours_str).hours.items()}
+
+
+def regex_parse_hours(hours_str):
+    """
+    Parse the hours string with the original regex and strptime parser.
+
+    Parts that don't match are skipped silently and wrap-around day ranges such as 'Sat-Mon' come
+    out empty. Schedules are compiled by `parse_schedule()`; this is kept as the baseline of
+    `benchmark parse_hours`.
+    """
+    hours_dict = {day: [] for day in DAY_MAP.values()}
+
+    for part in hours_str.split('/'):
+        match = DAY_TIME_PATTERN.search(part.strip())
+        if match:
+            days_str, times_str = match.groups()
+            open_time, close_time = map(parse_time, times_str.split('-'))
+
+            day_range = expand_day_range(days_str, DAY_MAP)
+            for full_day in day_range:
+                hours_dict[full_day].append((open_time, close_time))
+
+                # Handle closing time that extends past midnight (closing at midnight itself spills nothing)
+                if close_time <= open_time and close_time != MIDNIGHT:
+                    next_day = get_next_day(full_day)
+                    hours_dict[next_day].append((MIDNIGHT, close_time))
+
+    return hours_dict
+
+
+class HoursSyntaxError(ValueError):
+    """An hours string that doesn't follow the grammar, with the position of the offending character."""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+Span = namedtuple('Span', ['days', 'open_minute', 'close_minute', 'text'])
+
+
+def tokenize_hours(hours_str):
+    """
+    Split an hours string into (kind, value, position, text) tokens in a single pass.
+
+    Kinds are 'day', with a weekday number as value, 'time', with minutes since midnight (so
+    '11:30 pm' is one token), and the punctuation '-', ',' and '/'. Raises HoursSyntaxError on
+    anything else. Tokens are plain tuples, which are noticeably cheaper to create than namedtuples.
+    """
+    position, length = 0, len(hours_str)
+    while position < length:
+        char = hours_str[position]
+        if char.isspace():
+            position += 1
+        elif char in '-,/':
+            yield char, char, position, char
+            position += 1
+        elif '0' <= char <= '9':
+            start = position
+            while position < length and '0' <= hours_str[position] <= '9':
+                position += 1
+            hour, minute = int(hours_str[start:position]), 0
+            if position < length and hours_str[position] == ':':
+                minute_start = position = position + 1
+                while position < length and '0' <= hours_str[position] <= '9':
+                    position += 1
+                if position - minute_start != 2:
+                    raise HoursSyntaxError("expected two-digit minutes", minute_start)
+                minute = int(hours_str[minute_start:position])
+            while position < length and hours_str[position] == ' ':
+                position += 1
+            meridiem = hours_str[position:position + 2].lower()
+            if meridiem not in ('am', 'pm') or hours_str[position + 2:position + 3].isalpha():
+                raise HoursSyntaxError("expected 'am' or 'pm'", position)
+            position += 2
+            text = hours_str[start:position]
+            if not 1 <= hour <= 12 or minute > 59:
+                raise HoursSyntaxError(f"invalid time {text!r}", start)
+            yield 'time', (hour % 12 + (12 if meridiem == 'pm' else 0)) * 60 + minute, start, text
+        elif char.isalpha():
+            start = position
+            while position < length and hours_str[position].isalpha():
+                position += 1
+            word = hours_str[start:position]
+            if word.lower() not in DAY_ALIASES:
+                raise HoursSyntaxError(f"unknown day {word!r}", start)
+            yield 'day', DAY_ALIASES[word.lower()], start, word
+        else:
+            raise HoursSyntaxError(f"unexpected {char!r}", position)
+
+
+def parse_schedule(hours_str):
+    """
+    Parse an hours string into Spans of (weekdays, opening minute, closing minute), strictly.
+
+    The grammar is a '/'-separated list of groups, each a comma-separated list of days or day
+    ranges followed by a comma-separated list of time ranges:
+
+        Mon-Thu, Sun 11:30 am - 10 pm  / Fri-Sat 11:30 am - 12:30 am, 2 am - 4 am
+
+    Day ranges may wrap past Sunday ('Sat-Mon'). Raises HoursSyntaxError at the first token
+    that doesn't fit, so nothing is skipped silently.
+    """
+    tokens = list(tokenize_hours(hours_str))
+    # Two end tokens, so that looking one token ahead never runs off the list
+    tokens += [('end', None, len(hours_str), 'end of hours')] * 2
+    index = 0
+
+    def expect(kind, description):
+        nonlocal index
+        token = tokens[index]
+        if token[0] != kind:
+            found = 'end of hours' if token[0] == 'end' else repr(token[3])
+            raise HoursSyntaxError(f"expected {description}, found {found}", token[2])
+        index += 1
+        return token
+
+    spans = []
+    while True:
+        days = []
+        while True:
+            first = last = expect('day', 'a day')[1]
+            if tokens[index][0] == '-':
+                index += 1
+                last = expect('day', "a day after '-'")[1]
+            days.extend((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+            if tokens[index][0] == ',' and tokens[index + 1][0] == 'day':
+                index += 1
+            else:
+                break
+
+        while True:
+            _, open_minute, start, _ = expect('time', 'an opening time')
+            expect('-', "'-' between opening and closing times")
+            _, close_minute, end, close_text = expect('time', 'a closing time')
+            spans.append(Span(tuple(days), open_minute, close_minute, hours_str[start:end + len(close_text)]))
+            if tokens[index][0] == ',':
+                index += 1
+            else:
+                break
+
+        if tokens[index][0] == 'end':
+            return spans
+        expect('/', "'/' or the end of the hours")
+
+
+def schedule_hours(spans):
+    """Lay out parsed Spans as lists of (opening, closing) times per day name, like `check_open_hours` expects."""
+    hours_dict = {day: [] for day in WEEKDAYS}
+    for span in spans:
+        open_time = time(*divmod(span.open_minute, 60))
+        close_time = time(*divmod(span.close_minute, 60))
+        for weekday in span.days:
+            hours_dict[WEEKDAYS[weekday]].append((open_time, close_time))
+            # Closing at midnight itself spills nothing into the next day
+            if span.close_minute <= span.open_minute and span.close_minute != 0:
+                hours_dict[WEEKDAYS[(weekday + 1) % 7]].append((MIDNIGHT, close_time))
+    return hours_dict
+
+
+def schedule_warnings(spans):
+    """Describe what is ambiguous about parsed Spans: equal opening and closing times, and overlapping hours."""
+    warnings = []
+    segments = {weekday: [] for weekday in range(7)}
+    for span in spans:
+        if span.open_minute == span.close_minute:
+            warnings.append(f"{span.text!r} opens and closes at the same time; read as open 24 hours")
+        for weekday in span.days:
+            if span.close_minute <= span.open_minute:
+                segments[weekday].append((span.open_minute, MINUTES_PER_DAY))
+                segments[(weekday + 1) % 7].append((0, span.close_minute))
+            else:
+                segments[weekday].append((span.open_minute, span.close_minute))
+
+    for weekday, day_segments in segments.items():
+        day_segments.sort()
+        if any(start < end for (_, end), (start, _) in zip(day_segments, day_segments[1:])):
+            warnings.append(f"{DAY_KEYS[weekday]} hours overlap")
+    return warnings
+
+
+def get_next_day(current_day):
+    """Get the next day of the week given the current day."""
+    return NEXT_DAY[current_day]
+
+
+def expand_day_range(days_str, day_map):
+    """Expand a day range like 'Mon-Fri' into a list of full day names."""
+    days = days_str.split(', ')
+    day_keys, day_names = (DAY_KEYS, WEEKDAYS) if day_map is DAY_MAP else (list(day_map), list(day_map.values()))
+    expanded_days = []
+    for day in days:
+        if '-' in day:
+            start_day, end_day = day.split('-')
+            start = day_keys.index(start_day)
+            end = day_keys.index(end_day) + 1
+            expanded_days.extend(day_names[start:end])
+        else:
+            expanded_days.append(day_map[day.strip()])
+    return expanded_days
+
+
+def check_open_hours(parsed_hours, datetime_obj, zone=None):
+    """
+    Check if a restaurant is open on the given datetime.
+
+    Hours are wall-clock times in the restaurant's `zone`. Aware datetimes are converted to it
+    first; naive ones are taken as local times already.
+    """
+    if zone is not None and datetime_obj.tzinfo is not None:
+        datetime_obj = datetime_obj.astimezone(get_zone(zone))
+    day_of_week = WEEKDAYS[datetime_obj.weekday()]
+    time_of_day = datetime_obj.time()
+
+    if is_within_open_hours(parsed_hours.get(day_of_week, []), time_of_day):
+        return True
+
+    return False
+
+
+def is_within_open_hours(hours_list, time_of_day):
+    """Check if the given time is within any open hours for a specific day."""
+    for open_time, close_time in hours_list:
+        if close_time <= open_time:
+            # Handle hours that extend past midnight
+            if open_time <= time_of_day or time_of_day < close_time:
+                return True
+        elif open_time <= time_of_day <= close_time:
+            return True
+    return False
+
+
+def minute_of_week(datetime_obj):
+    """
+    Convert a datetime into minutes since Monday 00:00, truncating seconds.
+
+    Lookups are made at this minute, so a time inside a restaurant's closing minute counts as open
+    (17:00:30 for a 5 pm close), where `is_within_open_hours` compares the full time and says closed.
+    """
+    return datetime_obj.weekday() * MINUTES_PER_DAY + datetime_obj.hour * 60 + datetime_obj.minute
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """Return the ZoneInfo for an IANA time zone name, raising ValueError for unknown zones."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"unknown time zone {name!r}")
+
+
+def week_intervals(parsed_hours):
+    """
+    Flatten parsed hours into sorted, non-overlapping (weekday, start, end) intervals.
+
+    `start` and `end` are minutes since Monday 00:00 and `end` is exclusive. Every interval lies
+    within a single day, so spans that wrap past midnight are split at the day boundary. The
+    intervals reproduce `is_within_open_hours` at minute resolution: same-day spans include the
+    closing minute, while wrapped spans close before it.
+    """
+    intervals = []
+    for weekday, day in enumerate(WEEKDAYS):
+        base = weekday * MINUTES_PER_DAY
+        spans = []
+        for open_time, close_time in parsed_hours.get(day, []):
+            open_minute = open_time.hour * 60 + open_time.minute
+            close_minute = close_time.hour * 60 + close_time.minute
+            if close_minute <= open_minute:
+                spans.append((open_minute, MINUTES_PER_DAY))
+                spans.append((0, close_minute))
+            else:
+                spans.append((open_minute, close_minute + 1))
+
+        merged = []
+        for start, end in sorted(span for span in spans if span[0] < span[1]):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        intervals.extend((weekday, base + start, base + end) for start, end in merged)
+    return intervals
+
+
+CompiledSchedule = namedtuple('CompiledSchedule', ['hours', 'intervals', 'warnings'])
+
+
+def compile_schedule(hours_str):
+    """Parse an hours string into its per-day spans, week-minute intervals and ambiguity warnings."""
+    spans = parse_schedule(hours_str)
+    parsed_hours = schedule_hours(spans)
+    return CompiledSchedule(
+        hours={day: tuple(day_spans) for day, day_spans in parsed_hours.items()},
+        intervals=tuple(week_intervals(parsed_hours)),
+        warnings=tuple(schedule_warnings(spans)),
+    )
+
+
+class ScheduleCache:
+    """
+    A thread-safe LRU cache of compiled schedules keyed by the raw hours string.
+
+    Chains share hours strings, so most lookups are hits. Strings that fail to parse are not cached.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, hours_str):
+        """Return the compiled schedule for `hours_str`, compiling it on a miss."""
+        with self._lock:
+            schedule = self._entries.get(hours_str)
+            if schedule is not None:
+                self._entries.move_to_end(hours_str)
+                self.hits += 1
+                return schedule
+            self.misses += 1
+
+        # Compile outside the lock; two threads racing on the same string just both compile it
+        schedule = compile_schedule(hours_str)
+        with self._lock:
+            self._entries[hours_str] = schedule
+            self._entries.move_to_end(hours_str)
+            self._evict()
+        return schedule
+
+    def resize(self, maxsize):
+        """Change the maximum number of cached schedules, evicting the oldest if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop every cached schedule and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters along with the current and maximum size."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+schedule_cache = ScheduleCache()
+
+
+def compile_hours(hours_strs):
+    """
+    Compile a list of hours strings into week intervals.
+
+    Returns an (intervals, error, warnings) triple per string, in order, with `error` set and
+    `intervals` None when the hours can't be parsed. Runs in import worker processes, so it only
+    depends on this module.
+    """
+    results = []
+    for hours_str in hours_strs:
+        try:
+            schedule = schedule_cache.get(hours_str)
+        except ValueError as e:
+            results.append((None, str(e), ()))
+        else:
+            results.append((schedule.intervals, None, schedule.warnings))
+    return results
+
+
+def hours_digest(hours_str):
+    """Return a short, stable hash of an hours string, used to detect changed hours on import."""
+    return hashlib.blake2b(hours_str.encode(), digest_size=16).hexdigest()
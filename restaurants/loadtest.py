@@ -0,0 +1,107 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from .benchmarks import sample_datetimes
+
+
+async def request_loop(url, paths, deadline, latencies, errors):
+    """Send requests until the deadline, reusing the connection unless the server closes it, recording latencies."""
+    host = url.netloc.encode()
+    connection = None
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[sent % len(paths)]
+            sent += 1
+            started = time.perf_counter()
+            if connection is None:
+                connection = await asyncio.open_connection(url.hostname, url.port or 80)
+            reader, writer = connection
+            try:
+                writer.write(b'GET ' + path + b' HTTP/1.1\r\nHost: ' + host + b'\r\n\r\n')
+                head = await reader.readuntil(b'\r\n\r\n')
+                headers = {}
+                for line in head.split(b'\r\n')[1:]:
+                    name, _, value = line.partition(b':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                await reader.readexactly(int(headers.get(b'content-length', 0)))
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                errors.append(repr(e))
+                writer.close()
+                connection = None
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not head.startswith((b'HTTP/1.1 200', b'HTTP/1.0 200')):
+                errors.append(head.split(b'\r\n', 1)[0].decode())
+            if headers.get(b'connection') == b'close':
+                # Servers without keep-alive, such as Gunicorn's sync workers, need a new connection per request
+                writer.close()
+                connection = None
+    finally:
+        if connection is not None:
+            connection[1].close()
+
+
+async def import_loop(csv_path, deadline, durations, failures):
+    """
+    Run import_restaurants on `csv_path` back to back until the deadline, recording how long each import took.
+
+    Imports run in their own processes with this process's environment, so they write to the database
+    configured for it, which should be the one the server under test reads.
+    """
+    manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, manage_py, 'import_restaurants', csv_path,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode:
+            failures.append(stderr.decode().strip().splitlines()[-1:])
+        else:
+            durations.append(time.perf_counter() - started)
+
+
+async def run_load(url, concurrency, duration, datetimes, import_csv=None):
+    """
+    Hold `concurrency` connections open against `url` for `duration` seconds and summarize the results.
+
+    With `import_csv`, the file is imported over and over while the requests run, to show how
+    imports affect readers.
+    """
+    url = urlsplit(url)
+    # Each request asks about one of a fixed sample of datetimes, so both cache hits and misses are exercised
+    paths = [
+        f'{url.path}?{urlencode({"datetime": datetime_obj.isoformat()})}'.encode()
+        for datetime_obj in sample_datetimes(datetimes)
+    ]
+    latencies, errors = [], []
+    import_durations, import_failures = [], []
+    started = time.perf_counter()
+    loops = [request_loop(url, paths, started + duration, latencies, errors) for _ in range(concurrency)]
+    if import_csv:
+        loops.append(import_loop(import_csv, started + duration, import_durations, import_failures))
+    await asyncio.gather(*loops)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    imports = {}
+    if import_csv:
+        imports = {
+            'imports': len(import_durations),
+            'import_failures': len(import_failures),
+            'import_median_seconds': statistics.median(import_durations) if import_durations else None,
+        }
+    return {
+        **imports,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': len(latencies) / elapsed,
+        'median_ms': statistics.median(latencies) if latencies else None,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None,
+        'max_ms': latencies[-1] if latencies else None,
+    }
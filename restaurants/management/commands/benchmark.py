@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from restaurants.benchmarks import SCENARIOS, SUITE, compare_results, environment
+
+
+class Command(BaseCommand):
+    help = 'Run open-hours benchmarks against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='+',
+            choices=sorted(SCENARIOS) + ['suite'],
+            help="The benchmark scenarios to run; 'suite' runs the standard set"
+        )
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[1000, 10000, 100000, 1000000],
+            help='Restaurant counts to benchmark at'
+        )
+        parser.add_argument('--repeat', type=int, default=200, help='Timed calls per size')
+        parser.add_argument('--output', help='Write the environment and every result to this JSON file')
+        parser.add_argument('--compare', help='A JSON file written by --output to check the results against')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='How much worse (as a fraction) a compared metric may get before it counts as a regression'
+        )
+
+    def handle(self, *args, **kwargs):
+        scenarios = []
+        for name in kwargs['scenarios']:
+            scenarios.extend(SUITE if name == 'suite' else [name])
+        baseline = None
+        if kwargs['compare']:
+            with open(kwargs['compare']) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+
+        # Never touch the real restaurant data: run against a fresh test database
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = {'environment': environment(), 'results': []}
+            for name in dict.fromkeys(scenarios):
+                for size in kwargs['sizes']:
+                    result = {'scenario': name, 'size': size, **SCENARIOS[name](size, kwargs['repeat'])}
+                    report['results'].append(result)
+                    self.stdout.write(json.dumps(result))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+        if baseline is not None:
+            regressions = compare_results(baseline, report['results'], kwargs['tolerance'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} metrics regressed by more than {kwargs['tolerance']:.0%}")
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
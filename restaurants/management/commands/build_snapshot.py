@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from restaurants.snapshot import snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the restaurants and their opening intervals to a snapshot file for the snapshot engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Where to write the snapshot (RESTAURANTS_SNAPSHOT_PATH by default)'
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['output'] or snapshot_path()
+        restaurants, intervals, size = write_snapshot(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote a snapshot of {restaurants} restaurants and {intervals} opening intervals "
+            f"to {path} ({size / 1024 / 1024:.1f} MB)"
+        ))
@@ -1,10 +1,23 @@
 import csv
+import itertools
 import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
-from restaurants.models import Restaurant
+from django.db import connection, transaction
+from django.utils import timezone
+from restaurants.hours import compile_hours, get_zone, hours_digest
+from restaurants.models import ImportReport, OpeningInterval, Restaurant, default_tz
+from restaurants.utils import peak_memory_mb
 from django.conf import settings
 
+ImportRow = namedtuple(
+    'ImportRow', ['line_number', 'external_id', 'name', 'hours', 'tz', 'latitude', 'longitude']
+)
+
 class Command(BaseCommand):
     help = 'Import restaurants data from a CSV file'
 
@@ -15,36 +28,329 @@ class Command(BaseCommand):
             default=os.path.join(settings.BASE_DIR, 'restaurants', 'restaurants.csv'),
             help='The path to the CSV file containing restaurant data'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows read and inserted at a time'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes parsing hours in parallel (1 parses in this process)'
+        )
+        parser.add_argument(
+            '--diff',
+            action='store_true',
+            help="Only insert, update and delete the restaurants that changed, matched by 'External ID' or name"
+        )
+        parser.add_argument(
+            '--report',
+            help='Write a CSV report of the rows whose hours were rejected or are ambiguous to this path'
+        )
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file_path']
+        batch_size = kwargs['batch_size']
+        workers = kwargs['workers']
+        self.report_path = kwargs['report']
+        self.phase_seconds = {}
 
         if not os.path.exists(csv_file_path):
             raise CommandError(f"CSV file not found: {csv_file_path}")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
 
         try:
-            with open(csv_file_path, 'r') as csvfile:
+            with self.phase('total'), open(csv_file_path, 'r') as csvfile:
                 reader = csv.DictReader(csvfile)
                 if 'Restaurant Name' not in reader.fieldnames or 'Hours' not in reader.fieldnames:
                     raise CommandError("CSV file must contain 'Restaurant Name' and 'Hours' columns")
 
+                batches = self.batches(self.restaurant_rows(reader), batch_size)
+                compiled_batches = self.compile_batches(batches, workers)
                 with transaction.atomic():
-                    # Delete existing restaurant data
-                    Restaurant.objects.all().delete()
-                    self.stdout.write(self.style.WARNING('Existing restaurant data deleted'))
+                    if kwargs['diff']:
+                        keyed_by_external_id = 'External ID' in reader.fieldnames
+                        changed = self.import_diff(compiled_batches, keyed_by_external_id)
+                    else:
+                        changed = self.import_all(compiled_batches)
 
-                    # Import new restaurant data
-                    for row in reader:
-                        name = row['Restaurant Name'].strip()
-                        hours = row['Hours'].strip()
-
-                        if not name or not hours:
-                            self.stdout.write(self.style.WARNING(f"Skipping incomplete row: {row}"))
-                            continue
-
-                        Restaurant.objects.create(name=name, hours=hours)
+                    # Bulk writes don't send model signals, so move the dataset version on here
+                    if changed:
+                        apps.get_app_config('restaurants').restaurants_changed()
 
+            self.report_phases()
             self.stdout.write(self.style.SUCCESS('Successfully imported restaurant data'))
 
         except Exception as e:
             raise CommandError(f"An error occurred: {e}")
+
+    def import_all(self, compiled_batches):
+        """Replace every restaurant with the rows of the file. Returns whether anything changed."""
+        # Delete existing restaurant data
+        with self.phase('delete'):
+            self.delete_all(OpeningInterval)
+            self.delete_all(Restaurant)
+        self.stdout.write(self.style.WARNING('Existing restaurant data deleted'))
+
+        # Import new restaurant data, streaming the file a batch at a time
+        started = time.perf_counter()
+        imported = 0
+        for batch in self.valid_batches(compiled_batches):
+            self.insert_rows(batch)
+            imported += len(batch)
+            self.report_progress(imported, started)
+        return True
+
+    def import_diff(self, compiled_batches, keyed_by_external_id):
+        """
+        Apply only the differences between the file and the stored restaurants.
+
+        Rows are matched by external id when the file has an 'External ID' column, and by name
+        otherwise. Unchanged restaurants and their intervals are not written at all, and readers
+        keep seeing the previous data until the transaction commits. Returns whether anything changed.
+        """
+        key_field = 'external_id' if keyed_by_external_id else 'name'
+        existing = {}
+        duplicates = []
+        stored = Restaurant.objects.order_by('pk').values_list(
+            key_field, 'pk', 'name', 'tz', 'latitude', 'longitude', 'hours_hash'
+        )
+        with self.phase('diff'):
+            for key, pk, *fields in stored.iterator(chunk_size=10000):
+                if key in existing:
+                    duplicates.append(pk)
+                else:
+                    existing[key] = (pk, *fields)
+
+        seen = set()
+        inserted = updated = unchanged = 0
+        for batch in self.valid_batches(compiled_batches):
+            to_insert, to_update = [], []
+            with self.phase('diff'):
+                for row, intervals in batch:
+                    key = row.external_id if keyed_by_external_id else row.name
+                    if key is None:
+                        raise CommandError(f"Row {row.line_number}: missing External ID")
+                    if key in seen:
+                        raise CommandError(f"Row {row.line_number}: duplicate {key_field} {key!r}")
+                    seen.add(key)
+
+                    match = existing.pop(key, None)
+                    digest = hours_digest(row.hours)
+                    if match is None:
+                        to_insert.append((row, intervals))
+                    elif match[1:] != (row.name, row.tz, row.latitude, row.longitude, digest):
+                        to_update.append((match[0], row, intervals, match[-1] != digest))
+                    else:
+                        unchanged += 1
+
+            self.insert_rows(to_insert)
+            self.update_rows(to_update, keyed_by_external_id)
+            inserted += len(to_insert)
+            updated += len(to_update)
+
+        # Whatever is left was not in the file
+        stale = duplicates + [pk for pk, *_ in existing.values()]
+        with self.phase('delete'):
+            for start in range(0, len(stale), 1000):
+                chunk = stale[start:start + 1000]
+                OpeningInterval.objects.filter(restaurant_id__in=chunk).delete()
+                Restaurant.objects.filter(pk__in=chunk).delete()
+
+        self.stdout.write(
+            f"Inserted {inserted}, updated {updated}, deleted {len(stale)} and left {unchanged} restaurants unchanged"
+        )
+        return bool(inserted or updated or stale)
+
+    def restaurant_rows(self, reader):
+        """Yield an ImportRow for each complete row, warning about incomplete ones."""
+        tz_default = default_tz()
+        for row in reader:
+            name = row['Restaurant Name'].strip()
+            hours = row['Hours'].strip()
+            external_id = (row.get('External ID') or '').strip() or None
+            tz = (row.get('Time Zone') or '').strip() or tz_default
+
+            if not name or not hours:
+                self.stdout.write(self.style.WARNING(f"Skipping incomplete row: {row}"))
+                continue
+            try:
+                get_zone(tz)
+                latitude = self.coordinate(row, 'Latitude', 90)
+                longitude = self.coordinate(row, 'Longitude', 180)
+            except ValueError as e:
+                raise CommandError(f"Row {reader.line_num}: {e}")
+            if (latitude is None) != (longitude is None):
+                raise CommandError(f"Row {reader.line_num}: Latitude and Longitude must be given together")
+
+            yield ImportRow(reader.line_num, external_id, name, hours, tz, latitude, longitude)
+
+    def coordinate(self, row, column, limit):
+        """Read an optional coordinate column, raising ValueError when it is not a number within +/-`limit`."""
+        value = (row.get(column) or '').strip()
+        if not value:
+            return None
+        try:
+            coordinate = float(value)
+        except ValueError:
+            raise ValueError(f"invalid {column} {value!r}")
+        if not -limit <= coordinate <= limit:
+            raise ValueError(f"{column} {value!r} is out of range")
+        return coordinate
+
+    def batches(self, rows, batch_size):
+        """Group rows into lists of at most `batch_size`."""
+        while True:
+            with self.phase('read'):
+                batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def compile_batches(self, batches, workers):
+        """
+        Yield each batch of rows zipped with its compiled (intervals, error, warnings) triples, in file order.
+
+        With several workers, hours are parsed in a process pool. Only a few batches per worker
+        are in flight at once, so the file is still streamed rather than read into memory.
+        """
+        if workers == 1:
+            for batch in batches:
+                with self.phase('compile'):
+                    compiled = list(zip(batch, compile_hours([row.hours for row in batch])))
+                yield compiled
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append((batch, executor.submit(compile_hours, [row.hours for row in batch])))
+                if len(pending) >= workers * 2:
+                    batch, future = pending.popleft()
+                    with self.phase('compile'):
+                        compiled = list(zip(batch, future.result()))
+                    yield compiled
+            while pending:
+                batch, future = pending.popleft()
+                with self.phase('compile'):
+                    compiled = list(zip(batch, future.result()))
+                yield compiled
+
+    def valid_batches(self, compiled_batches):
+        """
+        Yield batches of (row, intervals) pairs once their hours are known to be valid.
+
+        After the first invalid row nothing more is yielded, but the rest of the file is still
+        compiled so that every invalid row can be reported before the import fails. Rows with
+        ambiguous hours are imported and counted, and both are listed in the --report file.
+        """
+        errors = []
+        diagnostics = []
+        for compiled in compiled_batches:
+            for row, (_, error, warnings) in compiled:
+                if error:
+                    errors.append(f"Row {row.line_number} ({row.name}): {error}")
+                    diagnostics.append((row, 'error', error))
+                diagnostics.extend((row, 'warning', warning) for warning in warnings)
+            if not errors:
+                yield [(row, intervals) for row, (intervals, _, _) in compiled]
+
+        ambiguous = len({row.line_number for row, severity, _ in diagnostics if severity == 'warning'})
+        if ambiguous:
+            self.stdout.write(self.style.WARNING(f"{ambiguous} rows have ambiguous hours"))
+        if self.report_path:
+            self.write_report(diagnostics)
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError(f"{len(errors)} rows have invalid hours; no data was imported")
+
+    def write_report(self, diagnostics):
+        """Write (row, severity, message) diagnostics to the --report CSV file."""
+        with open(self.report_path, 'w', newline='') as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(['Row', 'Restaurant Name', 'Hours', 'Severity', 'Message'])
+            writer.writerows(
+                (row.line_number, row.name, row.hours, severity, message) for row, severity, message in diagnostics
+            )
+        self.stdout.write(f"Wrote {len(diagnostics)} hours diagnostics to {self.report_path}")
+
+    def insert_rows(self, rows):
+        """Insert (row, intervals) pairs as new restaurants along with their opening intervals."""
+        with self.phase('insert'):
+            restaurants = Restaurant.objects.bulk_create(
+                Restaurant(
+                    name=row.name, hours=row.hours, external_id=row.external_id, tz=row.tz,
+                    latitude=row.latitude, longitude=row.longitude, hours_hash=hours_digest(row.hours)
+                )
+                for row, _ in rows
+            )
+            OpeningInterval.objects.insert_rows(
+                (restaurant.pk, weekday, start, end)
+                for restaurant, (_, intervals) in zip(restaurants, rows)
+                for weekday, start, end in intervals
+            )
+
+    def update_rows(self, updates, keyed_by_external_id):
+        """
+        Apply (pk, row, intervals, hours changed) updates, rewriting intervals only where the hours changed.
+
+        External ids are only written when the file has them; rows matched by name keep their stored one.
+        """
+        fields = ['name', 'hours', 'tz', 'latitude', 'longitude', 'hours_hash']
+        if keyed_by_external_id:
+            fields.append('external_id')
+        with self.phase('update'):
+            Restaurant.objects.bulk_update(
+                [
+                    Restaurant(
+                        pk=pk, name=row.name, hours=row.hours, external_id=row.external_id, tz=row.tz,
+                        latitude=row.latitude, longitude=row.longitude, hours_hash=hours_digest(row.hours)
+                    )
+                    for pk, row, _, _ in updates
+                ],
+                fields,
+                batch_size=1000,
+            )
+            changed_hours = [(pk, intervals) for pk, _, intervals, hours_changed in updates if hours_changed]
+            OpeningInterval.objects.filter(restaurant_id__in=[pk for pk, _ in changed_hours]).delete()
+            OpeningInterval.objects.insert_rows(
+                (pk, weekday, start, end) for pk, intervals in changed_hours for weekday, start, end in intervals
+            )
+
+    def delete_all(self, model):
+        """Delete every row of `model` in one statement, skipping the per-object signals of QuerySet.delete()."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to the running total of phase `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - started
+
+    def report_phases(self):
+        """Write the seconds spent per phase, and store them for /restaurants/metrics to serve."""
+        self.stdout.write(
+            'Phase seconds: ' + ', '.join(f'{name} {seconds:.2f}' for name, seconds in self.phase_seconds.items())
+        )
+        # This process exits once the import is done, so the timings outlive it in the database
+        ImportReport.objects.update_or_create(
+            pk=ImportReport.ROW_ID, defaults={'finished_at': timezone.now(), 'phase_seconds': self.phase_seconds}
+        )
+
+    def report_progress(self, imported, started):
+        """Write the running row count, throughput and peak memory use."""
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        memory = peak_memory_mb()
+        memory_str = f", peak memory {memory:.0f} MB" if memory is not None else ""
+        self.stdout.write(f"Imported {imported} rows ({rate:.0f} rows/s{memory_str})")
@@ -0,0 +1,43 @@
+import asyncio
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from restaurants.loadtest import run_load
+
+
+class Command(BaseCommand):
+    help = 'Load test running /api/open servers and report requests per second and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='Endpoints to test one after another, e.g. http://localhost:8001/restaurants/api/open'
+        )
+        parser.add_argument('--concurrency', type=int, default=256, help='Number of connections kept busy at once')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run against each URL')
+        parser.add_argument('--datetimes', type=int, default=1000, help='Number of distinct datetimes requested')
+        parser.add_argument(
+            '--import-csv',
+            help=(
+                'Import this CSV file with import_restaurants over and over during each run, replacing the data '
+                'of the configured database, which should be the one the server reads'
+            )
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['concurrency'] < 1 or kwargs['datetimes'] < 1:
+            raise CommandError("--concurrency and --datetimes must be at least 1")
+        if kwargs['import_csv'] and not os.path.exists(kwargs['import_csv']):
+            raise CommandError(f"CSV file not found: {kwargs['import_csv']}")
+
+        for url in kwargs['urls']:
+            if not url.startswith('http://'):
+                raise CommandError(f"Only http:// URLs are supported: {url}")
+            try:
+                result = asyncio.run(run_load(
+                    url, kwargs['concurrency'], kwargs['duration'], kwargs['datetimes'], kwargs['import_csv']
+                ))
+            except OSError as e:
+                raise CommandError(f"Could not load test {url}: {e}")
+            self.stdout.write(json.dumps({'url': url, 'concurrency': kwargs['concurrency'], **result}))
@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from django.conf import settings
+
+# Upper bounds in seconds of the histogram buckets, from sub-millisecond lookups to slow requests
+REQUEST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Shared by every disabled timer, so that instrumentation costs one settings lookup when off
+DISABLED = nullcontext()
+
+
+class DisabledStopwatch:
+    """Stands in for a Stopwatch when metrics are disabled."""
+    __slots__ = ()
+
+    def lap(self, label_value):
+        pass
+
+
+DISABLED_STOPWATCH = DisabledStopwatch()
+
+
+def is_enabled():
+    """Return whether metrics are collected, per the RESTAURANTS_METRICS setting."""
+    return getattr(settings, 'RESTAURANTS_METRICS', False)
+
+
+class Counter:
+    """A Prometheus counter with one label, kept in this process. Names end in `_total`."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_value, amount=1):
+        """Add `amount` to the count for `label_value`, if metrics are enabled."""
+        if not is_enabled():
+            return
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def reset(self):
+        """Forget every count."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Yield (suffix, labels, value) for the text exposition."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_value, value in values:
+            yield '', {self.label: label_value}, value
+
+
+class Histogram:
+    """A Prometheus histogram of durations with one label, kept in this process."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label, buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # Per label value: [count per bucket plus one for +Inf, sum]
+        self._values = {}
+
+    def observe(self, label_value, seconds):
+        """Record one duration for `label_value`."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            values = self._values.get(label_value)
+            if values is None:
+                values = self._values[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            values[0][index] += 1
+            values[1] += seconds
+
+    def time(self, label_value):
+        """Return a context manager that observes how long its block takes, or a no-op when metrics are disabled."""
+        if not is_enabled():
+            return DISABLED
+        return Timer(self, label_value)
+
+    def stopwatch(self):
+        """Return a Stopwatch for timing consecutive stages, or a no-op one when metrics are disabled."""
+        if not is_enabled():
+            return DISABLED_STOPWATCH
+        return Stopwatch(self)
+
+    def reset(self):
+        """Forget every observation."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Yield (suffix, labels, value) for the text exposition, with cumulative buckets."""
+        with self._lock:
+            values = sorted(
+                (label_value, (list(counts), total)) for label_value, (counts, total) in self._values.items()
+            )
+        for label_value, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield '_bucket', {self.label: label_value, 'le': le}, cumulative
+            yield '_sum', {self.label: label_value}, total
+            yield '_count', {self.label: label_value}, cumulative
+
+
+class Timer:
+    """Observes the monotonic time spent in a `with` block into a histogram."""
+    __slots__ = ('histogram', 'label_value', 'started')
+
+    def __init__(self, histogram, label_value):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(self.label_value, time.perf_counter() - self.started)
+
+
+class Stopwatch:
+    """Times consecutive stages: each `lap(stage)` observes the time since the previous lap, or since it started."""
+    __slots__ = ('histogram', 'last')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.last = time.perf_counter()
+
+    def lap(self, label_value):
+        now = time.perf_counter()
+        self.histogram.observe(label_value, now - self.last)
+        self.last = now
+
+
+OPEN_STAGE_SECONDS = Histogram(
+    'restaurants_open_stage_seconds', 'Time spent in each stage of /api/open requests.', 'stage'
+)
+OPEN_RESPONSE_CACHE = Counter(
+    'restaurants_open_response_cache_total', 'Response cache lookups of /api/open, by result.', 'result'
+)
+RESTAURANTS_SCANNED = Counter(
+    'restaurants_open_scanned_total', 'Restaurants considered by /api/open lookups, by kind of lookup.', 'lookup'
+)
+RESTAURANTS_RETURNED = Counter(
+    'restaurants_open_returned_total', 'Restaurants returned by /api/open lookups, by kind of lookup.', 'lookup'
+)
+
+REGISTRY = [OPEN_STAGE_SECONDS, OPEN_RESPONSE_CACHE, RESTAURANTS_SCANNED, RESTAURANTS_RETURNED]
+
+
+def record_lookup(lookup, scanned, returned):
+    """Count the restaurants a lookup considered and returned."""
+    RESTAURANTS_SCANNED.inc(lookup, scanned)
+    RESTAURANTS_RETURNED.inc(lookup, returned)
+
+
+def reset():
+    """Clear every metric of this process."""
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def escape_label_value(value):
+    """Escape a label value for the text format: backslashes, double quotes and newlines."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    """Render a label dict as Prometheus {name="value",...}."""
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+def exposition(extra_samples=()):
+    """
+    Render every metric in the Prometheus text format (version 0.0.4).
+
+    `extra_samples` are (name, kind, documentation, [(labels, value)]) tuples for values read at
+    scrape time, such as cache statistics kept elsewhere.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(
+            f'{metric.name}{suffix}{format_labels(labels)} {value}' for suffix, labels, value in metric.samples()
+        )
+    for name, kind, documentation, samples in extra_samples:
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{format_labels(labels) if labels else ""} {value}' for labels, value in samples)
+    return '\n'.join(lines) + '\n'
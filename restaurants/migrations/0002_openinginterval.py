@@ -0,0 +1,34 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from restaurants.migrations._legacy_hours import restaurant_intervals
+
+
+def build_opening_intervals(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    OpeningInterval = apps.get_model('restaurants', 'OpeningInterval')
+    for restaurant, intervals in restaurant_intervals(Restaurant):
+        OpeningInterval.objects.bulk_create(
+            OpeningInterval(restaurant=restaurant, weekday=weekday, start=start, end=end)
+            for weekday, start, end in intervals
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('start', models.PositiveSmallIntegerField()),
+                ('end', models.PositiveSmallIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.RunPython(build_opening_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-17 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0002_openinginterval'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='openinginterval',
+            index=models.Index(fields=['weekday', 'start', 'end'], name='interval_lookup_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from restaurants.migrations._legacy_hours import restaurant_intervals
+
+
+def rebuild_opening_intervals(apps, schema_editor):
+    # Hours that run past midnight now spill into the following day instead of always into Tuesday
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    OpeningInterval = apps.get_model('restaurants', 'OpeningInterval')
+    OpeningInterval.objects.all().delete()
+    for restaurant, intervals in restaurant_intervals(Restaurant):
+        OpeningInterval.objects.bulk_create(
+            OpeningInterval(restaurant=restaurant, weekday=weekday, start=start, end=end)
+            for weekday, start, end in intervals
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0003_openinginterval_lookup_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_opening_intervals, migrations.RunPython.noop),
+    ]
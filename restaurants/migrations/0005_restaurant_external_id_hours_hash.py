@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from restaurants.hours import hours_digest
+
+
+def fill_hours_hash(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    restaurants = list(Restaurant.objects.all())
+    for restaurant in restaurants:
+        restaurant.hours_hash = hours_digest(restaurant.hours)
+    Restaurant.objects.bulk_update(restaurants, ['hours_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0004_rebuild_opening_intervals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='hours_hash',
+            field=models.CharField(default='', editable=False, max_length=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_hours_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-17 00:48
+
+import restaurants.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0005_restaurant_external_id_hours_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='tz',
+            field=models.CharField(default=restaurants.models.default_tz, help_text='IANA time zone that the hours are in', max_length=64),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0007_restaurant_location'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='openinginterval',
+            name='interval_lookup_idx',
+        ),
+        migrations.AddIndex(
+            model_name='openinginterval',
+            index=models.Index(fields=['weekday', 'start', 'end', 'restaurant'], name='interval_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='openinginterval',
+            index=models.Index(fields=['restaurant', 'start'], name='interval_restaurant_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-17 02:03
+
+import time
+from django.db import migrations, models
+
+
+def create_dataset_version(apps, schema_editor):
+    DatasetVersion = apps.get_model('restaurants', 'DatasetVersion')
+    DatasetVersion.objects.create(pk=1, version=int(time.time() * 1000))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0008_interval_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_dataset_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_dataset_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('finished_at', models.DateTimeField()),
+                ('phase_seconds', models.JSONField(help_text='Seconds spent per phase, keyed by phase name')),
+            ],
+        ),
+    ]
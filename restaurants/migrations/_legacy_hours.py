@@ -0,0 +1,96 @@
+"""
+A frozen copy of the lenient regex hours parser that the data migrations were written against.
+
+Migrations must keep working on databases holding hours the strict compiler in
+`restaurants.hours` now rejects, such as 'Mon-Fri 9 am - 5 pm / Sat Closed', so they use this
+copy rather than the live parser. Don't change it along with `restaurants.hours`.
+"""
+import re
+from datetime import datetime, time
+
+DAY_MAP = {
+    'Mon': 'Monday', 'Tues': 'Tuesday', 'Wed': 'Wednesday', 'Thu': 'Thursday',
+    'Fri': 'Friday', 'Sat': 'Saturday', 'Sun': 'Sunday'
+}
+DAY_KEYS = list(DAY_MAP.keys())
+WEEKDAYS = list(DAY_MAP.values())
+DAY_TIME_PATTERN = re.compile(r'([A-Za-z,\s-]+)\s+([\d:\sampm-]+)')
+MIDNIGHT = time(0, 0)
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_time(time_str):
+    try:
+        return datetime.strptime(time_str.strip(), '%I:%M %p').time()
+    except ValueError:
+        return datetime.strptime(time_str.strip(), '%I %p').time()
+
+
+def expand_day_range(days_str):
+    expanded_days = []
+    for day in days_str.split(', '):
+        if '-' in day:
+            start_day, end_day = day.split('-')
+            expanded_days.extend(WEEKDAYS[DAY_KEYS.index(start_day):DAY_KEYS.index(end_day) + 1])
+        else:
+            expanded_days.append(DAY_MAP[day.strip()])
+    return expanded_days
+
+
+def parse_hours(hours_str):
+    """Parse an hours string into (opening, closing) times per day name, skipping parts that don't match."""
+    hours_dict = {day: [] for day in WEEKDAYS}
+    for part in hours_str.split('/'):
+        match = DAY_TIME_PATTERN.search(part.strip())
+        if match:
+            days_str, times_str = match.groups()
+            open_time, close_time = map(parse_time, times_str.split('-'))
+            for day in expand_day_range(days_str):
+                hours_dict[day].append((open_time, close_time))
+                if close_time <= open_time and close_time != MIDNIGHT:
+                    hours_dict[WEEKDAYS[(WEEKDAYS.index(day) + 1) % 7]].append((MIDNIGHT, close_time))
+    return hours_dict
+
+
+def week_intervals(parsed_hours):
+    """Flatten parsed hours into sorted, non-overlapping (weekday, start, end) minute-of-week intervals."""
+    intervals = []
+    for weekday, day in enumerate(WEEKDAYS):
+        base = weekday * MINUTES_PER_DAY
+        spans = []
+        for open_time, close_time in parsed_hours.get(day, []):
+            open_minute = open_time.hour * 60 + open_time.minute
+            close_minute = close_time.hour * 60 + close_time.minute
+            if close_minute <= open_minute:
+                spans.append((open_minute, MINUTES_PER_DAY))
+                spans.append((0, close_minute))
+            else:
+                spans.append((open_minute, close_minute + 1))
+
+        merged = []
+        for start, end in sorted(span for span in spans if span[0] < span[1]):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        intervals.extend((weekday, base + start, base + end) for start, end in merged)
+    return intervals
+
+
+def restaurant_intervals(Restaurant):
+    """
+    Yield (restaurant, intervals) for every restaurant of the historical model.
+
+    Restaurants whose hours even this parser can't read get no intervals, so they show as
+    closed until their hours are fixed; their names are printed.
+    """
+    unreadable = []
+    for restaurant in Restaurant.objects.order_by('pk'):
+        try:
+            intervals = week_intervals(parse_hours(restaurant.hours))
+        except (ValueError, KeyError):
+            unreadable.append(restaurant.name)
+            intervals = []
+        yield restaurant, intervals
+    if unreadable:
+        print(f"\n  Left {len(unreadable)} restaurants closed, as their hours can't be parsed: {', '.join(unreadable)}")
@@ -1,8 +1,150 @@
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from .hours import MINUTES_PER_DAY, get_zone, hours_digest, schedule_cache
+
+
+def default_tz():
+    """Return the time zone of restaurants that don't set one."""
+    return getattr(settings, 'RESTAURANTS_DEFAULT_TZ', settings.TIME_ZONE)
+
 
 class Restaurant(models.Model):
     name = models.CharField(max_length=255)
     hours = models.TextField()
+    external_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    hours_hash = models.CharField(max_length=32, editable=False)
+    tz = models.CharField(max_length=64, default=default_tz, help_text="IANA time zone that the hours are in")
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        restaurant = super().from_db(db, field_names, values)
+        # Remember which hours the stored opening intervals were built from
+        restaurant._stored_hours_hash = restaurant.__dict__.get('hours_hash')
+        return restaurant
+
+    def save(self, *args, **kwargs):
+        """
+        Save the restaurant and rebuild its opening intervals from the hours string.
+
+        Restaurants loaded from the database whose hours are unchanged keep their intervals, so
+        rows stored before the strict hours compiler, with hours it rejects, can still be saved.
+        """
+        hours_hash = hours_digest(self.hours)
+        hours_changed = self._state.adding or getattr(self, '_stored_hours_hash', None) != hours_hash
+        # Parse before writing anything so that invalid hours and zones never reach the database
+        if hours_changed:
+            schedule_cache.get(self.hours)
+        get_zone(self.tz)
+        self.hours_hash = hours_hash
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if hours_changed:
+                self.opening_intervals.all().delete()
+                OpeningInterval.objects.bulk_create(OpeningInterval.for_restaurant(self))
+        self._stored_hours_hash = hours_hash
+
+
+class OpeningIntervalQuerySet(models.QuerySet):
+    def open_at(self, minute):
+        """Filter to the intervals containing the given minute of the week."""
+        # Intervals never cross midnight, so pinning the weekday bounds the index range scan to one day
+        return self.filter(weekday=minute // MINUTES_PER_DAY, start__lte=minute, end__gt=minute)
+
+    def open_in_zones(self, groups):
+        """Filter to the intervals containing each (minute, zones) group's minute, in restaurants of those zones."""
+        condition = models.Q()
+        for minute, zones in groups:
+            condition |= models.Q(
+                restaurant__tz__in=zones, weekday=minute // MINUTES_PER_DAY, start__lte=minute, end__gt=minute
+            )
+        return self.filter(condition)
+
+    def open_at_local(self, local):
+        """Filter to the intervals open at a minute of the week or at the (minute, zones) groups of `zones.local_minutes()`."""
+        return self.open_at(local) if isinstance(local, int) else self.open_in_zones(local)
+
+    def insert_for(self, restaurants):
+        """Insert the intervals of already saved restaurants."""
+        self.insert_rows(
+            (restaurant.pk, weekday, start, end)
+            for restaurant in restaurants
+            for weekday, start, end in schedule_cache.get(restaurant.hours).intervals
+        )
+
+    def insert_rows(self, rows):
+        """Insert (restaurant id, weekday, start, end) rows with one executemany, bypassing model instances."""
+        # Imports write several intervals per restaurant, and building a model instance for each dominates bulk_create
+        rows = list(rows)
+        connection = connections[self._db or router.db_for_write(self.model)]
+        columns = ', '.join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column)
+            for name in ('restaurant', 'weekday', 'start', 'end')
+        )
+        sql = f'INSERT INTO {connection.ops.quote_name(self.model._meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)'
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class OpeningInterval(models.Model):
+    """A span of time, in minutes since Monday 00:00, during which a restaurant is open."""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='opening_intervals')
+    weekday = models.PositiveSmallIntegerField()
+    start = models.PositiveSmallIntegerField()
+    end = models.PositiveSmallIntegerField()
+
+    objects = OpeningIntervalQuerySet.as_manager()
+
+    @classmethod
+    def for_restaurant(cls, restaurant):
+        """Build the unsaved intervals for a saved restaurant from its hours string."""
+        return [
+            cls(restaurant_id=restaurant.pk, weekday=weekday, start=start, end=end)
+            for weekday, start, end in schedule_cache.get(restaurant.hours).intervals
+        ]
+
+    class Meta:
+        indexes = [
+            # Covers open-at lookups, which then never read the table itself
+            models.Index(fields=['weekday', 'start', 'end', 'restaurant'], name='interval_covering_idx'),
+            # Reading every restaurant's intervals in order, as the in-memory indexes are built
+            models.Index(fields=['restaurant', 'start'], name='interval_restaurant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.start}-{self.end}"
+
+
+class DatasetVersion(models.Model):
+    """
+    The one row holding the dataset version shared by every process.
+
+    The version is the time in milliseconds of the last change to the restaurants, moved
+    forward in the same transaction as the change, so it is also when the data last changed.
+    """
+    ROW_ID = 1
+
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return str(self.version)
+
+
+class ImportReport(models.Model):
+    """
+    The one row holding the phase timings of the last successful import_restaurants run.
+
+    The import runs in its own short-lived process, so its timings are kept here for
+    /restaurants/metrics to read, whichever server process is scraped.
+    """
+    ROW_ID = 1
+
+    finished_at = models.DateTimeField()
+    phase_seconds = models.JSONField(help_text="Seconds spent per phase, keyed by phase name")
+
+    def __str__(self):
+        return f"Import finished at {self.finished_at}"
@@ -0,0 +1,95 @@
+import csv
+import io
+import itertools
+from array import array
+from collections import defaultdict
+from .engines import CachedIndex
+from .hours import MINUTES_PER_DAY, MINUTES_PER_WEEK, WEEKDAYS
+from .models import OpeningInterval
+
+GROUPINGS = ('tz',)
+
+
+class OccupancyIndex(CachedIndex):
+    """
+    Counts the restaurants open at every minute of the week, overall and per time zone.
+
+    The counts come from one sweep over the opening intervals: each interval adds one at its
+    start and removes one at its end in a per-zone difference array, and a running sum turns
+    those into counts, so building costs O(intervals + minutes of the week) per zone. Minutes
+    are wall-clock times in each restaurant's own zone, like naive /api/open lookups.
+    """
+
+    def slot_counts(self, slot_minutes):
+        """Return the number of restaurants open at the start of each `slot_minutes` slot of the week."""
+        totals, _ = self._get_index()
+        return totals[::slot_minutes].tolist()
+
+    def slot_counts_by_zone(self, slot_minutes):
+        """Return a dict from each time zone, in name order, to its slot_counts()."""
+        _, by_zone = self._get_index()
+        return {zone: counts[::slot_minutes].tolist() for zone, counts in by_zone.items()}
+
+    def build(self):
+        """Read the intervals and build (counts per minute, {zone: counts per minute})."""
+        rows = OpeningInterval.objects.values_list('restaurant__tz', 'start', 'end').iterator(chunk_size=10000)
+        deltas = defaultdict(lambda: [0] * (MINUTES_PER_WEEK + 1))
+        for zone, start, end in rows:
+            zone_deltas = deltas[zone]
+            zone_deltas[start] += 1
+            zone_deltas[end] -= 1
+
+        by_zone = {
+            zone: array('i', itertools.accumulate(deltas[zone][:MINUTES_PER_WEEK])) for zone in sorted(deltas)
+        }
+        if not by_zone:
+            return array('i', [0]) * MINUTES_PER_WEEK, by_zone
+        return array('i', map(sum, zip(*by_zone.values()))), by_zone
+
+
+def slot_labels(slot_minutes):
+    """Return (day name, 'HH:MM') for the start of each `slot_minutes` slot of the week."""
+    return [
+        (WEEKDAYS[minute // MINUTES_PER_DAY], f'{minute % MINUTES_PER_DAY // 60:02d}:{minute % 60:02d}')
+        for minute in range(0, MINUTES_PER_WEEK, slot_minutes)
+    ]
+
+
+def occupancy_table(occupancy_index, slot_minutes, group_by=None):
+    """
+    Lay out the open-restaurant counts as one row of counts per day.
+
+    Returns {"slot_minutes", "times", "days": {day: counts}}, or with `group_by='tz'`
+    {"slot_minutes", "times", "zones": {zone: {day: counts}}}.
+    """
+    slots_per_day = MINUTES_PER_DAY // slot_minutes
+
+    def by_day(counts):
+        return {
+            day: counts[weekday * slots_per_day:(weekday + 1) * slots_per_day] for weekday, day in enumerate(WEEKDAYS)
+        }
+
+    table = {"slot_minutes": slot_minutes, "times": [time for _, time in slot_labels(slot_minutes)[:slots_per_day]]}
+    if group_by == 'tz':
+        table["zones"] = {
+            zone: by_day(counts) for zone, counts in occupancy_index.slot_counts_by_zone(slot_minutes).items()
+        }
+    else:
+        table["days"] = by_day(occupancy_index.slot_counts(slot_minutes))
+    return table
+
+
+def occupancy_csv(occupancy_index, slot_minutes, group_by=None):
+    """Render the open-restaurant counts as CSV with one line per slot (and zone, with `group_by='tz'`)."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    labels = slot_labels(slot_minutes)
+    if group_by == 'tz':
+        writer.writerow(['Day', 'Time', 'Time Zone', 'Open Restaurants'])
+        for zone, counts in occupancy_index.slot_counts_by_zone(slot_minutes).items():
+            writer.writerows((day, time, zone, count) for (day, time), count in zip(labels, counts))
+    else:
+        writer.writerow(['Day', 'Time', 'Open Restaurants'])
+        counts = occupancy_index.slot_counts(slot_minutes)
+        writer.writerows((day, time, count) for (day, time), count in zip(labels, counts))
+    return output.getvalue()
@@ -0,0 +1,36 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class ReadOnlyRouter:
+    """
+    Sends reads of restaurant data to the 'readonly' database when one is configured.
+
+    Reads made while 'default' is inside a transaction stay on it, so that imports and saves
+    see their own uncommitted writes. Writes always go to 'default', including saves of
+    restaurants that were read through 'readonly'. Everything else is left to the default routing.
+    """
+    alias = 'readonly'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'restaurants' or self.alias not in connections.settings:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.alias
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'restaurants' or self.alias not in connections.settings:
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, self.alias}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The read-only database is the same file as 'default', so it is migrated through 'default'
+        if db == self.alias:
+            return False
+        return None
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Restaurant
 
@@ -5,3 +6,11 @@ class RestaurantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Restaurant
         fields = ['name', 'hours']
+
+
+class OpenBatchSerializer(serializers.Serializer):
+    datetimes = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'RESTAURANTS_BATCH_MAX_DATETIMES', 2016),
+    )
@@ -0,0 +1,240 @@
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import request_started
+from .cache import bump_dataset_version, forget_dataset_version, get_dataset_version
+from .engines import NumpyEngine, NumpyIndex, np
+
+MAGIC = b'LIINESNP'
+FORMAT_VERSION = 1
+# Magic, format version, build time in milliseconds, restaurant count, interval count, size of the zone names
+HEADER = struct.Struct('<8sQqqqq')
+# The arrays that follow the header, in file order: (name, dtype, whether there is one per restaurant or interval)
+ARRAYS = (
+    ('pks', '<i8', 'restaurants'),
+    ('zone_codes', '<i4', 'restaurants'),
+    ('name_offsets', '<i8', 'names'),
+    ('starts', '<i4', 'intervals'),
+    ('ends', '<i4', 'intervals'),
+    ('owners', '<i4', 'intervals'),
+)
+
+MappedSnapshot = namedtuple('MappedSnapshot', ['stamp', 'identity', 'index'])
+
+
+class SnapshotError(ValueError):
+    """Raised for a file that is not a complete snapshot in the current format."""
+
+
+def snapshot_path():
+    """Return the path of the snapshot file, per the RESTAURANTS_SNAPSHOT_PATH setting."""
+    return str(getattr(settings, 'RESTAURANTS_SNAPSHOT_PATH', os.path.join(settings.BASE_DIR, 'restaurants.snapshot')))
+
+
+def aligned(offset):
+    """Round `offset` up to the next multiple of 8, so that every array starts aligned."""
+    return -(-offset // 8) * 8
+
+
+def layout(restaurant_count, interval_count, zone_bytes):
+    """Return ({array name: (offset, dtype, count)}, offset of the zone names, offset of the restaurant names)."""
+    counts = {'restaurants': restaurant_count, 'intervals': interval_count, 'names': restaurant_count + 1}
+    offset = HEADER.size
+    arrays = {}
+    for name, dtype, per in ARRAYS:
+        arrays[name] = (offset, dtype, counts[per])
+        offset = aligned(offset + np.dtype(dtype).itemsize * counts[per])
+    return arrays, offset, aligned(offset + zone_bytes)
+
+
+def file_identity(stat_result):
+    """Return what changes when a snapshot file is replaced: its inode, size and modification time."""
+    return stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+
+
+def write_snapshot(path):
+    """
+    Write the restaurants and their opening intervals to a snapshot file at `path`.
+
+    The file is written next to `path` and moved over it in one step, so workers mapping the
+    previous snapshot keep reading it undisturbed. Returns (restaurants, intervals, bytes written).
+    """
+    index = NumpyEngine().build()
+    encoded_names = [name.encode() for name in index.names.tolist()]
+    name_offsets = np.zeros(len(encoded_names) + 1, dtype='<i8')
+    np.cumsum([len(name) for name in encoded_names], out=name_offsets[1:])
+    encoded_zones = '\n'.join(index.zone_names).encode()
+    arrays, zones_offset, names_offset = layout(len(index.pks), len(index.starts), len(encoded_zones))
+    values = {
+        'pks': index.pks, 'zone_codes': index.zone_codes, 'name_offsets': name_offsets,
+        'starts': index.starts, 'ends': index.ends, 'owners': index.owners,
+    }
+
+    directory, filename = os.path.split(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('wb', dir=directory, prefix=f'.{filename}.', delete=False) as snapshot_file:
+        try:
+            snapshot_file.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, int(time.time() * 1000), len(index.pks), len(index.starts), len(encoded_zones)
+            ))
+            for name, (offset, dtype, _) in arrays.items():
+                snapshot_file.seek(offset)
+                snapshot_file.write(values[name].astype(dtype, copy=False).tobytes())
+            snapshot_file.seek(zones_offset)
+            snapshot_file.write(encoded_zones)
+            snapshot_file.seek(names_offset)
+            snapshot_file.write(b''.join(encoded_names))
+            size = snapshot_file.tell()
+        except BaseException:
+            os.unlink(snapshot_file.name)
+            raise
+    os.replace(snapshot_file.name, path)
+    return len(index.pks), len(index.starts), size
+
+
+def read_stamp(path):
+    """Return the time in milliseconds at which the snapshot at `path` was written."""
+    with open(path, 'rb') as snapshot_file:
+        header = snapshot_file.read(HEADER.size)
+    if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+        raise SnapshotError(f"{path} is not a restaurant snapshot")
+    return HEADER.unpack(header)[2]
+
+
+def map_snapshot(path):
+    """
+    Map the snapshot at `path` read-only and return it as a MappedSnapshot.
+
+    The index is laid out like NumpyEngine's, but its arrays are views of the mapped file, so
+    nothing is parsed or copied and every process mapping the same file shares its pages. Names
+    are decoded from the string table only when they are returned.
+    """
+    with open(path, 'rb') as snapshot_file:
+        stat_result = os.fstat(snapshot_file.fileno())
+        if stat_result.st_size < HEADER.size:
+            raise SnapshotError(f"{path} is not a restaurant snapshot")
+        buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, format_version, stamp, restaurant_count, interval_count, zone_bytes = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a restaurant snapshot")
+    if format_version != FORMAT_VERSION:
+        raise SnapshotError(f"{path} is a version {format_version} snapshot; rebuild it with build_snapshot")
+
+    arrays, zones_offset, names_offset = layout(restaurant_count, interval_count, zone_bytes)
+    if len(buffer) < names_offset:
+        raise SnapshotError(f"{path} is truncated")
+    views = {
+        name: np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        for name, (offset, dtype, count) in arrays.items()
+    }
+    if len(buffer) < names_offset + int(views['name_offsets'][-1]):
+        raise SnapshotError(f"{path} is truncated")
+    zone_names = buffer[zones_offset:zones_offset + zone_bytes].decode().split('\n') if zone_bytes else []
+    names = NameTable(buffer, names_offset, views['name_offsets'])
+    index = NumpyIndex(
+        names, views['pks'], zone_names, views['zone_codes'], views['starts'], views['ends'], views['owners'],
+    )
+    return MappedSnapshot(stamp, file_identity(stat_result), index)
+
+
+class NameTable:
+    """The restaurant names of a mapped snapshot: UTF-8 strings back to back, found by their offsets."""
+    __slots__ = ('buffer', 'base', 'offsets')
+
+    def __init__(self, buffer, base, offsets):
+        self.buffer = buffer
+        self.base = base
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def at(self, positions):
+        """Return the names at the given positions, in that order."""
+        buffer, base = self.buffer, self.base
+        return [
+            buffer[base + start:base + end].decode()
+            for start, end in zip(self.offsets[positions].tolist(), self.offsets[positions + 1].tolist())
+        ]
+
+
+class SnapshotEngine(NumpyEngine):
+    """
+    Answers open-restaurant lookups like the numpy engine, from a memory-mapped snapshot file.
+
+    Workers map the file written by `build_snapshot` instead of reading and indexing the
+    database, so they answer from their first request and share the snapshot's pages. When
+    this process changes the data, `invalidate()` writes a new snapshot once the transaction
+    commits, once per transaction. Other processes notice a replaced file within
+    RESTAURANTS_SNAPSHOT_CHECK_SECONDS and map it; if the snapshot was written after the dataset
+    version they last read, they may have cached responses from the previous snapshot under that
+    version, so they bump it. The check runs as each request starts, before any cached response
+    can be served. Only this engine watches the file; the others rebuild from the database when
+    they see a new dataset version.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._identity = None
+        self._next_check = 0.0
+        request_started.connect(self.request_started)
+
+    def build(self):
+        """Map the snapshot file, writing it first if there is none yet."""
+        path = snapshot_path()
+        if not os.path.exists(path):
+            write_snapshot(path)
+        snapshot = map_snapshot(path)
+        self._identity = snapshot.identity
+        return snapshot.index
+
+    def names_at(self, index, positions):
+        """Return the names of the restaurants at `positions`, decoded from the snapshot's string table."""
+        return index.names.at(positions)
+
+    def invalidate(self):
+        """Write a snapshot of the changed data for every worker, then drop the mapped one."""
+        write_snapshot(snapshot_path())
+        super().invalidate()
+
+    def reload(self):
+        """Drop the mapped snapshot so that the current file is mapped on the next lookup."""
+        super().invalidate()
+
+    def check_for_new_snapshot(self):
+        """Reload if the snapshot file was replaced, looking at most once per RESTAURANTS_SNAPSHOT_CHECK_SECONDS."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + getattr(settings, 'RESTAURANTS_SNAPSHOT_CHECK_SECONDS', 1)
+        path = snapshot_path()
+        try:
+            identity = file_identity(os.stat(path))
+        except FileNotFoundError:
+            # Keep answering from the mapped snapshot
+            return
+        if self._identity is None or identity == self._identity:
+            return
+        if read_stamp(path) > get_dataset_version():
+            # Written after the version this process last read, which its cached responses may predate
+            bump_dataset_version()
+            forget_dataset_version()
+        else:
+            self.reload()
+
+    def request_started(self, **kwargs):
+        self.check_for_new_snapshot()
+
+    async def aready(self, version=None):
+        if time.monotonic() >= self._next_check:
+            # Checking reads the dataset version and may bump it, which query the database
+            await sync_to_async(self.check_for_new_snapshot)()
+        await super().aready(version)
+
+    def _get_index(self, version=None):
+        self.check_for_new_snapshot()
+        return super()._get_index(version)
@@ -0,0 +1,168 @@
+import bisect
+import itertools
+from array import array
+from .models import OpeningInterval, Restaurant
+
+
+class StringTable:
+    """Strings stored back to back as UTF-8 in one bytes object, found by their offsets."""
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return self.data[self.offsets[position]:self.offsets[position + 1]].decode()
+
+    def nbytes(self):
+        """Return the bytes held by the table's buffers."""
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class RestaurantRecord:
+    """One restaurant of a RestaurantStore, read from its columns on access."""
+    __slots__ = ('store', 'position')
+
+    def __init__(self, store, position):
+        self.store = store
+        self.position = position
+
+    def __repr__(self):
+        return f'<RestaurantRecord {self.pk}: {self.name}>'
+
+    @property
+    def pk(self):
+        return self.store.ids[self.position]
+
+    @property
+    def name(self):
+        return self.store.names[self.position]
+
+    @property
+    def tz(self):
+        return self.store.zone_names[self.store.zone_codes[self.position]]
+
+    @property
+    def intervals(self):
+        return self.store.intervals_at(self.position)
+
+
+class RestaurantStore:
+    """
+    A compact read-only copy of every restaurant and its opening intervals, as columns of arrays.
+
+    Restaurants are kept in id order. Names are one UTF-8 string table, zones are codes into a
+    short list of zone names, and opening intervals are (start, end) minute-of-week pairs in
+    one `array('H')`, with each restaurant's pairs found by offset. A restaurant costs a few
+    dozen bytes rather than the kilobytes of a model instance and its parsed hours, and no
+    Python object exists per restaurant until a RestaurantRecord is asked for.
+    """
+    __slots__ = ('ids', 'names', 'zone_names', 'zone_codes', 'interval_offsets', 'intervals')
+
+    def __init__(self, ids, names, zone_names, zone_codes, interval_offsets, intervals):
+        self.ids = ids
+        self.names = names
+        self.zone_names = zone_names
+        self.zone_codes = zone_codes
+        self.interval_offsets = interval_offsets
+        self.intervals = intervals
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a store from (pk, name, tz, [(start, end), ...]) rows in id order."""
+        ids = array('q')
+        names = bytearray()
+        name_offsets = array('I', [0])
+        zone_names, zone_code = [], {}
+        zone_codes = array('H')
+        interval_offsets = array('I', [0])
+        intervals = array('H')
+        for pk, name, tz, restaurant_intervals in rows:
+            ids.append(pk)
+            names += name.encode()
+            name_offsets.append(len(names))
+            if tz not in zone_code:
+                zone_code[tz] = len(zone_names)
+                zone_names.append(tz)
+            zone_codes.append(zone_code[tz])
+            for start, end in restaurant_intervals:
+                intervals.append(start)
+                intervals.append(end)
+            interval_offsets.append(len(intervals) // 2)
+        return cls(
+            ids, StringTable(bytes(names), name_offsets), zone_names, zone_codes, interval_offsets, intervals
+        )
+
+    @classmethod
+    def from_database(cls):
+        """Read every restaurant and its intervals, streaming both tables in id order without model instances."""
+        restaurants = Restaurant.objects.order_by('pk').values_list('pk', 'name', 'tz')
+        intervals = OpeningInterval.objects.order_by('restaurant_id', 'start').values_list(
+            'restaurant_id', 'start', 'end'
+        )
+        interval_rows = iter(intervals.iterator(chunk_size=10000))
+
+        def rows():
+            pending = next(interval_rows, None)
+            for pk, name, tz in restaurants.iterator(chunk_size=10000):
+                # Skip the intervals of restaurants deleted while reading
+                while pending is not None and pending[0] < pk:
+                    pending = next(interval_rows, None)
+                restaurant_intervals = []
+                while pending is not None and pending[0] == pk:
+                    restaurant_intervals.append(pending[1:])
+                    pending = next(interval_rows, None)
+                yield pk, name, tz, restaurant_intervals
+
+        return cls.from_rows(rows())
+
+    @classmethod
+    def from_intervals(cls):
+        """
+        Read the restaurants that have opening intervals, in one query over the intervals joined to their restaurants.
+
+        Restaurants without hours are left out. Reading through the intervals means every restaurant
+        is read with all of its intervals, even while they are being changed.
+        """
+        intervals = OpeningInterval.objects.order_by('restaurant_id', 'start').values_list(
+            'restaurant_id', 'restaurant__name', 'restaurant__tz', 'start', 'end'
+        )
+        return cls.from_rows(
+            (pk, name, tz, [(start, end) for *_, start, end in restaurant_rows])
+            for (pk, name, tz), restaurant_rows in itertools.groupby(
+                intervals.iterator(chunk_size=10000), key=lambda row: row[:3]
+            )
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return map(self.record, range(len(self.ids)))
+
+    def record(self, position):
+        """Return the restaurant at `position` in id order."""
+        return RestaurantRecord(self, position)
+
+    def get(self, pk):
+        """Return the restaurant with id `pk`, or raise KeyError."""
+        position = bisect.bisect_left(self.ids, pk)
+        if position == len(self.ids) or self.ids[position] != pk:
+            raise KeyError(pk)
+        return RestaurantRecord(self, position)
+
+    def intervals_at(self, position):
+        """Return the (start, end) opening intervals of the restaurant at `position`, sorted by start."""
+        pairs = self.intervals[2 * self.interval_offsets[position]:2 * self.interval_offsets[position + 1]]
+        return list(zip(pairs[::2], pairs[1::2]))
+
+    def nbytes(self):
+        """Return the bytes held by the store's buffers, not counting the Python objects wrapping them."""
+        return self.names.nbytes() + sum(
+            column.itemsize * len(column)
+            for column in (self.ids, self.zone_codes, self.interval_offsets, self.intervals)
+        )
@@ -1,10 +1,37 @@
 import csv
+import importlib
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from contextlib import redirect_stdout
+from django.apps import apps
 from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
 from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from io import StringIO
-from restaurants.models import Restaurant
+from restaurants.benchmarks import Benchmark, compare_results, populate, retained_bytes
+from restaurants.cache import DATASET_VERSION_KEY, get_cache, get_dataset_version
+from restaurants.engines import DatabaseEngine, NumpyEngine, SlotIndexEngine, np
+from restaurants.fastpath import fast_path_asgi, fast_path_wsgi, wrap_application
+from restaurants.geo import GeoGridIndex, haversine_km
+from restaurants import hours, metrics, utils, zones
+from restaurants.hours import (
+    MINUTES_PER_DAY, MINUTES_PER_WEEK, HoursSyntaxError, ScheduleCache, check_open_hours, compile_schedule,
+    hours_digest, parse_hours, parse_schedule, regex_parse_hours, schedule_hours,
+)
+from restaurants.models import DatasetVersion, ImportReport, OpeningInterval, Restaurant
+from restaurants.routers import ReadOnlyRouter
+from restaurants.snapshot import SnapshotEngine, SnapshotError, map_snapshot, read_stamp, write_snapshot
+from restaurants.store import RestaurantStore
 from restaurants.views import RestaurantListAPIView
 from django.conf import settings
 
@@ -13,6 +40,7 @@ class RestaurantTest(TestCase):
 
     def setUp(self):
         # Load data from the CSV into the Restaurant model
+        get_cache().clear()
         self.view = RestaurantListAPIView()
         self.load_csv_data()
 
@@ -34,6 +62,98 @@ class RestaurantTest(TestCase):
         self.assertEqual(Restaurant.objects.count(), 40)
         self.assertTrue(Restaurant.objects.filter(name="The Cowfish Sushi Burger Bar").exists())
 
+    def test_import_restaurants_in_batches(self):
+        """Test that a batched import stores every restaurant with its intervals and reports progress."""
+        out = StringIO()
+        call_command('import_restaurants', batch_size=7, stdout=out)
+        self.assertEqual(Restaurant.objects.count(), 40)
+        self.assertEqual(out.getvalue().count('Imported '), 6)
+        self.assertIn('Imported 40 rows', out.getvalue())
+        cowfish = Restaurant.objects.get(name="The Cowfish Sushi Burger Bar")
+        self.assertEqual(cowfish.opening_intervals.count(), 7)
+        self.assertEqual(OpeningInterval.objects.filter(restaurant__in=Restaurant.objects.all()).count(),
+                         OpeningInterval.objects.count())
+
+    def test_import_restaurants_invalid_hours_rolls_back(self):
+        """Test that a row with unparseable hours fails the import and keeps the existing data."""
+        invalid_file_path = os.path.join(os.path.dirname(__file__), 'invalid_hours_restaurants.csv')
+        with open(invalid_file_path, 'w') as f:
+            f.write('"Restaurant Name","Hours"\n"Good","Mon 9 am - 5 pm"\n"Bad","Mon 25 pm - 5 pm"\n'
+                    '"Worse","Mon-Fry 9 am - 5 pm"\n')
+
+        err = StringIO()
+        try:
+            with self.assertRaises(CommandError) as cm:
+                call_command('import_restaurants', invalid_file_path, batch_size=1, stdout=StringIO(), stderr=err)
+        finally:
+            os.remove(invalid_file_path)
+
+        self.assertIn("2 rows have invalid hours", str(cm.exception))
+        self.assertIn("Row 3 (Bad)", err.getvalue())
+        self.assertIn("Row 4 (Worse)", err.getvalue())
+        self.assertEqual(Restaurant.objects.count(), 40)
+
+    def test_import_restaurants_with_workers(self):
+        """Test that parsing hours in worker processes imports the same data in file order."""
+        call_command('import_restaurants', stdout=StringIO())
+        serial = list(Restaurant.objects.order_by('pk', 'opening_intervals__start').values_list('name', 'opening_intervals__start'))
+        call_command('import_restaurants', batch_size=3, workers=2, stdout=StringIO())
+        parallel = list(Restaurant.objects.order_by('pk', 'opening_intervals__start').values_list('name', 'opening_intervals__start'))
+        self.assertEqual(parallel, serial)
+
+    def test_import_restaurants_diff(self):
+        """Test that a differential import only writes the restaurants that changed."""
+        call_command('import_restaurants', stdout=StringIO())
+        unchanged = Restaurant.objects.get(name="Gravy")
+        unchanged_interval_ids = set(unchanged.opening_intervals.values_list('pk', flat=True))
+        renamed_hours = Restaurant.objects.get(name="Seoul 116")
+        # Matched by name, so the stored external id is kept
+        Restaurant.objects.filter(pk=renamed_hours.pk).update(external_id="seoul-116")
+
+        diff_file_path = os.path.join(os.path.dirname(__file__), 'diff_test_restaurants.csv')
+        with open(os.path.join(settings.BASE_DIR, 'restaurants', 'restaurants.csv')) as f:
+            rows = list(csv.reader(f))
+        rows = [row for row in rows if row[0] != "Death and Taxes"]
+        rows = [[name, "Mon-Sun 11 am - 2 am" if name == "Seoul 116" else hours] for name, hours in rows]
+        rows.append(["New Place", "Tues-Sat 5 pm - 10 pm"])
+        with open(diff_file_path, 'w', newline='') as f:
+            csv.writer(f, quoting=csv.QUOTE_ALL).writerows(rows)
+
+        out = StringIO()
+        try:
+            call_command('import_restaurants', diff_file_path, diff=True, stdout=out)
+        finally:
+            os.remove(diff_file_path)
+
+        self.assertIn("Inserted 1, updated 1, deleted 1 and left 38 restaurants unchanged", out.getvalue())
+        self.assertEqual(Restaurant.objects.count(), 40)
+        self.assertFalse(Restaurant.objects.filter(name="Death and Taxes").exists())
+        self.assertEqual(set(unchanged.opening_intervals.values_list('pk', flat=True)), unchanged_interval_ids)
+        renamed_hours.refresh_from_db()
+        self.assertEqual(renamed_hours.hours, "Mon-Sun 11 am - 2 am")
+        self.assertEqual(renamed_hours.external_id, "seoul-116")
+        self.assertEqual(renamed_hours.opening_intervals.filter(weekday=1, start=MINUTES_PER_DAY).get().end,
+                         MINUTES_PER_DAY + 2 * 60 + 1)
+
+    def test_import_restaurants_diff_by_external_id(self):
+        """Test that a differential import matches rows by external id when the file has one."""
+        diff_file_path = os.path.join(os.path.dirname(__file__), 'diff_test_restaurants.csv')
+        try:
+            with open(diff_file_path, 'w') as f:
+                f.write('"External ID","Restaurant Name","Hours"\n"r1","First Name","Mon 9 am - 5 pm"\n')
+            call_command('import_restaurants', diff_file_path, diff=True, stdout=StringIO())
+            restaurant = Restaurant.objects.get(external_id="r1")
+
+            with open(diff_file_path, 'w') as f:
+                f.write('"External ID","Restaurant Name","Hours"\n"r1","Second Name","Mon 9 am - 5 pm"\n')
+            call_command('import_restaurants', diff_file_path, diff=True, stdout=StringIO())
+        finally:
+            os.remove(diff_file_path)
+
+        self.assertEqual(Restaurant.objects.count(), 1)
+        self.assertEqual(Restaurant.objects.get(external_id="r1").pk, restaurant.pk)
+        self.assertEqual(Restaurant.objects.get(external_id="r1").name, "Second Name")
+
     def test_import_restaurants_file_not_found(self):
         with self.assertRaises(CommandError):
             call_command('import_restaurants', 'non_existent_file.csv')
@@ -72,6 +192,24 @@ class RestaurantTest(TestCase):
         open_restaurants = data.get('open_restaurants', [])
         self.assertEqual(len(open_restaurants), 36)
 
+    def test_closing_minute_is_open_to_the_second(self):
+        """Test that lookups drop seconds, so a time inside the closing minute counts as open."""
+        Restaurant.objects.all().delete()
+        Restaurant.objects.create(name="Five O'Clock", hours="Mon-Sun 9 am - 5 pm")
+        for value, expected in [('17:00:00', True), ('17:00:30', True), ('17:00:59.999', True), ('17:01:00', False)]:
+            response = self.client.get('/restaurants/api/open', {'datetime': f'2024-08-28T{value}'})
+            self.assertEqual(response.json()['open_restaurants'], ["Five O'Clock"] if expected else [], value)
+        # Unlike the original per-restaurant check, which compares the full time
+        parsed = hours.parse_hours("Mon-Sun 9 am - 5 pm")
+        self.assertFalse(hours.is_within_open_hours(parsed['Wednesday'], parse_datetime('2024-08-28T17:00:30').time()))
+
+    def test_open_restaurants_single_query(self):
+        """Test that the open restaurants are found with one database query."""
+        apps.get_app_config('restaurants').boundary_index.next_boundary(0)  # Built once per dataset version
+        with self.assertNumQueries(1):
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+        self.assertEqual(response.status_code, 200)
+
     def test_missing_datetime(self):
         """Test that the request returns an error when no datetime parameter is provided."""
         response = self.client.get('/restaurants/api/open')
@@ -196,3 +334,1259 @@ class RestaurantTest(TestCase):
         datetime_obj = parse_datetime(datetime_str)
         is_open = self.view.check_open_hours(parsed_hours, datetime_obj)
         self.assertTrue(is_open)
+
+    # Opening interval Tests
+    def test_opening_intervals_built_on_save(self):
+        """Test that saving a restaurant stores one interval per open weekday."""
+        restaurant = Restaurant.objects.create(name="Weekday Deli", hours="Mon-Fri 9 am - 5 pm")
+        intervals = list(restaurant.opening_intervals.order_by('start').values_list('weekday', 'start', 'end'))
+        self.assertEqual(len(intervals), 5)
+        self.assertEqual(intervals[0], (0, 9 * 60, 17 * 60 + 1))
+        self.assertEqual(intervals[4], (4, 4 * MINUTES_PER_DAY + 9 * 60, 4 * MINUTES_PER_DAY + 17 * 60 + 1))
+
+    def test_opening_intervals_split_past_midnight(self):
+        """Test that hours extending past midnight are split at the day boundary."""
+        restaurant = Restaurant.objects.create(name="Late Night", hours="Sat 8 pm - 2 am")
+        intervals = list(restaurant.opening_intervals.filter(weekday=5).order_by('start').values_list('start', 'end'))
+        saturday = 5 * MINUTES_PER_DAY
+        self.assertEqual(intervals, [(saturday, saturday + 2 * 60), (saturday + 20 * 60, saturday + MINUTES_PER_DAY)])
+
+    def test_hours_past_midnight_spill_into_next_day(self):
+        """Test that Sunday hours past midnight spill into Monday morning and closing at midnight spills nothing."""
+        parsed_hours = self.view.parse_hours("Sun 8 pm - 2 am / Wed 11 am - 12 am")
+        self.assertTrue(self.view.check_open_hours(parsed_hours, parse_datetime('2024-08-26T01:30:00')))
+        self.assertFalse(self.view.check_open_hours(parsed_hours, parse_datetime('2024-08-27T01:30:00')))
+        self.assertFalse(self.view.check_open_hours(parsed_hours, parse_datetime('2024-08-29T09:00:00')))
+
+    def test_opening_intervals_rebuilt_on_update(self):
+        """Test that changing the hours replaces the previous intervals."""
+        restaurant = Restaurant.objects.create(name="Changing Hours", hours="Mon-Sun 9 am - 5 pm")
+        restaurant.hours = "Sat 9 am - 5 pm"
+        restaurant.save()
+        self.assertEqual(list(restaurant.opening_intervals.values_list('weekday', flat=True)), [5])
+        restaurant.delete()
+        self.assertFalse(OpeningInterval.objects.filter(restaurant_id=restaurant.pk).exists())
+
+
+class EngineReferenceMixin:
+
+    def reference_open_names(self):
+        """Return the names open at every minute of the week according to check_open_hours."""
+        restaurants = [(r.name, parse_hours(r.hours)) for r in Restaurant.objects.order_by('pk')]
+        monday = parse_datetime('2024-08-26T00:00:00')
+        return [
+            [name for name, parsed_hours in restaurants
+             if check_open_hours(parsed_hours, monday + timedelta(minutes=minute))]
+            for minute in range(MINUTES_PER_WEEK)
+        ]
+
+    def assertMatchesReferenceEveryMinute(self, engine):
+        Restaurant.objects.create(name="Blink Cafe", hours="Mon 9:07 am - 9:08 am / Tues 9:10 am - 9:12 am")
+        for minute, expected in enumerate(self.reference_open_names()):
+            self.assertEqual(engine.open_restaurant_names(minute), expected, minute)
+
+
+class SlotIndexEngineTest(EngineReferenceMixin, TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        self.engine = SlotIndexEngine()
+
+    def test_matches_check_open_hours_every_minute(self):
+        """Test that the slot index agrees with check_open_hours at every minute of the week."""
+        self.assertMatchesReferenceEveryMinute(self.engine)
+
+    def test_view_uses_memory_engine(self):
+        """Test that the view answers from the slot index and sees restaurants saved afterwards."""
+        config = apps.get_app_config('restaurants')
+        with mock.patch.object(config, 'open_hours_engine', self.engine):
+            # Reading the dataset version, building the index and the boundaries, then no queries per request
+            with self.assertNumQueries(4):
+                self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T16:55:00'})
+                response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+            self.assertEqual(len(response.json()['open_restaurants']), 39)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Restaurant.objects.create(name="Early Bird", hours="Wed 4 pm - 6 pm")
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+            self.assertIn("Early Bird", response.json()['open_restaurants'])
+
+
+class ScheduleCacheTest(TestCase):
+
+    def test_repeated_hours_are_cache_hits(self):
+        """Test that a repeated hours string is only compiled once."""
+        cache = ScheduleCache(maxsize=10)
+        first = cache.get("Mon-Sun 11:00 am - 10 pm")
+        second = cache.get("Mon-Sun 11:00 am - 10 pm")
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 10})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its size by evicting the least recently used schedule."""
+        cache = ScheduleCache(maxsize=2)
+        cache.get("Mon 9 am - 5 pm")
+        cache.get("Tues 9 am - 5 pm")
+        cache.get("Mon 9 am - 5 pm")
+        cache.get("Wed 9 am - 5 pm")
+        cache.get("Mon 9 am - 5 pm")
+        self.assertEqual(cache.stats()['hits'], 2)
+        cache.get("Tues 9 am - 5 pm")
+        self.assertEqual(cache.stats()['misses'], 4)
+
+    def test_invalid_hours_are_not_cached(self):
+        """Test that hours that fail to parse raise every time instead of being cached."""
+        cache = ScheduleCache()
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cache.get("Mon 25 pm - 5 pm")
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+@skipUnless(np is not None, "numpy is not installed")
+class NumpyEngineTest(EngineReferenceMixin, TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        self.engine = NumpyEngine()
+
+    def test_matches_check_open_hours_every_minute(self):
+        """Test that the numpy engine agrees with check_open_hours at every minute of the week."""
+        self.assertMatchesReferenceEveryMinute(self.engine)
+
+    def test_many_minutes_match_reference(self):
+        """Test that answering every minute of the week at once matches check_open_hours."""
+        expected = self.reference_open_names()
+        open_by_minute = self.engine.open_restaurant_names_many(range(MINUTES_PER_WEEK))
+        self.assertEqual([open_by_minute[minute] for minute in range(MINUTES_PER_WEEK)], expected)
+
+
+class ResponseCacheTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+
+    def test_same_minute_of_week_is_served_from_cache(self):
+        """Test that another date at the same weekday and time is answered without querying the database."""
+        first = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+        with self.assertNumQueries(0):
+            second = self.client.get('/restaurants/api/open', {'datetime': '2024-09-04T17:00:30'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_restaurant_changes_invalidate_cache(self):
+        """Test that saving or deleting a restaurant bumps the dataset version and bypasses old responses."""
+        self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.create(name="Early Bird", hours="Wed 4 pm - 6 pm")
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+        self.assertIn("Early Bird", response.json()['open_restaurants'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.filter(name="Early Bird").delete()
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T17:00:00'})
+        self.assertNotIn("Early Bird", response.json()['open_restaurants'])
+
+    def test_import_invalidates_cache(self):
+        """Test that an import bumps the dataset version."""
+        version = get_dataset_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_restaurants', stdout=StringIO())
+        self.assertGreater(get_dataset_version(), version)
+
+    def test_changes_made_by_other_processes(self):
+        """Test that a version moved in another process's transaction reaches responses and in-memory indexes."""
+        config = apps.get_app_config('restaurants')
+        with mock.patch.object(config, 'open_hours_engine', SlotIndexEngine()):
+            self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T05:00:00'})
+            version = get_dataset_version()
+            # Saved without running on_commit callbacks, as if by another process
+            Restaurant.objects.create(name="Early Bird", hours="Wed 4 am - 6 am")
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T05:00:00'})
+            self.assertNotIn("Early Bird", response.json()['open_restaurants'])
+
+            # Once RESTAURANTS_DATASET_VERSION_CHECK_SECONDS have passed, the stored version is read again
+            get_cache().delete(DATASET_VERSION_KEY)
+            self.assertGreater(get_dataset_version(), version)
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T05:00:00'})
+            self.assertIn("Early Bird", response.json()['open_restaurants'])
+
+
+class BatchEndpointTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+
+    def test_batch_matches_single_requests(self):
+        """Test that each batch result matches the single-datetime endpoint, in request order."""
+        datetimes = ['2024-08-28T17:00:00', '2024-08-25T17:00:00', '2024-08-30T03:00:00', '2024-08-28T17:00:00']
+        response = self.client.post(
+            '/restaurants/api/open/batch', {'datetimes': datetimes}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['datetime'] for result in results], datetimes)
+        for result in results:
+            single = self.client.get('/restaurants/api/open', {'datetime': result['datetime']})
+            self.assertEqual(result['open_restaurants'], single.json()['open_restaurants'])
+
+    def test_database_engine_batch_matches_single_lookups(self):
+        """Test that the one-pass batch lookup agrees with single lookups across the week."""
+        engine = DatabaseEngine()
+        minutes = list(range(0, MINUTES_PER_WEEK, 7))
+        with self.assertNumQueries(2):
+            open_by_minute = engine.open_restaurant_names_many(minutes)
+        for minute in minutes:
+            self.assertEqual(open_by_minute[minute], engine.open_restaurant_names(minute))
+
+    def test_batch_invalid_datetime(self):
+        """Test that an invalid datetime in the batch is reported with its position."""
+        datetimes = ['2024-08-28T17:00:00', '2024-08-28']
+        response = self.client.post(
+            '/restaurants/api/open/batch', {'datetimes': datetimes}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['error'],
+            "datetimes[1]: The provided datetime is missing time information. Please include both date and time."
+        )
+
+    def test_batch_requires_datetimes(self):
+        """Test that the batch must contain at least one datetime."""
+        response = self.client.post('/restaurants/api/open/batch', {'datetimes': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('datetimes', response.json()['error'])
+
+
+class WindowEndpointTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        Restaurant.objects.create(name="Weekend Owl", hours="Sun 10 pm - 3 am / Sat 9 pm - 11:30 pm")
+        Restaurant.objects.create(name="Always Open", hours="Mon-Sun 12 am - 12 am")
+
+    def brute_force(self, start, length):
+        """Return the restaurants open at every minute, and at any minute, of a window using point lookups."""
+        engine = DatabaseEngine()
+        open_sets = [set(engine.open_restaurant_names((start + offset) % MINUTES_PER_WEEK)) for offset in range(length)]
+        return set.intersection(*open_sets), set.union(*open_sets)
+
+    def get_window(self, start, end, mode):
+        response = self.client.get('/restaurants/api/open/window', {'start': start, 'end': end, 'mode': mode})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['open_restaurants']
+
+    def test_windows_match_point_lookups(self):
+        """Test full-window and any-point answers, including windows wrapping past midnight and the week end."""
+        windows = [
+            ('2024-08-28T19:00:00', '2024-08-28T21:00:00'),  # Wednesday dinner
+            ('2024-08-31T22:00:00', '2024-09-01T02:00:00'),  # Saturday into Sunday
+            ('2024-09-01T23:00:00', '2024-09-02T02:30:00'),  # Sunday into Monday, across the week end
+            ('2024-08-30T03:59:00', '2024-08-30T04:01:00'),  # Seoul 116 closes at 4 am
+        ]
+        for start, end in windows:
+            start_dt, end_dt = parse_datetime(start), parse_datetime(end)
+            length = int((end_dt - start_dt).total_seconds() // 60)
+            expected_all, expected_any = self.brute_force(hours.minute_of_week(start_dt), length)
+            self.assertEqual(set(self.get_window(start, end, 'all')), expected_all, start)
+            self.assertEqual(set(self.get_window(start, end, 'any')), expected_any, start)
+
+    def test_wrapping_span_covers_week_end(self):
+        """Test that hours from Sunday night into Monday count as one continuous span."""
+        names = self.get_window('2024-09-01T23:00:00', '2024-09-02T02:00:00', 'all')
+        self.assertIn("Weekend Owl", names)
+        self.assertIn("Always Open", names)
+        names = self.get_window('2024-09-01T23:00:00', '2024-09-02T03:02:00', 'all')
+        self.assertNotIn("Weekend Owl", names)
+
+    def test_week_long_window(self):
+        """Test that a window of a week or more only fully matches restaurants that never close."""
+        self.assertEqual(self.get_window('2024-08-26T05:00:00', '2024-09-10T00:00:00', 'all'), ["Always Open"])
+        self.assertEqual(len(self.get_window('2024-08-26T05:00:00', '2024-09-10T00:00:00', 'any')), 42)
+
+    def test_end_before_start(self):
+        """Test that the window must end after it starts."""
+        response = self.client.get(
+            '/restaurants/api/open/window', {'start': '2024-08-28T19:00:00', 'end': '2024-08-28T19:00:30'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "The 'end' datetime must be at least a minute after 'start'.")
+
+    def test_missing_end(self):
+        """Test that both ends of the window are required."""
+        response = self.client.get('/restaurants/api/open/window', {'start': '2024-08-28T19:00:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "A 'end' query parameter is required.")
+
+    def test_mixed_naive_and_aware_ends(self):
+        """Test that a window with only one end carrying a UTC offset is rejected with a readable message."""
+        error = "The 'start' and 'end' datetimes must both have a UTC offset or both leave it out."
+        for start, end in [('2024-08-28T19:00:00', '2024-08-28T21:00:00-04:00'),
+                           ('2024-08-28T19:00:00Z', '2024-08-28T21:00:00')]:
+            response = self.client.get('/restaurants/api/open/window', {'start': start, 'end': end})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], error)
+
+
+class LargeResultTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        self.datetime = '2024-08-30T19:00:00'
+        self.expected = DatabaseEngine().open_restaurant_names(hours.minute_of_week(parse_datetime(self.datetime)))
+
+    def test_cursor_pages_cover_every_open_restaurant(self):
+        """Test that following next_cursor visits every open restaurant once, in id order."""
+        names, params, pages = [], {'datetime': self.datetime, 'limit': 3}, 0
+        while True:
+            response = self.client.get('/restaurants/api/open', params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['open_restaurants']), 3)
+            names.extend(page['open_restaurants'])
+            pages += 1
+            if page['next_cursor'] is None:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(names, self.expected)
+        self.assertEqual(pages, -(-len(self.expected) // 3))
+
+    def test_invalid_limit(self):
+        """Test that limits outside 1..RESTAURANTS_PAGE_MAX_LIMIT are rejected."""
+        for limit in ('0', 'ten', str(settings.RESTAURANTS_PAGE_MAX_LIMIT + 1)):
+            response = self.client.get('/restaurants/api/open', {'datetime': self.datetime, 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("'limit'", response.json()['error'])
+
+    def test_stream_matches_full_response(self):
+        """Test that the streamed document is the same JSON as the regular response."""
+        with mock.patch.object(RestaurantListAPIView, 'stream_chunk_size', 4):
+            response = self.client.get('/restaurants/api/open', {'datetime': self.datetime, 'stream': 'true'})
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content)
+        self.assertEqual(json.loads(body), {"open_restaurants": self.expected})
+        self.assertEqual(body, self.client.get('/restaurants/api/open', {'datetime': self.datetime}).content)
+
+    def test_stream_with_no_open_restaurants(self):
+        """Test that an empty stream is still a valid document."""
+        Restaurant.objects.all().delete()
+        response = self.client.get('/restaurants/api/open', {'datetime': self.datetime, 'stream': 'true'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {"open_restaurants": []})
+
+
+class AsyncViewTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+
+    async def test_matches_sync_view(self):
+        """Test that the async endpoint returns the same bodies as the synchronous one."""
+        for datetime_str in ('2024-08-28T17:00:00', '2024-08-31T23:59:00', '2024-09-02T03:00:00'):
+            response = await self.async_client.get('/restaurants/api/open/async', {'datetime': datetime_str})
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.client.get)('/restaurants/api/open', {'datetime': datetime_str})
+            self.assertEqual(response.content, expected.content)
+
+    async def test_invalid_datetime(self):
+        """Test that the async endpoint reports the same validation errors."""
+        response = await self.async_client.get('/restaurants/api/open/async', {'datetime': '2024-08-28'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['error'],
+            "The provided datetime is missing time information. Please include both date and time."
+        )
+
+    async def test_in_memory_engine(self):
+        """Test that an in-memory engine builds its index off the event loop and then answers from memory."""
+        engine = SlotIndexEngine()
+        expected = await sync_to_async(DatabaseEngine().open_restaurant_names)(1000)
+        self.assertEqual(await engine.aopen_restaurant_names(1000), expected)
+        self.assertEqual(await engine.aopen_restaurant_names(1000), expected)
+
+    async def test_version_read_once_per_request(self):
+        """Test that with no dataset version reuse, lookups never query the database on the event loop."""
+        config = apps.get_app_config('restaurants')
+        with self.settings(RESTAURANTS_DATASET_VERSION_CHECK_SECONDS=0):
+            for engine in (DatabaseEngine(), SlotIndexEngine(), NumpyEngine() if np else DatabaseEngine()):
+                with mock.patch.object(config, 'open_hours_engine', engine):
+                    for query in ({'datetime': '2024-08-28T17:00:00'}, {'datetime': '2024-08-28T17:00:00-04:00'}):
+                        response = await self.async_client.get('/restaurants/api/open/async', query)
+                        self.assertEqual(response.status_code, 200, (engine, query))
+                        expected = await sync_to_async(self.client.get)('/restaurants/api/open', query)
+                        self.assertEqual(response.content, expected.content)
+
+
+class FastPathTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        self.django_app = mock.Mock(return_value=[b'django'])
+        self.app = fast_path_wsgi(self.django_app)
+
+    def call(self, path, query_string, method='GET'):
+        """Call the wrapped application and return (status, headers, body)."""
+        start_response = mock.Mock()
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query_string}
+        body = b''.join(self.app(environ, start_response))
+        if not start_response.called:
+            return None, None, body
+        status, headers = start_response.call_args.args
+        return status, dict(headers), body
+
+    def test_matches_full_view(self):
+        """Test that the fast path answers lookups and errors with the same JSON as the DRF view."""
+        for query in ('datetime=2024-08-28T17:00:00', 'datetime=2024-08-31T23:59:00', 'datetime=2024-08-28', ''):
+            status, headers, body = self.call('/restaurants/api/open', query)
+            expected = self.client.get(f'/restaurants/api/open?{query}')
+            self.assertEqual(int(status.split()[0]), expected.status_code)
+            self.assertEqual(json.loads(body), expected.json())
+            self.assertEqual(headers['Content-Length'], str(len(body)))
+        self.django_app.assert_not_called()
+
+    def test_out_of_range_instants(self):
+        """Test that instants that can't be converted to every zone are a 400 on each path, not a server error."""
+        query = 'datetime=9999-12-31T23:59:00-05:00'
+        error = {"error": "date value out of range"}
+        status, _, body = self.call('/restaurants/api/open', query)
+        self.assertEqual((status, json.loads(body)), ('400 Bad Request', error))
+        for path in ('/restaurants/api/open', '/restaurants/api/open/async'):
+            response = self.client.get(f'{path}?{query}')
+            self.assertEqual((response.status_code, response.json()), (400, error), path)
+        response = self.client.post(
+            '/restaurants/api/open/batch', {'datetimes': ['9999-12-31T23:59:00-05:00']}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "datetimes[0]: date value out of range"})
+
+    def test_out_of_range_next_changes(self):
+        """Test that next changes that fall past the end of the calendar are a 400, not a server error."""
+        response = self.client.get('/restaurants/api/next', {'datetime': '9999-12-31T23:59:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "date value out of range"})
+
+    def test_other_requests_reach_django(self):
+        """Test that other URLs, methods, pagination and streaming fall through to the Django application."""
+        for path, query, method in [
+            ('/restaurants/api/open/batch', '', 'POST'),
+            ('/restaurants/api/open', 'datetime=2024-08-28T17:00:00', 'HEAD'),
+            ('/restaurants/api/open', 'datetime=2024-08-28T17:00:00&limit=5', 'GET'),
+            ('/restaurants/api/open', 'datetime=2024-08-28T17:00:00&stream=true', 'GET'),
+        ]:
+            self.assertEqual(self.call(path, query, method), (None, None, b'django'))
+        self.assertEqual(self.django_app.call_count, 4)
+
+    def test_disabled_by_default(self):
+        """Test that applications are only wrapped when RESTAURANTS_OPEN_FAST_PATH is enabled."""
+        self.assertIs(wrap_application(self.django_app, 'wsgi'), self.django_app)
+        with self.settings(RESTAURANTS_OPEN_FAST_PATH=True):
+            self.assertIsNot(wrap_application(self.django_app, 'wsgi'), self.django_app)
+
+    async def test_asgi(self):
+        """Test the ASGI wrapper end to end."""
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        app = fast_path_asgi(mock.AsyncMock())
+        scope = {'type': 'http', 'method': 'GET', 'path': '/restaurants/api/open',
+                 'query_string': b'datetime=2024-08-28T17:00:00'}
+        await app(scope, None, send)
+        expected = await sync_to_async(self.client.get)('/restaurants/api/open?datetime=2024-08-28T17:00:00')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(json.loads(messages[1]['body']), expected.json())
+
+
+class ConditionalRequestTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        self.params = {'datetime': '2024-08-28T17:00:00'}
+
+    def test_matching_etag_returns_304_without_lookup(self):
+        """Test that revalidating with the ETag skips the response cache, the engine and serialization."""
+        response = self.client.get('/restaurants/api/open', self.params)
+        etag = response.headers['ETag']
+        with self.assertNumQueries(0), mock.patch('restaurants.cache.get_open_response') as get_open_response:
+            not_modified = self.client.get('/restaurants/api/open', self.params, headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified.headers['ETag'], etag)
+        get_open_response.assert_not_called()
+
+        # Any other date at the same minute of the week has the same answer and ETag
+        response = self.client.get(
+            '/restaurants/api/open', {'datetime': '2024-09-04T17:00:00'}, headers={'If-None-Match': f'W/{etag}'}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Test that the Last-Modified date of the dataset can be revalidated too."""
+        last_modified = self.client.get('/restaurants/api/open', self.params).headers['Last-Modified']
+        response = self.client.get('/restaurants/api/open', self.params, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        """Test that a restaurant write moves the dataset version forward, so old ETags no longer match."""
+        version = get_dataset_version()
+        etag = self.client.get('/restaurants/api/open', self.params).headers['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.create(name="Early Bird", hours="Wed 4 pm - 6 pm")
+        self.assertGreater(get_dataset_version(), version)
+        response = self.client.get('/restaurants/api/open', self.params, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertIn("Early Bird", response.json()['open_restaurants'])
+
+    def test_validators_follow_the_stored_version(self):
+        """Test that every process sends the same validators, and that a change made elsewhere ends the 304s."""
+        # The data last changed five seconds ago
+        DatasetVersion.objects.update(version=F('version') - 5000)
+        response = self.client.get('/restaurants/api/open', self.params)
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        self.assertEqual(last_modified, http_date(DatasetVersion.objects.get().version // 1000))
+        # A process with nothing cached reads the same version
+        get_cache().clear()
+        response = self.client.get('/restaurants/api/open', self.params)
+        self.assertEqual((response.headers['ETag'], response.headers['Last-Modified']), (etag, last_modified))
+
+        # Saved without running on_commit callbacks, as if by another process, then this one reads the version again
+        Restaurant.objects.create(name="Early Bird", hours="Wed 4 pm - 6 pm")
+        get_cache().delete(DATASET_VERSION_KEY)
+        for headers in [{'If-None-Match': etag}, {'If-Modified-Since': last_modified}]:
+            response = self.client.get('/restaurants/api/open', self.params, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Early Bird", response.json()['open_restaurants'])
+
+    def test_max_age_runs_to_next_boundary(self):
+        """Test that Cache-Control lasts until the next opening or closing, capped by RESTAURANTS_OPEN_MAX_AGE."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.all().delete()
+            Restaurant.objects.create(name="Corner Diner", hours="Mon-Sun 11 am - 10 pm")
+
+        # Same-day hours include their closing minute, so the answer changes at 10:01 pm
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T21:58:30'})
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=150')
+
+        # From Sunday night the next boundary is Monday at 11 am, past the cap
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-09-01T23:00:00'})
+        self.assertEqual(response.headers['Cache-Control'], f'public, max-age={settings.RESTAURANTS_OPEN_MAX_AGE}')
+
+    def test_fast_path_returns_304(self):
+        """Test that the fast path handles conditional requests the same way."""
+        etag = self.client.get('/restaurants/api/open', self.params).headers['ETag']
+        start_response = mock.Mock()
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': '/restaurants/api/open',
+            'QUERY_STRING': 'datetime=2024-08-28T17:00:00', 'HTTP_IF_NONE_MATCH': etag,
+        }
+        self.assertEqual(b''.join(fast_path_wsgi(mock.Mock())(environ, start_response)), b'')
+        self.assertEqual(start_response.call_args.args[0], '304 Not Modified')
+
+
+class NextChangeTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        Restaurant.objects.create(name="Weekend Owl", hours="Sun 10 pm - 3 am / Sat 9 pm - 11:30 pm")
+        Restaurant.objects.create(name="Always Open", hours="Mon-Sun 12 am - 12 am")
+        self.index = apps.get_app_config('restaurants').boundary_index
+
+    def test_matches_minute_by_minute_scan(self):
+        """Test the next changes against scanning the open restaurants minute by minute, across the week end."""
+        open_by_minute = DatabaseEngine().open_restaurant_names_many(range(MINUTES_PER_WEEK))
+        open_by_minute = {minute: set(names) for minute, names in open_by_minute.items()}
+        for minute in (0, 1000, 1439, 1440, 3900, 8639, 9960, 10079):
+            for name, is_open, change in self.index.next_changes(minute):
+                self.assertEqual(name in open_by_minute[minute], is_open, (name, minute))
+                expected = next(
+                    (later for later in range(minute + 1, minute + MINUTES_PER_WEEK + 1)
+                     if (name in open_by_minute[later % MINUTES_PER_WEEK]) != is_open),
+                    None,
+                )
+                self.assertEqual(change, expected, (name, minute))
+
+    def test_next_boundary_is_earliest_change(self):
+        """Test that the global boundary used for Cache-Control is the earliest next change of any restaurant."""
+        for minute in (0, 3900, 10079):
+            changes = [change for _, _, change in self.index.next_changes(minute) if change is not None]
+            self.assertEqual(self.index.next_boundary(minute), min(changes))
+
+    def test_endpoint(self):
+        """Test the datetimes returned for open, closed and never-closing restaurants."""
+        response = self.client.get('/restaurants/api/next', {'datetime': '2024-09-01T23:30:45'})
+        self.assertEqual(response.status_code, 200)
+        restaurants = {restaurant['name']: restaurant for restaurant in response.json()['restaurants']}
+        self.assertEqual(
+            restaurants["Weekend Owl"], {"name": "Weekend Owl", "open": True, "next_close": "2024-09-02T03:01:00"}
+        )
+        self.assertEqual(restaurants["Always Open"], {"name": "Always Open", "open": True, "next_close": None})
+        self.assertEqual(restaurants["Beasley's Chicken + Honey"]["next_open"][:10], "2024-09-02")
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+
+    def test_missing_datetime(self):
+        """Test that the datetime parameter is required."""
+        response = self.client.get('/restaurants/api/next')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "A 'datetime' query parameter is required.")
+
+
+class TimeZoneTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.restaurants = [
+            Restaurant.objects.create(name="Night Owl", hours="Mon-Sun 1 am - 2:30 am", tz="America/New_York"),
+            Restaurant.objects.create(name="Lunch Counter", hours="Mon-Sun 11 am - 2 pm", tz="America/Los_Angeles"),
+            Restaurant.objects.create(name="Harbour Cafe", hours="Mon-Sun 9 am - 5 pm"),
+            Restaurant.objects.create(name="Bagel Shop", hours="Mon-Fri 6 am - 11 am", tz="America/New_York"),
+        ]
+
+    def engines(self):
+        engines = [DatabaseEngine(), SlotIndexEngine()]
+        if np is not None:
+            engines.append(NumpyEngine())
+        return engines
+
+    def reference_open_names(self, datetime_obj):
+        return [
+            restaurant.name for restaurant in self.restaurants
+            if check_open_hours(parse_hours(restaurant.hours), datetime_obj, restaurant.tz)
+        ]
+
+    def assertEnginesMatchReference(self, instants):
+        for engine in self.engines():
+            for instant in instants:
+                local = zones.local_minutes(instant)
+                self.assertEqual(
+                    zones.open_restaurant_names(engine, local), self.reference_open_names(instant),
+                    (type(engine).__name__, instant.isoformat()),
+                )
+
+    def instants_around(self, utc_datetime_str):
+        start = parse_datetime(utc_datetime_str)
+        return [start + timedelta(minutes=offset) for offset in range(-180, 180, 7)]
+
+    def test_aware_datetimes_are_converted_per_zone(self):
+        """Test that an instant is compared with each restaurant's hours in its own zone."""
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T19:00:00Z'})
+        self.assertEqual(response.json()['open_restaurants'], ["Lunch Counter"])  # 12 pm in Los Angeles
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T15:00:00+02:00'})
+        self.assertEqual(response.json()['open_restaurants'], ["Harbour Cafe", "Bagel Shop"])
+
+    def test_naive_datetimes_are_local_everywhere(self):
+        """Test that a naive datetime is read as wall-clock time in every zone, as before."""
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T12:00:00'})
+        self.assertEqual(response.json()['open_restaurants'], ["Lunch Counter", "Harbour Cafe"])
+
+    def test_spring_forward(self):
+        """Test the night 2 am jumps to 3 am in New York: 2:00 to 2:30 never happens there."""
+        night_owl = zones.local_minutes(parse_datetime('2024-03-10T06:59:00Z'))  # 1:59 am EST
+        self.assertIn("Night Owl", zones.open_restaurant_names(DatabaseEngine(), night_owl))
+        after = zones.local_minutes(parse_datetime('2024-03-10T07:00:00Z'))  # 3:00 am EDT
+        self.assertNotIn("Night Owl", zones.open_restaurant_names(DatabaseEngine(), after))
+        self.assertEnginesMatchReference(self.instants_around('2024-03-10T07:00:00Z'))
+
+    def test_fall_back(self):
+        """Test the night 2 am falls back to 1 am in New York: 1:00 to 2:00 happens twice."""
+        for utc in ('2024-11-03T05:30:00Z', '2024-11-03T06:30:00Z', '2024-11-03T07:30:00Z'):
+            local = zones.local_minutes(parse_datetime(utc))  # 1:30 EDT, 1:30 EST, then 2:30 EST
+            self.assertIn("Night Owl", zones.open_restaurant_names(DatabaseEngine(), local), utc)
+        local = zones.local_minutes(parse_datetime('2024-11-03T07:31:00Z'))
+        self.assertNotIn("Night Owl", zones.open_restaurant_names(DatabaseEngine(), local))
+        self.assertEnginesMatchReference(self.instants_around('2024-11-03T06:00:00Z'))
+
+    def test_zones_are_converted_once_each(self):
+        """Test that the query instant is converted once per distinct zone, not once per restaurant."""
+        instant = parse_datetime('2024-08-28T19:00:00Z')
+        zones.local_minutes(instant)
+        with mock.patch('restaurants.zones.minute_of_week', wraps=hours.minute_of_week) as minute_of_week:
+            local = zones.local_minutes(instant)
+        self.assertEqual(minute_of_week.call_count, 3)
+        self.assertEqual(len(local), 3)
+
+    def test_invalid_zone(self):
+        """Test that unknown zones are rejected on save and on import."""
+        with self.assertRaisesMessage(ValueError, "unknown time zone 'Mars/Olympus_Mons'"):
+            Restaurant.objects.create(name="Nowhere", hours="Mon 9 am - 5 pm", tz="Mars/Olympus_Mons")
+
+        file_path = os.path.join(os.path.dirname(__file__), 'tz_test_restaurants.csv')
+        try:
+            with open(file_path, 'w') as f:
+                f.write('"Restaurant Name","Hours","Time Zone"\n"Nowhere","Mon 9 am - 5 pm","Mars/Olympus_Mons"\n')
+            with self.assertRaisesMessage(CommandError, "Row 2: unknown time zone 'Mars/Olympus_Mons'"):
+                call_command('import_restaurants', file_path, stdout=StringIO())
+        finally:
+            os.remove(file_path)
+
+
+class GeoTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.points = [
+            ("Pier Diner", 40.700, -74.010), ("Midtown Deli", 40.760, -73.980), ("Bronx Grill", 40.850, -73.870),
+            ("Jersey Slice", 40.720, -74.050), ("Date Line East", 0.0, 179.99), ("Date Line West", 0.0, -179.99),
+            ("Polar Station", 89.99, 10.0), ("Polar Annex", 89.99, -170.0), ("Nowhere Inn", None, None),
+        ]
+        self.restaurants = [
+            Restaurant.objects.create(name=name, hours="Mon-Sun 9 am - 5 pm", latitude=lat, longitude=lng)
+            for name, lat, lng in self.points
+        ]
+
+    def brute_force_ids(self, lat, lng, radius_km):
+        return [
+            restaurant.pk for restaurant in self.restaurants
+            if restaurant.latitude is not None
+            and haversine_km(lat, lng, restaurant.latitude, restaurant.longitude) <= radius_km
+        ]
+
+    def test_grid_matches_brute_force(self):
+        """Test that the grid finds exactly the restaurants within the radius, across the antimeridian and poles."""
+        queries = [
+            (40.71, -74.0, 2), (40.71, -74.0, 5), (40.71, -74.0, 20), (40.8, -73.9, 100),
+            (0.0, 180.0, 5), (0.0, -180.0, 1), (0.5, 179.5, 100), (90.0, 0.0, 5), (89.9, 100.0, 30),
+        ]
+        for cell_degrees in (0.05, 1, 7):
+            geo_index = GeoGridIndex(cell_degrees)
+            for query in queries:
+                self.assertEqual(geo_index.restaurant_ids_within(*query), self.brute_force_ids(*query), (cell_degrees, query))
+
+    def test_engines_check_only_the_given_restaurants(self):
+        """Test that each engine's open_restaurant_names_among filters open_restaurant_names to the given ids."""
+        Restaurant.objects.create(name="Night Kitchen", hours="Mon-Sun 10 pm - 4 am", latitude=40.7, longitude=-74.0)
+        restaurants = list(Restaurant.objects.order_by('pk'))
+        among = [restaurant.pk for restaurant in restaurants[::2]]
+        engines = [DatabaseEngine(), SlotIndexEngine()]
+        if np is not None:
+            engines.append(NumpyEngine())
+        for engine in engines:
+            for minute in (0, 600, 1320, 5 * MINUTES_PER_DAY + 180, MINUTES_PER_WEEK - 1):
+                open_names = set(engine.open_restaurant_names(minute))
+                expected = [r.name for r in restaurants[::2] if r.name in open_names]
+                self.assertEqual(engine.open_restaurant_names_among(minute, among), expected, (type(engine).__name__, minute))
+            self.assertEqual(engine.open_restaurant_names_among(600, []), [])
+
+    def test_open_near(self):
+        """Test that /api/open with lat, lng and radius returns the open restaurants within the radius."""
+        Restaurant.objects.create(name="Late Pier Bar", hours="Mon-Sun 6 pm - 2 am", latitude=40.701, longitude=-74.011)
+        params = {'lat': 40.71, 'lng': -74.0, 'radius': 5}
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T12:00:00', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['open_restaurants'], ["Pier Diner", "Jersey Slice"])
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T23:00:00', **params})
+        self.assertEqual(response.json()['open_restaurants'], ["Late Pier Bar"])
+
+    def test_open_near_uses_new_data(self):
+        """Test that the grid is rebuilt when restaurants move."""
+        params = {'datetime': '2024-08-28T12:00:00', 'lat': 40.85, 'lng': -73.87, 'radius': 1}
+        self.assertEqual(self.client.get('/restaurants/api/open', params).json()['open_restaurants'], ["Bronx Grill"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.filter(name="Bronx Grill").update(latitude=10, longitude=10)
+            apps.get_app_config('restaurants').restaurants_changed()
+        self.assertEqual(self.client.get('/restaurants/api/open', params).json()['open_restaurants'], [])
+
+    def test_invalid_location(self):
+        """Test that incomplete or out-of-range location parameters are rejected."""
+        cases = [
+            ({'lat': 40.7, 'lng': -74.0}, "The 'lat', 'lng' and 'radius' query parameters must be given together."),
+            ({'lat': 'north', 'lng': -74.0, 'radius': 1}, "The 'lat' query parameter must be a number."),
+            ({'lat': 91, 'lng': -74.0, 'radius': 1}, "The 'lat' query parameter must be between -90 and 90."),
+            ({'lat': 40.7, 'lng': 181, 'radius': 1}, "The 'lng' query parameter must be between -180 and 180."),
+            ({'lat': 40.7, 'lng': -74.0, 'radius': 0}, "The 'radius' query parameter must be greater than 0."),
+            ({'lat': 40.7, 'lng': -74.0, 'radius': 500}, "The 'radius' query parameter must be between 0 and 100."),
+        ]
+        for params, message in cases:
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T12:00:00', **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.json(), {"error": message})
+
+    def test_import_coordinates(self):
+        """Test that the optional Latitude and Longitude columns are imported and validated."""
+        file_path = os.path.join(os.path.dirname(__file__), 'geo_test_restaurants.csv')
+        header = '"Restaurant Name","Hours","Latitude","Longitude"\n'
+        try:
+            with open(file_path, 'w') as f:
+                f.write(header + '"Pier Diner","Mon-Sun 9 am - 5 pm","40.7","-74.01"\n"Nowhere Inn","Mon 9 am - 5 pm","",""\n')
+            call_command('import_restaurants', file_path, '--diff', stdout=StringIO())
+            self.assertEqual(
+                list(Restaurant.objects.order_by('pk').values_list('name', 'latitude', 'longitude')),
+                [("Pier Diner", 40.7, -74.01), ("Nowhere Inn", None, None)],
+            )
+
+            with open(file_path, 'w') as f:
+                f.write(header + '"Pier Diner","Mon-Sun 9 am - 5 pm","95","-74.01"\n')
+            with self.assertRaisesMessage(CommandError, "Row 2: Latitude '95' is out of range"):
+                call_command('import_restaurants', file_path, stdout=StringIO())
+        finally:
+            os.remove(file_path)
+
+
+class HoursCompilerTest(TestCase):
+
+    def test_matches_regex_parser(self):
+        """Test that the compiler reads every hours string of the sample data like the original parser."""
+        with open(os.path.join(os.path.dirname(__file__), 'restaurants.csv')) as csvfile:
+            for row in csv.DictReader(csvfile):
+                self.assertEqual(schedule_hours(parse_schedule(row['Hours'])), regex_parse_hours(row['Hours']), row['Hours'])
+
+    def test_grammar(self):
+        """Test wrap-around day ranges, several time ranges per group and optional minutes."""
+        spans = parse_schedule("Sat-Mon 9 am - 5:30 pm, 8 pm - 2 am  / Wed, Fri-Thu 12:00 pm - 1 pm")
+        self.assertEqual([span[:3] for span in spans], [
+            ((5, 6, 0), 9 * 60, 17 * 60 + 30),
+            ((5, 6, 0), 20 * 60, 2 * 60),
+            ((2, 4, 5, 6, 0, 1, 2, 3), 12 * 60, 13 * 60),
+        ])
+        restaurant = Restaurant.objects.create(name="Break Time Cafe", hours="Mon-Fri 9 am - 11 am, 1 pm - 5 pm")
+        response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-26T14:00:00'})
+        self.assertIn(restaurant.name, response.json()['open_restaurants'])
+
+    def test_syntax_errors(self):
+        """Test that malformed hours are rejected with the position of the problem instead of skipped."""
+        cases = [
+            ("", "expected a day, found end of hours at position 0"),
+            ("Mon-Fry 9 am - 5 pm", "unknown day 'Fry' at position 4"),
+            ("Mon 13 pm - 5 pm", "invalid time '13 pm' at position 4"),
+            ("Mon 9:5 am - 5 pm", "expected two-digit minutes at position 6"),
+            ("Mon 9 - 5 pm", "expected 'am' or 'pm' at position 6"),
+            ("Mon 9 am -", "expected a closing time, found end of hours at position 10"),
+            ("Mon 9 am - 5 pm Tue 9 am - 5 pm", "expected '/' or the end of the hours, found 'Tue' at position 16"),
+            ("Mon 9 am - 5 pm; Tue", "unexpected ';' at position 15"),
+        ]
+        for hours_str, message in cases:
+            with self.assertRaises(HoursSyntaxError, msg=hours_str) as cm:
+                parse_schedule(hours_str)
+            self.assertEqual(str(cm.exception), message)
+
+    def test_warnings(self):
+        """Test that equal opening and closing times and overlapping hours are flagged as ambiguous."""
+        self.assertEqual(compile_schedule("Mon-Sun 11 am - 10 pm").warnings, ())
+        self.assertEqual(
+            compile_schedule("Fri 12 am - 12 am").warnings,
+            ("'12 am - 12 am' opens and closes at the same time; read as open 24 hours",),
+        )
+        self.assertEqual(compile_schedule("Mon-Fri 9 am - 5 pm / Fri 4 pm - 2 am / Sat 1 am - 3 am").warnings, (
+            "Fri hours overlap", "Sat hours overlap",
+        ))
+
+    def test_import_report(self):
+        """Test that import lists rejected and ambiguous rows in the --report file."""
+        file_path = os.path.join(os.path.dirname(__file__), 'report_test_restaurants.csv')
+        report_path = os.path.join(os.path.dirname(__file__), 'report_test_diagnostics.csv')
+        rows = '"Good","Mon 9 am - 5 pm"\n"Always","Mon-Sun 12 am - 12 am"\n'
+        try:
+            with open(file_path, 'w') as f:
+                f.write('"Restaurant Name","Hours"\n' + rows + '"Bad","Mon 9 am to 5 pm"\n')
+            with self.assertRaises(CommandError):
+                call_command('import_restaurants', file_path, report=report_path, stdout=StringIO(), stderr=StringIO())
+            with open(report_path, newline='') as report_file:
+                self.assertEqual(list(csv.reader(report_file)), [
+                    ['Row', 'Restaurant Name', 'Hours', 'Severity', 'Message'],
+                    ['3', 'Always', 'Mon-Sun 12 am - 12 am', 'warning',
+                     "'12 am - 12 am' opens and closes at the same time; read as open 24 hours"],
+                    ['4', 'Bad', 'Mon 9 am to 5 pm', 'error', "unknown day 'to' at position 9"],
+                ])
+
+            with open(file_path, 'w') as f:
+                f.write('"Restaurant Name","Hours"\n' + rows)
+            out = StringIO()
+            call_command('import_restaurants', file_path, stdout=out)
+            self.assertIn("1 rows have ambiguous hours", out.getvalue())
+            self.assertEqual(Restaurant.objects.count(), 2)
+        finally:
+            os.remove(file_path)
+            if os.path.exists(report_path):
+                os.remove(report_path)
+
+
+class OccupancyTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        Restaurant.objects.create(name="Night Owl", hours="Mon-Sun 1 am - 2:30 am", tz="America/New_York")
+
+    def test_counts_match_open_lookups(self):
+        """Test that every slot's count equals the number of restaurants /api/open finds at the slot's start."""
+        days = self.client.get('/restaurants/api/occupancy').json()['days']
+        counts = [count for day in days.values() for count in day]
+        engine = DatabaseEngine()
+        self.assertEqual(counts, [len(engine.open_restaurant_names(minute)) for minute in range(0, MINUTES_PER_WEEK, 15)])
+
+    def test_group_by_zone(self):
+        """Test that counts split by time zone add up to the totals."""
+        response = self.client.get('/restaurants/api/occupancy', {'slot': 60, 'group_by': 'tz'}).json()
+        self.assertEqual(list(response['zones']), ["America/New_York", "UTC"])
+        self.assertEqual(response['zones']["America/New_York"]["Tuesday"][:4], [0, 1, 1, 0])
+        totals = self.client.get('/restaurants/api/occupancy', {'slot': 60}).json()['days']
+        for day, day_totals in totals.items():
+            self.assertEqual([sum(counts) for counts in zip(*(zone[day] for zone in response['zones'].values()))], day_totals)
+
+    def test_csv(self):
+        """Test that format=csv returns one line per slot."""
+        response = self.client.get('/restaurants/api/occupancy', {'slot': 720, 'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(response.content.decode())))
+        self.assertEqual(rows[0], ['Day', 'Time', 'Open Restaurants'])
+        self.assertEqual(rows[1:3], [['Monday', '00:00', '3'], ['Monday', '12:00', '37']])
+        self.assertEqual(len(rows), 15)
+
+    def test_memoized_per_dataset_version(self):
+        """Test that repeated requests run no queries and that changes to the data are reflected."""
+        self.client.get('/restaurants/api/occupancy', {'slot': 60})
+        with self.assertNumQueries(0):
+            monday = self.client.get('/restaurants/api/occupancy', {'slot': 60}).json()['days']['Monday']
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.create(name="Early Bird", hours="Mon 5 am - 7 am")
+        self.assertEqual(
+            self.client.get('/restaurants/api/occupancy', {'slot': 60}).json()['days']['Monday'][5:8],
+            [monday[5] + 1, monday[6] + 1, monday[7] + 1],
+        )
+
+    def test_invalid_parameters(self):
+        """Test that bad slot lengths, groupings and formats are rejected."""
+        cases = [
+            ({'slot': 7}, "The 'slot' query parameter must be a number of minutes that divides a day evenly."),
+            ({'slot': 'quarter'}, "The 'slot' query parameter must be a number of minutes that divides a day evenly."),
+            ({'group_by': 'name'}, "The 'group_by' query parameter must be 'tz'."),
+            ({'format': 'xml'}, "The 'format' query parameter must be 'json' or 'csv'."),
+        ]
+        for params, message in cases:
+            response = self.client.get('/restaurants/api/occupancy', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.json(), {"error": message})
+
+
+class BenchmarkHarnessTest(TestCase):
+
+    def test_benchmark_calibrates_rounds(self):
+        """Test that fast functions are called several times per round and the result is passed through."""
+        benchmark = Benchmark(rounds=5, min_round_time=0.001)
+        self.assertEqual(benchmark(sum, [1, 2, 3]), 6)
+        self.assertGreater(benchmark.stats['iterations'], 1)
+        self.assertEqual(benchmark.stats['rounds'], 5)
+        self.assertLessEqual(benchmark.stats['min_ms'], benchmark.stats['median_ms'])
+        self.assertLessEqual(benchmark.stats['median_ms'], benchmark.stats['max_ms'])
+
+    def test_compare_results(self):
+        """Test that only metrics that got worse by more than the tolerance are reported."""
+        baseline = [
+            {'scenario': 'open_query', 'size': 1000, 'median_ms': 2.0, 'max_ms': 3.0},
+            {'scenario': 'import', 'size': 1000, 'seconds': 1.0, 'rows_per_second': 1000.0},
+        ]
+        results = [
+            {'scenario': 'open_query', 'size': 1000, 'median_ms': 2.2, 'max_ms': 9.0},
+            {'scenario': 'import', 'size': 1000, 'seconds': 1.5, 'rows_per_second': 700.0},
+            {'scenario': 'import', 'size': 10000, 'seconds': 99.0, 'rows_per_second': 1.0},
+        ]
+        self.assertEqual(compare_results(baseline, results, 0.2), [
+            "import at 1000: seconds went from 1 to 1.5 (+50%)",
+            "import at 1000: rows_per_second went from 1000 to 700 (-30%)",
+        ])
+        self.assertEqual(compare_results(baseline, results, 0.6), [])
+
+    @skipUnless(utils.resource, "resource is not available on this platform")
+    def test_peak_memory_units(self):
+        """Test that the peak resident memory is read as bytes on macOS and as kilobytes elsewhere."""
+        usage = mock.Mock(ru_maxrss=64 * 1024 * 1024)
+        with mock.patch.object(utils.resource, 'getrusage', return_value=usage):
+            with mock.patch.object(utils.sys, 'platform', 'darwin'):
+                self.assertEqual(utils.peak_memory_mb(), 64)
+            with mock.patch.object(utils.sys, 'platform', 'linux'):
+                self.assertEqual(utils.peak_memory_mb(), 64 * 1024)
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        metrics.reset()
+
+    def sample(self, name, **labels):
+        """Return the value of one sample from the metrics endpoint, or None if it is missing."""
+        response = self.client.get('/restaurants/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        prefix = name + (metrics.format_labels(labels) if labels else '') + ' '
+        for line in response.content.decode().splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return None
+
+    def test_open_stages_and_counters(self):
+        """Test that a cache miss times every stage, and that scanned and returned restaurants are counted."""
+        with self.settings(RESTAURANTS_METRICS=True):
+            open_count = len(self.client.get('/restaurants/api/open?datetime=2024-08-28T17:00:00').json()['open_restaurants'])
+            self.client.get('/restaurants/api/open?datetime=2024-08-28T17:00:00')
+            for stage in ('view', 'parse', 'revalidate', 'cache_get'):
+                self.assertEqual(self.sample('restaurants_open_stage_seconds_count', stage=stage), 2, stage)
+            for stage in ('lookup', 'serialize', 'cache_set'):
+                self.assertEqual(self.sample('restaurants_open_stage_seconds_count', stage=stage), 1, stage)
+            self.assertEqual(self.sample('restaurants_open_response_cache_total', result='miss'), 1)
+            self.assertEqual(self.sample('restaurants_open_response_cache_total', result='hit'), 1)
+            self.assertEqual(self.sample('restaurants_open_scanned_total', lookup='all'), Restaurant.objects.count())
+            self.assertEqual(self.sample('restaurants_open_returned_total', lookup='all'), open_count)
+            self.assertIsNotNone(self.sample('restaurants_schedule_cache_size'))
+
+    def test_import_phases(self):
+        """Test that the phase timings stored by the last import are served from the database."""
+        out = StringIO()
+        call_command('import_restaurants', stdout=out)
+        self.assertIn('Phase seconds: ', out.getvalue())
+        report = ImportReport.objects.get()
+        # Served from the stored row, not from anything the import left in this process
+        ImportReport.objects.update(phase_seconds={**report.phase_seconds, 'read': 1.5})
+        with self.settings(RESTAURANTS_METRICS=True):
+            for phase in ('total', 'compile', 'delete', 'insert'):
+                sample = self.sample('restaurants_last_import_phase_seconds', phase=phase)
+                self.assertEqual(sample, report.phase_seconds[phase])
+            self.assertEqual(self.sample('restaurants_last_import_phase_seconds', phase='read'), 1.5)
+            self.assertEqual(self.sample('restaurants_last_import_timestamp_seconds'), report.finished_at.timestamp())
+
+    def test_import_phases_across_processes(self):
+        """Test that phases timed by an import in its own process are served by another process."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        environ = {**os.environ, 'DATABASE_NAME': os.path.join(directory, 'db.sqlite3')}
+
+        def manage(*args):
+            return subprocess.run(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args],
+                env=environ, capture_output=True, text=True, check=True,
+            ).stdout
+
+        manage('migrate', '--verbosity', '0')
+        manage('import_restaurants')
+        scrape = (
+            "from django.test import Client, override_settings\n"
+            "with override_settings(RESTAURANTS_METRICS=True, ALLOWED_HOSTS=['testserver']):\n"
+            "    print(Client().get('/restaurants/metrics').content.decode())"
+        )
+        exposition = manage('shell', '--command', scrape)
+        for phase in ('total', 'read', 'compile', 'delete', 'insert'):
+            self.assertIn(f'restaurants_last_import_phase_seconds{{phase="{phase}"}} ', exposition)
+
+    def test_disabled_by_default(self):
+        """Test that nothing is recorded and the endpoint is hidden unless RESTAURANTS_METRICS is enabled."""
+        self.client.get('/restaurants/api/open?datetime=2024-08-28T17:00:00')
+        self.assertEqual(self.client.get('/restaurants/metrics').status_code, 404)
+        with self.settings(RESTAURANTS_METRICS=True):
+            self.assertIsNone(self.sample('restaurants_open_stage_seconds_count', stage='view'))
+            self.assertIsNone(self.sample('restaurants_open_response_cache_total', result='miss'))
+
+
+@skipUnless(np is not None, "numpy is not installed")
+class SnapshotEngineTest(EngineReferenceMixin, TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        call_command('import_restaurants', stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'restaurants.snapshot')
+        settings_override = self.settings(RESTAURANTS_SNAPSHOT_PATH=self.path, RESTAURANTS_SNAPSHOT_CHECK_SECONDS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.engine = SnapshotEngine()
+
+    def test_matches_check_open_hours_every_minute(self):
+        """Test that the snapshot engine, writing the missing snapshot on first use, agrees with check_open_hours."""
+        self.assertMatchesReferenceEveryMinute(self.engine)
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_zones_and_restaurant_ids_match_numpy_engine(self):
+        """Test that zone groups and id filters give the same answers as the numpy engine it maps."""
+        Restaurant.objects.create(name="Café Zürich", hours="Mon-Sun 6 am - 11 am", tz="America/New_York")
+        numpy_engine = NumpyEngine()
+        among = list(Restaurant.objects.order_by('pk').values_list('pk', flat=True)[::3])
+        for instant in ('2024-08-28T14:00:00Z', '2024-08-31T03:30:00+02:00'):
+            local = zones.local_minutes(parse_datetime(instant))
+            self.assertEqual(self.engine.open_restaurant_names_in_zones(local), numpy_engine.open_restaurant_names_in_zones(local))
+            self.assertEqual(
+                self.engine.open_restaurant_names_among(local, among), numpy_engine.open_restaurant_names_among(local, among)
+            )
+        self.assertIn("Café Zürich", self.engine.open_restaurant_names(600))
+
+    def test_build_snapshot_command(self):
+        """Test that build_snapshot writes every restaurant to the configured path."""
+        out = StringIO()
+        call_command('build_snapshot', stdout=out)
+        self.assertIn(f"Wrote a snapshot of {Restaurant.objects.count()} restaurants", out.getvalue())
+        names = map_snapshot(self.path).index.names
+        self.assertEqual(len(names), Restaurant.objects.count())
+        self.assertEqual(names.at(np.arange(len(names))), list(Restaurant.objects.order_by('pk').values_list('name', flat=True)))
+
+    def test_reloads_snapshots_written_elsewhere(self):
+        """Test that a snapshot replaced by another process is mapped, and that cached responses are dropped."""
+        config = apps.get_app_config('restaurants')
+        with mock.patch.object(config, 'open_hours_engine', self.engine):
+            self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T05:00:00'})
+            version = get_dataset_version()
+            # Saved without running on_commit callbacks, as if by another process that then rebuilt the snapshot
+            Restaurant.objects.create(name="Early Bird", hours="Wed 4 am - 6 am")
+            call_command('build_snapshot', stdout=StringIO())
+            response = self.client.get('/restaurants/api/open', {'datetime': '2024-08-28T05:00:00'})
+            self.assertIn("Early Bird", response.json()['open_restaurants'])
+            self.assertGreater(get_dataset_version(), version)
+
+    def test_data_changes_write_a_new_snapshot(self):
+        """Test that restaurants saved in this process are written to a new snapshot when they are committed."""
+        config = apps.get_app_config('restaurants')
+        with mock.patch.object(config, 'open_hours_engine', self.engine):
+            self.engine.open_restaurant_names(0)
+            stamp = read_stamp(self.path)
+            with self.captureOnCommitCallbacks(execute=True):
+                Restaurant.objects.create(name="Early Bird", hours="Wed 4 am - 6 am")
+            self.assertGreaterEqual(read_stamp(self.path), stamp)
+            self.assertEqual(len(map_snapshot(self.path).index.names), Restaurant.objects.count())
+            self.assertIn("Early Bird", self.engine.open_restaurant_names(2 * MINUTES_PER_DAY + 300))
+
+    def test_one_snapshot_per_transaction(self):
+        """Test that a transaction changing many restaurants writes the snapshot once, when it commits."""
+        config = apps.get_app_config('restaurants')
+        with mock.patch.object(config, 'open_hours_engine', self.engine):
+            self.engine.open_restaurant_names(0)
+            with mock.patch('restaurants.snapshot.write_snapshot', wraps=write_snapshot) as write:
+                with self.captureOnCommitCallbacks(execute=True):
+                    for name in ("Early Bird", "Night Owl", "Lunch Spot"):
+                        Restaurant.objects.create(name=name, hours="Wed 4 am - 6 am")
+                    Restaurant.objects.filter(name="Lunch Spot").delete()
+                    write.assert_not_called()
+            write.assert_called_once()
+            self.assertEqual(len(map_snapshot(self.path).index.names), Restaurant.objects.count())
+
+    def test_rejects_other_files(self):
+        """Test that files that are not complete snapshots are rejected."""
+        call_command('build_snapshot', stdout=StringIO())
+        with open(self.path, 'rb') as snapshot_file:
+            contents = snapshot_file.read()
+        for broken in (b'', b'not a snapshot' * 10, contents[:len(contents) // 2]):
+            with open(self.path, 'wb') as snapshot_file:
+                snapshot_file.write(broken)
+            with self.assertRaises(SnapshotError):
+                map_snapshot(self.path)
+
+
+class RestaurantStoreTest(TestCase):
+
+    def setUp(self):
+        call_command('import_restaurants', stdout=StringIO())
+
+    def test_matches_database(self):
+        """Test that every record has the id, name, zone and intervals stored in the database."""
+        Restaurant.objects.create(name="Café Zürich", hours="Mon-Sun 6 am - 11 am", tz="America/New_York")
+        closed = Restaurant.objects.create(name="Closed For Now", hours="Mon 9 am - 5 pm")
+        closed.opening_intervals.all().delete()
+        store = RestaurantStore.from_database()
+        restaurants = list(Restaurant.objects.order_by('pk'))
+        self.assertEqual(len(store), len(restaurants))
+        for record, restaurant in zip(store, restaurants):
+            self.assertEqual((record.pk, record.name, record.tz), (restaurant.pk, restaurant.name, restaurant.tz))
+            self.assertEqual(
+                record.intervals, list(restaurant.opening_intervals.order_by('start').values_list('start', 'end'))
+            )
+        self.assertEqual(store.get(closed.pk).intervals, [])
+        with self.assertRaises(KeyError):
+            store.get(closed.pk + 1)
+
+    def test_from_intervals_reads_restaurants_with_hours_in_one_query(self):
+        """Test that reading through the intervals runs one query and leaves out restaurants without hours."""
+        closed = Restaurant.objects.create(name="Closed For Now", hours="Mon 9 am - 5 pm")
+        closed.opening_intervals.all().delete()
+        with self.assertNumQueries(1):
+            store = RestaurantStore.from_intervals()
+        full = RestaurantStore.from_database()
+        self.assertEqual(
+            [(record.pk, record.name, record.tz, record.intervals) for record in store],
+            [(record.pk, record.name, record.tz, record.intervals) for record in full if record.intervals],
+        )
+        with self.assertRaises(KeyError):
+            store.get(closed.pk)
+
+    def test_bytes_per_restaurant(self):
+        """Test with tracemalloc that the store holds under 100 bytes per generated restaurant."""
+        populate(2000)
+        store, held = retained_bytes(RestaurantStore.from_database)
+        self.assertEqual(len(store), 2000)
+        self.assertLess(held / len(store), 100)
+        self.assertLessEqual(store.nbytes(), held)
+
+
+class ReadOnlyRouterTest(TestCase):
+
+    def test_reads_outside_transactions_use_readonly(self):
+        """Test that restaurant reads go to the read-only alias unless 'default' is inside a transaction."""
+        router = ReadOnlyRouter()
+        # Every TestCase runs inside a transaction
+        self.assertEqual(router.db_for_read(Restaurant), 'default')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Restaurant), 'readonly')
+            self.assertEqual(router.db_for_read(OpeningInterval), 'readonly')
+            self.assertIsNone(router.db_for_read(apps.get_model('auth', 'User')))
+
+    def test_writes_use_default(self):
+        """Test that restaurants read through the read-only alias are saved to, and related on, 'default'."""
+        router = ReadOnlyRouter()
+        restaurant = Restaurant.objects.create(name="Routed", hours="Mon 9 am - 5 pm")
+        restaurant._state.db = 'readonly'
+        self.assertEqual(router.db_for_write(Restaurant, instance=restaurant), 'default')
+        self.assertIsNone(router.db_for_write(apps.get_model('auth', 'User')))
+        self.assertIs(router.allow_relation(restaurant, restaurant.opening_intervals.get()), True)
+
+    def test_readonly_is_never_migrated(self):
+        router = ReadOnlyRouter()
+        self.assertIs(router.allow_migrate('readonly', 'restaurants'), False)
+        self.assertIsNone(router.allow_migrate('default', 'restaurants'))
+
+    def test_insert_rows_writes_to_default(self):
+        """Test that bulk interval inserts are routed as writes even when reads would go to the read-only alias."""
+        restaurant = Restaurant.objects.create(name="Routed", hours="Mon 9 am - 5 pm")
+        with mock.patch.object(ReadOnlyRouter, 'db_for_read', return_value='readonly'):
+            OpeningInterval.objects.insert_rows([(restaurant.pk, 1, 2000, 2100)])
+        self.assertEqual(restaurant.opening_intervals.count(), 2)
+
+
+class LegacyHoursTest(TestCase):
+
+    def setUp(self):
+        # Stored hours the strict compiler rejects, written past Restaurant.save() as older versions allowed
+        self.closed_saturday = Restaurant.objects.create(name="Closed Saturday", hours="Mon-Fri 9 am - 5 pm")
+        self.unreadable = Restaurant.objects.create(name="Unreadable", hours="Mon 9 am - 5 pm")
+        legacy_hours = [(self.closed_saturday, "Mon-Fri 9 am - 5 pm / Sat Closed."), (self.unreadable, "Tue 9 am - 5 pm")]
+        for restaurant, hours in legacy_hours:
+            Restaurant.objects.filter(pk=restaurant.pk).update(hours=hours, hours_hash=hours_digest(hours))
+
+    def test_rebuild_migration_reads_hours_leniently(self):
+        """Test that rebuilding intervals in a migration skips what the old parser skipped instead of failing."""
+        migration = importlib.import_module('restaurants.migrations.0004_rebuild_opening_intervals')
+        output = StringIO()
+        with redirect_stdout(output):
+            migration.rebuild_opening_intervals(apps, None)
+        self.assertEqual(self.closed_saturday.opening_intervals.count(), 5)
+        self.assertFalse(self.unreadable.opening_intervals.exists())
+        self.assertIn("Left 1 restaurants closed, as their hours can't be parsed: Unreadable", output.getvalue())
+
+    def test_save_keeps_unchanged_hours(self):
+        """Test that a stored restaurant with rejected hours can be saved as long as its hours are left alone."""
+        restaurant = Restaurant.objects.get(pk=self.closed_saturday.pk)
+        restaurant.name = "Renamed"
+        restaurant.save()
+        self.assertEqual(restaurant.opening_intervals.count(), 5)
+
+        restaurant.hours = "Mon-Fri 9 am - 5 pm / Sun Closed"
+        with self.assertRaises(HoursSyntaxError):
+            restaurant.save()
+        restaurant.hours = "Mon-Sun 9 am - 5 pm"
+        restaurant.save()
+        self.assertEqual(restaurant.opening_intervals.count(), 7)
@@ -1,6 +1,20 @@
 from django.urls import path
-from .views import RestaurantListAPIView
+from .views import (
+    MetricsView,
+    RestaurantBatchAPIView,
+    RestaurantListAPIView,
+    RestaurantListAsyncView,
+    RestaurantNextChangeAPIView,
+    RestaurantOccupancyView,
+    RestaurantWindowAPIView,
+)
 
 urlpatterns = [
     path('api/open', RestaurantListAPIView.as_view(), name='restaurant-list'),
+    path('api/open/async', RestaurantListAsyncView.as_view(), name='restaurant-list-async'),
+    path('api/open/batch', RestaurantBatchAPIView.as_view(), name='restaurant-batch'),
+    path('api/open/window', RestaurantWindowAPIView.as_view(), name='restaurant-window'),
+    path('api/next', RestaurantNextChangeAPIView.as_view(), name='restaurant-next-change'),
+    path('api/occupancy', RestaurantOccupancyView.as_view(), name='restaurant-occupancy'),
+    path('metrics', MetricsView.as_view(), name='restaurant-metrics'),
 ]
@@ -0,0 +1,15 @@
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_memory_mb():
+    """Return this process's peak resident memory in megabytes, or None where it can't be measured."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
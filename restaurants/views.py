@@ -1,14 +1,64 @@
-import re
-from datetime import datetime, time, timedelta
+import itertools
+import json
+from datetime import timedelta
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.apps import apps
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
-from .models import Restaurant
-from .serializers import RestaurantSerializer
+from django.views import View
+from . import cache, hours, metrics, zones
+from .conditional import is_not_modified, max_age, validator_headers
+from .models import ImportReport, OpeningInterval
+from .occupancy import GROUPINGS, occupancy_csv, occupancy_table
+from .serializers import OpenBatchSerializer, RestaurantSerializer
 
 
-class RestaurantListAPIView(generics.ListAPIView):
+class DatetimeParamMixin:
+    """Validation and parsing shared by the views that take datetimes."""
+
+    def validate_datetime_str(self, datetime_str, param='datetime'):
+        """Validate the datetime string and ensure it includes time information."""
+        if not datetime_str:
+            return f"A '{param}' query parameter is required."
+
+        if 'T' not in datetime_str or len(datetime_str.split('T')[1]) == 0:
+            return "The provided datetime is missing time information. Please include both date and time."
+
+        return None
+
+    def parse_datetime_str(self, datetime_str, param='datetime'):
+        """Validate and parse a datetime string, raising ValueError with a user-facing message."""
+        validation_error = self.validate_datetime_str(datetime_str, param)
+        if validation_error:
+            raise ValueError(validation_error)
+
+        datetime_obj = parse_datetime(datetime_str)
+        if datetime_obj is None:
+            raise ValueError("Invalid datetime format. Please use value that specifies a date and a time.")
+        return datetime_obj
+
+    def local_minutes(self, datetime_obj, version=None):
+        """Return `zones.local_minutes()` of a parsed datetime, raising ValueError with a user-facing message."""
+        try:
+            return zones.local_minutes(datetime_obj, version)
+        except OverflowError as e:
+            # Instants at the ends of the calendar can't be converted to every zone
+            raise ValueError(str(e))
+
+
+class RestaurantListAPIView(DatetimeParamMixin, generics.ListAPIView):
     serializer_class = RestaurantSerializer
+    stream_chunk_size = 2000
+    geo_params = ('lat', 'lng', 'radius')
+
+    def dispatch(self, request, *args, **kwargs):
+        """Time the whole request, including DRF's own processing, as the 'view' stage."""
+        with metrics.OPEN_STAGE_SECONDS.time('view'):
+            return super().dispatch(request, *args, **kwargs)
 
     def get(self, request, *args, **kwargs):
         """
@@ -17,8 +67,24 @@ class RestaurantListAPIView(generics.ListAPIView):
         The view filters restaurants based on a `datetime` query parameter provided in the URL.
         The `datetime` parameter must include both date and time in ISO 8601 format (e.g., '2024-08-25T17:00:00').
         If the `datetime` parameter is missing, or if it lacks time information, an error response is returned.
+        Restaurants are matched against their precomputed opening intervals by the configured open-hours engine.
+        Hours are wall-clock times in each restaurant's `tz`: datetimes with an offset are converted once per zone,
+        and naive ones are read as local time everywhere.
+        The answer only depends on the local minute of the week, so the rendered JSON is cached per minute and dataset
+        version.
+        The ETag combines the two, so clients revalidating an unchanged answer get a 304 without a lookup, and
+        Cache-Control lets them keep it until the next time a restaurant opens or closes.
+
+        With `lat`, `lng` and `radius` (in km), only restaurants within the radius are returned: a grid index finds
+        the nearby ones and the engine checks just those, so open restaurants elsewhere are never loaded.
+
+        For large result sets, `limit` (with the `next_cursor` of the previous page as `cursor`) pages through the
+        open restaurants in id order, and `stream=true` writes the full list incrementally instead of building it
+        in memory. Both query the opening intervals directly and bypass the response cache.
+
+        With RESTAURANTS_METRICS enabled, each stage is timed and /restaurants/metrics exposes the results.
         """
-        queryset = Restaurant.objects.all()
+        watch = metrics.OPEN_STAGE_SECONDS.stopwatch()
         datetime_str = self.request.query_params.get('datetime', None)
 
         validation_error = self.validate_datetime_str(datetime_str)
@@ -30,23 +96,112 @@ class RestaurantListAPIView(generics.ListAPIView):
             if datetime_obj is None:
                 raise ValueError("Invalid datetime format. Please use value that specifies a date and a time.")
 
-            open_restaurant_names = [
-                restaurant.name for restaurant in queryset
-                if self.is_open(restaurant, datetime_obj)
-            ]
-            return Response({"open_restaurants": open_restaurant_names}, status=status.HTTP_200_OK)
+            local = self.local_minutes(datetime_obj)
+            watch.lap('parse')
+            if any(param in self.request.query_params for param in self.geo_params):
+                return self.open_restaurants_near(local)
+            if 'limit' in self.request.query_params or 'cursor' in self.request.query_params:
+                return self.open_restaurants_page(local)
+            if self.request.query_params.get('stream') == 'true':
+                return self.stream_open_restaurants(local)
+
+            version = cache.get_dataset_version()
+            headers = validator_headers(version, local, datetime_obj.second)
+            not_modified = is_not_modified(
+                version, local, request.META.get('HTTP_IF_NONE_MATCH'), request.META.get('HTTP_IF_MODIFIED_SINCE')
+            )
+            watch.lap('revalidate')
+            if not_modified:
+                return HttpResponseNotModified(headers=headers)
+
+            body = cache.get_open_response(version, zones.lookup_key(local))
+            watch.lap('cache_get')
+            metrics.OPEN_RESPONSE_CACHE.inc('miss' if body is None else 'hit')
+            if body is None:
+                engine = apps.get_app_config('restaurants').open_hours_engine
+                open_restaurant_names = zones.open_restaurant_names(engine, local)
+                watch.lap('lookup')
+                body = JSONRenderer().render({"open_restaurants": open_restaurant_names})
+                watch.lap('serialize')
+                cache.set_open_response(version, zones.lookup_key(local), body)
+                watch.lap('cache_set')
+                if metrics.is_enabled():
+                    metrics.record_lookup('all', cache.get_restaurant_count(version), len(open_restaurant_names))
+            return HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK, headers=headers)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    def validate_datetime_str(self, datetime_str):
-        """Validate the datetime string and ensure it includes time information."""
-        if not datetime_str:
-            return "A 'datetime' query parameter is required."
+    def open_restaurants_near(self, local):
+        """Return the open restaurants within `radius` km of (`lat`, `lng`), in id order."""
+        max_radius = getattr(settings, 'RESTAURANTS_GEO_MAX_RADIUS_KM', 100)
+        lat = self.float_param('lat', -90, 90)
+        lng = self.float_param('lng', -180, 180)
+        radius = self.float_param('radius', 0, max_radius)
+        if radius == 0:
+            raise ValueError("The 'radius' query parameter must be greater than 0.")
 
-        if 'T' not in datetime_str or len(datetime_str.split('T')[1]) == 0:
-            return "The provided datetime is missing time information. Please include both date and time."
+        config = apps.get_app_config('restaurants')
+        nearby_ids = config.geo_index.restaurant_ids_within(lat, lng, radius)
+        open_restaurant_names = config.open_hours_engine.open_restaurant_names_among(local, nearby_ids)
+        metrics.record_lookup('near', len(nearby_ids), len(open_restaurant_names))
+        return Response({"open_restaurants": open_restaurant_names}, status=status.HTTP_200_OK)
 
-        return None
+    def float_param(self, param, minimum, maximum):
+        """Read a required number query parameter, raising ValueError with a user-facing message when out of range."""
+        value = self.request.query_params.get(param)
+        if value is None:
+            raise ValueError("The 'lat', 'lng' and 'radius' query parameters must be given together.")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"The '{param}' query parameter must be a number.")
+        if not minimum <= value <= maximum:
+            raise ValueError(f"The '{param}' query parameter must be between {minimum} and {maximum}.")
+        return value
+
+    def open_restaurants_page(self, local):
+        """Return one page of open restaurants after the `cursor` restaurant id, with the cursor of the next page."""
+        max_limit = getattr(settings, 'RESTAURANTS_PAGE_MAX_LIMIT', 1000)
+        limit = self.int_param('limit', max_limit, 1, max_limit)
+        cursor = self.int_param('cursor', 0, 0)
+
+        # Keyset pagination: the interval index serves the minute, and ids past the cursor are read in order
+        queryset = OpeningInterval.objects.open_at_local(local).filter(restaurant_id__gt=cursor).order_by('restaurant_id')
+        rows = list(queryset.values_list('restaurant_id', 'restaurant__name')[:limit + 1])
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return Response(
+            {"open_restaurants": [name for _, name in rows[:limit]], "next_cursor": next_cursor},
+            status=status.HTTP_200_OK,
+        )
+
+    def stream_open_restaurants(self, local):
+        """Stream the open restaurants as the same JSON document, holding one chunk of names in memory at a time."""
+        queryset = OpeningInterval.objects.open_at_local(local).order_by('restaurant_id')
+        names = queryset.values_list('restaurant__name', flat=True).iterator(chunk_size=self.stream_chunk_size)
+
+        def chunks():
+            yield '{"open_restaurants":['
+            separator = ''
+            while chunk := list(itertools.islice(names, self.stream_chunk_size)):
+                yield separator + ','.join(json.dumps(name, ensure_ascii=False) for name in chunk)
+                separator = ','
+            yield ']}'
+
+        return StreamingHttpResponse(chunks(), content_type='application/json', status=status.HTTP_200_OK)
+
+    def int_param(self, param, default, minimum, maximum=None):
+        """Read an integer query parameter, raising ValueError with a user-facing message when out of range."""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"The '{param}' query parameter must be an integer.")
+        if value < minimum or (maximum is not None and value > maximum):
+            bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+            raise ValueError(f"The '{param}' query parameter must be {bounds}.")
+        return value
 
     def is_open(self, restaurant, datetime_obj):
         """Determine if the restaurant is open at the given datetime."""
@@ -55,81 +210,271 @@ class RestaurantListAPIView(generics.ListAPIView):
 
     def parse_time(self, time_str):
         """Convert time string like '11:00 am' or '12:30 pm' or '10 pm' into a datetime.time object."""
-        try:
-            return datetime.strptime(time_str.strip(), '%I:%M %p').time()
-        except ValueError:
-            return datetime.strptime(time_str.strip(), '%I %p').time()
+        return hours.parse_time(time_str)
 
     def parse_hours(self, hours_str):
         """Parse the hours string into a structured format."""
-        day_map = {
-            'Mon': 'Monday', 'Tues': 'Tuesday', 'Wed': 'Wednesday', 'Thu': 'Thursday',
-            'Fri': 'Friday', 'Sat': 'Saturday', 'Sun': 'Sunday'
-        }
-        hours_dict = {day: [] for day in day_map.values()}
-
-        # Regex to find day ranges and times
-        # 1. ([A-Za-z,\s-]+): Captures the days of the week or ranges (e.g., "Mon-Fri")
-        # 2. \s+: Matches the space between the days and times
-        # 3. ([\d:\sampm-]+): Captures the time range (e.g., "11:00 am - 10:00 pm")
-        day_time_pattern = re.compile(r'([A-Za-z,\s-]+)\s+([\d:\sampm-]+)')
-
-        for part in hours_str.split('/'):
-            match = day_time_pattern.search(part.strip())
-            if match:
-                days_str, times_str = match.groups()
-                open_time, close_time = map(self.parse_time, times_str.split('-'))
-
-                day_range = self.expand_day_range(days_str, day_map)
-                for full_day in day_range:
-                    hours_dict[full_day].append((open_time, close_time))
-
-                    # Handle closing time that extends past midnight
-                    if close_time <= open_time:
-                        next_day = self.get_next_day(full_day)
-                        hours_dict[next_day].append((time(0, 0), close_time))
-
-        return hours_dict
+        return hours.parse_hours(hours_str)
 
     def get_next_day(self, current_day):
         """Get the next day of the week given the current day."""
-        current_date = datetime.strptime(current_day, '%A')
-        next_date = current_date + timedelta(days=1)
-        return next_date.strftime('%A')
+        return hours.get_next_day(current_day)
 
     def expand_day_range(self, days_str, day_map):
         """Expand a day range like 'Mon-Fri' into a list of full day names."""
-        days = days_str.split(', ')
-        expanded_days = []
-        for day in days:
-            if '-' in day:
-                start_day, end_day = day.split('-')
-                day_keys = list(day_map.keys())
-                start = day_keys.index(start_day)
-                end = day_keys.index(end_day) + 1
-                expanded_days.extend(list(day_map.values())[start:end])
-            else:
-                expanded_days.append(day_map[day.strip()])
-        return expanded_days
+        return hours.expand_day_range(days_str, day_map)
 
     def check_open_hours(self, parsed_hours, datetime_obj):
         """Check if a restaurant is open on the given datetime."""
-        day_of_week = datetime_obj.strftime('%A')
-        time_of_day = datetime_obj.time()
-
-        if self.is_within_open_hours(parsed_hours.get(day_of_week, []), time_of_day):
-            return True
-
-        return False
+        return hours.check_open_hours(parsed_hours, datetime_obj)
 
     def is_within_open_hours(self, hours_list, time_of_day):
         """Check if the given time is within any open hours for a specific day."""
-        for open_time, close_time in hours_list:
-            if close_time <= open_time:
-                # Handle hours that extend past midnight
-                if open_time <= time_of_day or time_of_day < close_time:
-                    return True
-            elif open_time <= time_of_day <= close_time:
-                return True
-        return False
+        return hours.is_within_open_hours(hours_list, time_of_day)
+
+
+class RestaurantListAsyncView(DatetimeParamMixin, View):
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Async version of `RestaurantListAPIView` for ASGI deployments, returning the same responses.
+
+        The response cache is read and written with the async cache API, and the open-hours engine answers
+        through the async ORM or its in-memory index, so waiting on either never blocks the event loop.
+        """
+        watch = metrics.OPEN_STAGE_SECONDS.stopwatch()
+        try:
+            datetime_obj = self.parse_datetime_str(request.GET.get('datetime'))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the dataset version once and hand it to every index, so none reads it on the event loop
+        version = await cache.aget_dataset_version()
+        config = apps.get_app_config('restaurants')
+        if datetime_obj.tzinfo is not None:
+            await config.zone_index.aready(version)
+        try:
+            local = self.local_minutes(datetime_obj, version)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        watch.lap('parse')
+        await config.boundary_index.aready(version)
+        headers = validator_headers(version, local, datetime_obj.second)
+        not_modified = is_not_modified(
+            version, local, request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')
+        )
+        watch.lap('revalidate')
+        if not_modified:
+            return HttpResponseNotModified(headers=headers)
+
+        body = await cache.aget_open_response(version, zones.lookup_key(local))
+        watch.lap('cache_get')
+        metrics.OPEN_RESPONSE_CACHE.inc('miss' if body is None else 'hit')
+        if body is None:
+            if isinstance(local, int):
+                names = await config.open_hours_engine.aopen_restaurant_names(local, version)
+            else:
+                names = await sync_to_async(config.open_hours_engine.open_restaurant_names_in_zones)(local)
+            watch.lap('lookup')
+            body = JSONRenderer().render({"open_restaurants": names})
+            watch.lap('serialize')
+            await cache.aset_open_response(version, zones.lookup_key(local), body)
+            watch.lap('cache_set')
+            if metrics.is_enabled():
+                metrics.record_lookup('all', await sync_to_async(cache.get_restaurant_count)(version), len(names))
+        return HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK, headers=headers)
 
+
+class RestaurantBatchAPIView(DatetimeParamMixin, generics.GenericAPIView):
+    serializer_class = OpenBatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        """
+        Returns the restaurants open at each datetime in a list.
+
+        The request body is `{"datetimes": [...]}`, each in the same format as the `datetime` parameter of
+        `RestaurantListAPIView`. Results come back in request order. Schedules are loaded once for the whole
+        batch and every distinct minute of the week is answered in a single pass.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        datetime_strs = serializer.validated_data['datetimes']
+        lookups = []
+        for index, datetime_str in enumerate(datetime_strs):
+            try:
+                lookups.append(self.local_minutes(self.parse_datetime_str(datetime_str)))
+            except ValueError as e:
+                return Response({"error": f"datetimes[{index}]: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Times that are the same local minute in every zone are answered together; the rest one by one
+        engine = apps.get_app_config('restaurants').open_hours_engine
+        open_by_lookup = engine.open_restaurant_names_many([lookup for lookup in lookups if isinstance(lookup, int)])
+        for lookup in set(lookups) - open_by_lookup.keys():
+            open_by_lookup[lookup] = engine.open_restaurant_names_in_zones(lookup)
+        results = [
+            {"datetime": datetime_str, "open_restaurants": open_by_lookup[lookup]}
+            for datetime_str, lookup in zip(datetime_strs, lookups)
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class RestaurantWindowAPIView(DatetimeParamMixin, generics.GenericAPIView):
+    serializer_class = RestaurantSerializer
+    modes = ('all', 'any')
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the names of the restaurants open during a window of time.
+
+        The window runs from the `start` datetime up to (but not including) the `end` datetime, both in the
+        same format as `RestaurantListAPIView`. With `mode=all` (the default) restaurants must be open for the
+        whole window; with `mode=any` being open at some point in it is enough. Windows may wrap past midnight
+        or the end of the week, and windows of a week or more cover the whole week.
+        """
+        mode = self.request.query_params.get('mode', 'all')
+        if mode not in self.modes:
+            return Response({"error": "The 'mode' query parameter must be 'all' or 'any'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start = self.parse_datetime_str(self.request.query_params.get('start'), 'start')
+            end = self.parse_datetime_str(self.request.query_params.get('end'), 'end')
+            if (start.tzinfo is None) != (end.tzinfo is None):
+                raise ValueError("The 'start' and 'end' datetimes must both have a UTC offset or both leave it out.")
+            # Both ends are truncated to the minute, like the point lookups
+            start_minute = start.replace(second=0, microsecond=0)
+            length = (end.replace(second=0, microsecond=0) - start_minute) // timedelta(minutes=1)
+            if length < 1:
+                raise ValueError("The 'end' datetime must be at least a minute after 'start'.")
+
+            window_index = apps.get_app_config('restaurants').window_index
+            if mode == 'all':
+                open_restaurant_names = window_index.open_for_window(hours.minute_of_week(start), length)
+            else:
+                open_restaurant_names = window_index.open_during_window(hours.minute_of_week(start), length)
+            return Response({"open_restaurants": open_restaurant_names}, status=status.HTTP_200_OK)
+        except (ValueError, OverflowError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RestaurantNextChangeAPIView(DatetimeParamMixin, generics.GenericAPIView):
+    serializer_class = RestaurantSerializer
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns, for every restaurant, whether it is open at a datetime and when that next changes.
+
+        Takes the same `datetime` parameter as `RestaurantListAPIView`. Open restaurants get a `next_close`,
+        the first minute at which they are closed again (hours include their closing minute), and closed
+        restaurants a `next_open`; restaurants that never close get a `next_close` of null. Answers come from
+        each restaurant's sorted opening spans, and Cache-Control runs until the earliest of those changes.
+        """
+        try:
+            datetime_obj = self.parse_datetime_str(self.request.query_params.get('datetime'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        minute = hours.minute_of_week(datetime_obj)
+        start_of_minute = datetime_obj.replace(second=0, microsecond=0)
+        boundary_index = apps.get_app_config('restaurants').boundary_index
+        restaurants = []
+        try:
+            for name, is_open, change in boundary_index.next_changes(minute):
+                changes_at = None if change is None else start_of_minute + timedelta(minutes=change - minute)
+                restaurants.append({
+                    "name": name,
+                    "open": is_open,
+                    "next_close" if is_open else "next_open": changes_at and changes_at.isoformat(),
+                })
+        except OverflowError as e:
+            # Changes past the end of the calendar can't be given as datetimes
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = Response({"restaurants": restaurants}, status=status.HTTP_200_OK)
+        response['Cache-Control'] = f'public, max-age={max_age(minute, datetime_obj.second)}'
+        return response
+
+
+class RestaurantOccupancyView(View):
+    output_formats = {'json': 'application/json', 'csv': 'text/csv; charset=utf-8'}
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the number of restaurants open at the start of every slot of the week.
+
+        `slot` sets the slot length in minutes (15 by default) and must divide a day evenly. `group_by=tz` splits
+        the counts by time zone, and `format=csv` returns one CSV line per slot instead of JSON rows of counts per
+        day. Times are wall-clock times in each restaurant's zone. The counts come from one sweep over the opening
+        intervals per dataset version, and rendered responses are cached under the version too.
+        """
+        params = request.GET
+        try:
+            slot_minutes = int(params.get('slot', 15))
+        except ValueError:
+            slot_minutes = 0
+        if not 1 <= slot_minutes <= hours.MINUTES_PER_DAY or hours.MINUTES_PER_DAY % slot_minutes:
+            return JsonResponse(
+                {"error": "The 'slot' query parameter must be a number of minutes that divides a day evenly."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        group_by = params.get('group_by') or None
+        if group_by is not None and group_by not in GROUPINGS:
+            return JsonResponse(
+                {"error": "The 'group_by' query parameter must be 'tz'."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        output_format = params.get('format', 'json')
+        if output_format not in self.output_formats:
+            return JsonResponse(
+                {"error": "The 'format' query parameter must be 'json' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        version = cache.get_dataset_version()
+        body = cache.get_occupancy_response(version, slot_minutes, group_by, output_format)
+        if body is None:
+            occupancy_index = apps.get_app_config('restaurants').occupancy_index
+            if output_format == 'csv':
+                body = occupancy_csv(occupancy_index, slot_minutes, group_by).encode()
+            else:
+                body = JSONRenderer().render(occupancy_table(occupancy_index, slot_minutes, group_by))
+            cache.set_occupancy_response(version, slot_minutes, group_by, output_format, body)
+        return HttpResponse(body, content_type=self.output_formats[output_format])
+
+
+class MetricsView(View):
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns this process's metrics in the Prometheus text format, or 404 unless RESTAURANTS_METRICS is enabled.
+
+        Along with the stage timings and counters recorded by the open views, the hit and miss counts and size of
+        the compiled schedule cache and the phase timings that the last import_restaurants run stored are read at
+        scrape time.
+        """
+        if not metrics.is_enabled():
+            raise Http404("Metrics are disabled.")
+        stats = hours.schedule_cache.stats()
+        extra_samples = [
+            (
+                'restaurants_schedule_cache_total', 'counter', 'Compiled schedule cache lookups, by result.',
+                [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])],
+            ),
+            ('restaurants_schedule_cache_size', 'gauge', 'Compiled schedules currently cached.', [({}, stats['size'])]),
+        ]
+        report = ImportReport.objects.filter(pk=ImportReport.ROW_ID).first()
+        if report is not None:
+            extra_samples += [
+                (
+                    'restaurants_last_import_phase_seconds', 'gauge',
+                    'Seconds spent in each phase of the last import_restaurants run.',
+                    [({'phase': phase}, seconds) for phase, seconds in report.phase_seconds.items()],
+                ),
+                (
+                    'restaurants_last_import_timestamp_seconds', 'gauge',
+                    'When the last import_restaurants run finished, in seconds since the epoch.',
+                    [({}, report.finished_at.timestamp())],
+                ),
+            ]
+        return HttpResponse(metrics.exposition(extra_samples), content_type=self.content_type)
@@ -0,0 +1,131 @@
+import bisect
+import itertools
+from .engines import CachedIndex
+from .hours import MINUTES_PER_WEEK
+from .models import OpeningInterval, Restaurant
+
+
+class IntervalTree:
+    """
+    A static centered interval tree over half-open (start, end, value) intervals.
+
+    Each node keeps the intervals containing its center sorted both by start and by end, so a
+    stabbing query costs O(log n + k) for k matches.
+    """
+
+    def __init__(self, intervals):
+        self.root = self._build(sorted(intervals))
+
+    def stab(self, point):
+        """Yield the intervals containing `point`."""
+        node = self.root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                for interval in by_start:
+                    if interval[0] > point:
+                        break
+                    yield interval
+                node = left
+            else:
+                for interval in by_end:
+                    if interval[1] <= point:
+                        break
+                    yield interval
+                node = right
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # The median start lies inside its own interval, so every node keeps at least one interval
+        center = intervals[len(intervals) // 2][0]
+        left = [interval for interval in intervals if interval[1] <= center]
+        right = [interval for interval in intervals if interval[0] > center]
+        overlapping = [interval for interval in intervals if interval[0] <= center < interval[1]]
+        return (
+            center,
+            overlapping,
+            sorted(overlapping, key=lambda interval: interval[1], reverse=True),
+            self._build(left),
+            self._build(right),
+        )
+
+
+def week_spans(intervals):
+    """
+    Merge one restaurant's sorted (start, end) intervals into continuous spans of opening.
+
+    Intervals are split at midnight when stored, so touching ones are joined back together,
+    including a span that runs from Sunday night into Monday morning. The week is unrolled so
+    spans are repeated one week earlier and later, which lets windows that wrap past the end
+    of the week be checked without special cases. A restaurant that never closes gets one
+    span covering every copy of the week.
+    """
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    if not merged:
+        return []
+    if merged[0] == [0, MINUTES_PER_WEEK]:
+        return [(-MINUTES_PER_WEEK, 2 * MINUTES_PER_WEEK)]
+    if len(merged) > 1 and merged[0][0] == 0 and merged[-1][1] == MINUTES_PER_WEEK:
+        # Join Sunday night to Monday morning
+        first = merged.pop(0)
+        merged[-1][1] = MINUTES_PER_WEEK + first[1]
+    return [
+        (start + offset, end + offset)
+        for start, end in merged
+        for offset in (-MINUTES_PER_WEEK, 0, MINUTES_PER_WEEK)
+    ]
+
+
+class WindowIndex(CachedIndex):
+    """
+    Answers which restaurants are open during a window of the week, built over merged spans.
+
+    A window is a start minute of the week and a length in minutes; it may wrap past midnight
+    or the end of the week. Restaurants open for the whole window are found by stabbing the
+    interval tree at the window start and keeping spans that reach its end. Restaurants open
+    at any point are those stabbed at the start plus those with a span starting inside the
+    window, found by binary search over the sorted span starts.
+    """
+
+    def open_for_window(self, start, length):
+        """Return the names of the restaurants open at every minute of the window, in id order."""
+        names, tree, _, _ = self._get_index()
+        length = min(length, MINUTES_PER_WEEK)
+        end = start + length
+        ids = {restaurant_id for _, span_end, restaurant_id in tree.stab(start) if span_end >= end}
+        return [names[restaurant_id] for restaurant_id in sorted(ids)]
+
+    def open_during_window(self, start, length):
+        """Return the names of the restaurants open at some minute of the window, in id order."""
+        names, tree, span_starts, span_ids = self._get_index()
+        length = min(length, MINUTES_PER_WEEK)
+        ids = {restaurant_id for _, _, restaurant_id in tree.stab(start)}
+        low = bisect.bisect_right(span_starts, start)
+        high = bisect.bisect_left(span_starts, start + length)
+        ids.update(span_ids[low:high])
+        return [names[restaurant_id] for restaurant_id in sorted(ids)]
+
+    def open_restaurant_names(self, minute):
+        """Return the names of the restaurants open at the given minute of the week, in id order."""
+        return self.open_for_window(minute, 1)
+
+    def build(self):
+        """Read the opening intervals and build the (names, tree, sorted span starts, span owners) index."""
+        # Intervals are read first so that every restaurant they belong to is either read too or was deleted
+        intervals = OpeningInterval.objects.order_by('restaurant_id', 'start')
+        rows = intervals.values_list('restaurant_id', 'start', 'end').iterator(chunk_size=10000)
+        spans = []
+        for restaurant_id, restaurant_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            spans.extend(
+                (start, end, restaurant_id)
+                for start, end in week_spans((start, end) for _, start, end in restaurant_rows)
+            )
+        names = dict(Restaurant.objects.values_list('pk', 'name'))
+        spans = sorted(span for span in spans if span[2] in names)
+        return names, IntervalTree(spans), [start for start, _, _ in spans], [pk for _, _, pk in spans]
@@ -0,0 +1,55 @@
+import hashlib
+from collections import defaultdict
+from django.apps import apps
+from .engines import CachedIndex
+from .hours import get_zone, minute_of_week
+from .models import Restaurant
+
+
+class ZoneIndex(CachedIndex):
+    """Knows the distinct time zones of the restaurants, so that a query instant is converted once per zone."""
+
+    def zones(self, version=None):
+        """Return the sorted (name, ZoneInfo) pairs of the zones in use."""
+        return self._get_index(version)
+
+    def build(self):
+        """Read the distinct zone names."""
+        names = Restaurant.objects.order_by('tz').values_list('tz', flat=True).distinct()
+        return [(name, get_zone(name)) for name in names]
+
+
+def local_minutes(datetime_obj, version=None):
+    """
+    Return the local minute of the week at which to look up the restaurants open at `datetime_obj`.
+
+    Naive datetimes are wall-clock times, the same minute in every zone. Aware datetimes are
+    instants, converted once per zone in use (those of `version`, by default the current dataset
+    version); DST is applied by the conversion. The result is a minute when every zone agrees,
+    and otherwise a tuple of (minute, zone names) groups.
+    """
+    if datetime_obj.tzinfo is None:
+        return minute_of_week(datetime_obj)
+
+    zones_by_minute = defaultdict(list)
+    for name, zone in apps.get_app_config('restaurants').zone_index.zones(version):
+        zones_by_minute[minute_of_week(datetime_obj.astimezone(zone))].append(name)
+    if len(zones_by_minute) <= 1:
+        # With no restaurants at all any minute gives the same (empty) answer
+        return next(iter(zones_by_minute), minute_of_week(datetime_obj))
+    return tuple(sorted((minute, tuple(names)) for minute, names in zones_by_minute.items()))
+
+
+def lookup_key(local):
+    """Return a short key identifying the answer of a `local_minutes()` result, for cache keys and ETags."""
+    if isinstance(local, int):
+        return local
+    groups = ';'.join(f"{minute}:{','.join(names)}" for minute, names in local)
+    return 'z' + hashlib.blake2b(groups.encode(), digest_size=8).hexdigest()
+
+
+def open_restaurant_names(engine, local):
+    """Look up the names of the open restaurants for a `local_minutes()` result, in id order."""
+    if isinstance(local, int):
+        return engine.open_restaurant_names(local)
+    return engine.open_restaurant_names_in_zones(local)